@@ -0,0 +1,220 @@
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.database.blobs import BlobStore, BlobWriter
+from app.models.schemas import AccidentReportFormData
+
+
+class VersionConflict(Exception):
+    """A conditional update found the application at a different version."""
+
+    def __init__(self, app_id: str, current_version: int):
+        super().__init__(f"Application '{app_id}' is at version {current_version}")
+        self.app_id = app_id
+        self.current_version = current_version
+
+
+class StoreBackend(ABC):
+    """
+    Storage contract for applications and attachments.
+    Routes only talk to the global `store`, so any backend implementing
+    this interface can be swapped in without touching the API layer.
+
+    Attachment payloads are not returned by the store: attachment dicts carry
+    a `sha256` key and the bytes live in `blobs` under that hash.
+    """
+
+    blobs: BlobStore
+
+    def open(self) -> None:
+        """Acquire resources (files, connections). Called from the app lifespan."""
+
+    def close(self) -> None:
+        """Release resources. Called from the app lifespan on shutdown."""
+
+    @property
+    @abstractmethod
+    def version(self) -> int:
+        """Version of the last mutation; changes whenever any application or attachment changes."""
+
+    @abstractmethod
+    def changes_since(self, version: int, limit: int = 1000) -> Optional[List[dict]]:
+        """
+        Change events {"version", "op": "create" | "update" | "delete", "id", "status"?}
+        of the versions in (version, version + limit], oldest first. Attachment changes
+        are updates of their application. Returns None when the recent history no longer
+        reaches back to `version` (the caller then has to reload instead).
+        """
+
+    @abstractmethod
+    def create_application(
+        self,
+        form_data: AccidentReportFormData,
+        status: Optional[str] = None,
+        ai_suggestion: Optional[float] = None,
+        ai_comments: Optional[Dict] = None,
+    ) -> dict:
+        """Create a new application and return it."""
+
+    @abstractmethod
+    def create_applications(self, applications: List[dict]) -> List[Optional[dict]]:
+        """
+        Create many applications in one go (one lock acquisition / transaction).
+        Each item holds the `create_application` arguments (`form_data`, `status`,
+        `ai_suggestion`, `ai_comments`) and optionally the `id`, `created_at` and
+        `updated_at` of an application exported elsewhere. Each created application takes
+        a version of its own, as if created one by one.
+        Returns the created applications in input order, None where the id already exists.
+        """
+
+    @abstractmethod
+    def get_application(self, app_id: str) -> Optional[dict]:
+        """Get an application by ID."""
+
+    @abstractmethod
+    def list_applications(
+        self,
+        page: int = 1,
+        page_size: int = 10,
+        pesel: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        status: Optional[str] = None,
+        accident_date_from: Optional[date] = None,
+        accident_date_to: Optional[date] = None,
+        ai_suggestion_min: Optional[float] = None,
+        ai_suggestion_max: Optional[float] = None,
+        after: Optional[Tuple[datetime, str]] = None,
+        exact_total: bool = True,
+    ) -> tuple[List[dict], Optional[int]]:
+        """
+        List applications (newest first, by created_at then id) with pagination and filters.
+        Date and ai_suggestion bounds are inclusive.
+        `after` is a (created_at, id) keyset cursor: only items ordered after it are returned
+        and `page` is applied relative to it.
+        With exact_total=False the backend may skip counting: total_count is then an
+        upper-bound estimate, or None if no cheap estimate exists.
+        Returns (items, total_count)
+        """
+
+    def iter_applications(self, batch_size: int = 500) -> Iterator[dict]:
+        """
+        Yield every application, newest first, fetching `batch_size` at a time
+        with the keyset cursor so memory use does not depend on the store size.
+        Applications created after the iteration started are not included.
+        """
+        after = None
+        while True:
+            items, _ = self.list_applications(page_size=batch_size, after=after, exact_total=False)
+            yield from items
+            if len(items) < batch_size:
+                return
+            after = (items[-1]["created_at"], items[-1]["id"])
+
+    @abstractmethod
+    def search_applications(self, query: str, page: int = 1, page_size: int = 10) -> Tuple[List[Tuple[dict, float]], int]:
+        """
+        Full-text search over the accident descriptions (see `app.database.search`).
+        Applications must contain every word of the query; they are ranked by BM25.
+        Returns ([(application, score)], total_count), best match first.
+        """
+
+    @abstractmethod
+    def get_stats(self) -> dict:
+        """
+        Dashboard counters, kept up to date by every mutation instead of scanning:
+        {"total", "with_attachments", "by_status": {status: n},
+         "by_day": {ISO date of created_at: {status: n}} (ascending),
+         "ai_suggestion_histogram": [n per 0.1 wide bucket], "ai_suggestion_missing"}.
+        Applications without a status are counted under "none".
+        """
+
+    @abstractmethod
+    def update_application(
+        self,
+        app_id: str,
+        form_data: Optional[AccidentReportFormData] = None,
+        ai_suggestion: Optional[float] = None,
+        ai_comments: Optional[Dict] = None,
+        status: Optional[str] = None,
+        expected_version: Optional[int] = None,
+    ) -> Optional[dict]:
+        """
+        Update an application. Returns updated application or None if not found.
+        With `expected_version` the update only applies if the application is still
+        at that version, otherwise VersionConflict is raised.
+        """
+
+    @abstractmethod
+    def apply_bulk(self, operations: List[dict]) -> List[dict]:
+        """
+        Apply many updates and deletions in one go (one lock acquisition / transaction).
+        Each operation is {"op": "update" | "delete", "id", "expected_version"?} and, for
+        updates, any of "status", "ai_suggestion", "ai_comments".
+        Operations are applied in order and independently: returns one
+        {"id", "result": "updated" | "deleted" | "not_found" | "conflict", "version"} per
+        operation, where version is the new one for updates and the current one for conflicts.
+        Every applied operation takes its own store version, as the single-record call would;
+        operations that are not applied take none.
+        """
+
+    @abstractmethod
+    def delete_application(self, app_id: str) -> bool:
+        """
+        Hard delete an application and all its attachments.
+        Returns True if deleted, False if not found.
+        """
+
+    @abstractmethod
+    def create_attachment(
+        self,
+        app_id: str,
+        title: str,
+        mime_type: str,
+        data_base64: str,
+    ) -> Optional[dict]:
+        """
+        Create an attachment for an application.
+        Returns attachment dict or None if application not found.
+        """
+
+    @abstractmethod
+    def create_attachment_from_blob(
+        self,
+        app_id: str,
+        title: str,
+        mime_type: str,
+        writer: BlobWriter,
+    ) -> Optional[dict]:
+        """
+        Create an attachment from a payload streamed into `writer` (see `blobs.writer()`).
+        The payload is committed to the blob store together with the attachment, or
+        discarded if the application is not found (None is returned then).
+        """
+
+    @abstractmethod
+    def get_attachment(self, att_id: str) -> Optional[dict]:
+        """Get attachment metadata (including its `sha256`) by ID."""
+
+    @abstractmethod
+    def get_application_attachments(self, app_id: str) -> List[dict]:
+        """Get metadata (without binary data) of all attachments for an application."""
+
+    @abstractmethod
+    def expired_attachments(self, created_before: datetime, limit: int) -> List[Tuple[str, str]]:
+        """(application id, attachment id) of up to `limit` attachments created before `created_before` (naive UTC)."""
+
+    @abstractmethod
+    def attachment_storage_stats(self) -> Dict[str, dict]:
+        """
+        Per MIME type: {"attachments", "size_bytes" (as uploaded), "stored_bytes" (on disk),
+        "compressed" (how many are stored gzip-compressed)}. Shared payloads count once per attachment.
+        """
+
+    @abstractmethod
+    def delete_attachment(self, app_id: str, att_id: str) -> bool:
+        """
+        Delete an attachment from an application.
+        Returns True if deleted, False if not found.
+        """
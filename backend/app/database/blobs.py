@@ -0,0 +1,517 @@
+import gzip
+import hashlib
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+# Bytes read per chunk when streaming a blob back from disk
+BLOB_CHUNK_SIZE = 64 * 1024
+# Leading bytes a BlobWriter keeps for type sniffing
+_HEAD_BYTES = 64
+# Subdirectory for files still being assembled (resumable uploads); never swept as blobs
+UPLOADS_DIR = "uploads"
+
+# How a payload is stored: as uploaded, or gzip-compressed (a valid HTTP Content-Encoding,
+# so compressed payloads can be sent as they are to clients that accept gzip)
+CODEC_IDENTITY = "identity"
+CODEC_GZIP = "gzip"
+_CODEC_SUFFIXES = {CODEC_IDENTITY: "", CODEC_GZIP: ".gz"}
+# A payload is stored compressed only if that saves at least this fraction of it (0 disables compression)
+BLOB_COMPRESSION_MIN_SAVING = float(os.getenv("BLOB_COMPRESSION_MIN_SAVING", "0.1"))
+BLOB_COMPRESSION_LEVEL = int(os.getenv("BLOB_COMPRESSION_LEVEL", "6"))
+# Compression is given up after this much input if it is not paying off (JPEGs, compressed PDFs, ...)
+_COMPRESSION_PROBE_BYTES = 256 * 1024
+
+
+def _worth_compressing(compressed_size: int, size: int) -> bool:
+    return compressed_size <= size * (1 - BLOB_COMPRESSION_MIN_SAVING)
+
+
+def _gzip_compressor():
+    return zlib.compressobj(BLOB_COMPRESSION_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+
+
+class _CompressedCopy:
+    """The gzip stream of a BlobWriter's payload, written alongside it and kept only if it pays off."""
+
+    def __init__(self, directory: str):
+        fd, self.path = tempfile.mkstemp(dir=directory, suffix=".gz.tmp")
+        self._file = os.fdopen(fd, "wb")
+        self._compressor = _gzip_compressor()
+        self.size = 0
+
+    def _write(self, data: bytes) -> None:
+        self.size += len(data)
+        self._file.write(data)
+
+    def write(self, chunk: bytes) -> None:
+        self._write(self._compressor.compress(chunk))
+
+    def flushed_size(self) -> int:
+        """Compressed size of everything written so far (costs a few bytes of output)."""
+        self._write(self._compressor.flush(zlib.Z_SYNC_FLUSH))
+        return self.size
+
+    def finish(self) -> None:
+        self._write(self._compressor.flush())
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def discard(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class BlobCache:
+    """
+    Memory tier for hot payloads: an LRU bounded by total bytes.
+    Only payloads up to `max_item_bytes` are admitted, so one large scan
+    cannot flush all the small documents officers keep opening. Evicted
+    payloads stay available on disk.
+    """
+
+    def __init__(self, max_bytes: int, max_item_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = min(max_item_bytes, max_bytes)
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def admits(self, size: int) -> bool:
+        return size <= self.max_item_bytes
+
+    def get(self, sha256: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(sha256)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(sha256)
+            self.hits += 1
+            return data
+
+    def put(self, sha256: str, data: bytes) -> None:
+        if not self.admits(len(data)):
+            return
+        with self._lock:
+            if sha256 in self._entries:
+                self._entries.move_to_end(sha256)
+                return
+            self._entries[sha256] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def discard(self, sha256: str) -> None:
+        with self._lock:
+            data = self._entries.pop(sha256, None)
+            if data is not None:
+                self._size -= len(data)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class BlobTooLarge(ValueError):
+    """A streamed payload went over the writer's size limit."""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"Attachment exceeds maximum allowed size ({max_size} bytes)")
+        self.max_size = max_size
+
+
+class BlobWriter:
+    """
+    Streams one payload into the blob directory, hashing and counting it on the way,
+    so an upload never has to be held in memory. Chunks go to a temp file; the
+    store `commit`s it under its hash once the attachment is recorded (or `discard`s it).
+
+    Unless compression is disabled, a gzip copy is written in the same pass. It is
+    dropped as soon as the first _COMPRESSION_PROBE_BYTES show that it does not pay
+    off; otherwise `finish` keeps whichever of the two is worth storing (`codec`).
+    """
+
+    def __init__(self, directory: str, max_size: Optional[int] = None):
+        self.max_size = max_size
+        self.size = 0
+        self.head = b""  # the first bytes, for type sniffing
+        self.codec = CODEC_IDENTITY  # decided by `finish`
+        self.stored_size: Optional[int] = None  # bytes on disk, known after `finish`
+        self._hash = hashlib.sha256()
+        self._compressed = _CompressedCopy(directory) if BLOB_COMPRESSION_MIN_SAVING > 0 else None
+        fd, self._tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+
+    @classmethod
+    def adopt(cls, path: str, max_size: Optional[int] = None) -> "BlobWriter":
+        """
+        A finished writer for a file already assembled inside the blob directory (e.g. from
+        resumable upload chunks). The file is hashed in one read pass and moved, never copied.
+        """
+        writer = cls.__new__(cls)
+        writer.max_size = max_size
+        writer.size = 0
+        writer.head = b""
+        writer.codec = CODEC_IDENTITY
+        writer.stored_size = None
+        writer._hash = hashlib.sha256()
+        writer._compressed = _CompressedCopy(os.path.dirname(path)) if BLOB_COMPRESSION_MIN_SAVING > 0 else None
+        writer._tmp_path = path
+        with open(path, "rb") as writer._file:
+            while chunk := writer._file.read(BLOB_CHUNK_SIZE):
+                writer._track(chunk)
+        return writer
+
+    def _track(self, chunk: bytes) -> None:
+        """Count, hash and compress a chunk."""
+        self.size += len(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            self.discard()
+            raise BlobTooLarge(self.max_size)
+        if len(self.head) < _HEAD_BYTES:
+            self.head += chunk[:_HEAD_BYTES - len(self.head)]
+        self._hash.update(chunk)
+        if self._compressed is not None:
+            probed = self.size - len(chunk) >= _COMPRESSION_PROBE_BYTES
+            self._compressed.write(chunk)
+            if not probed and self.size >= _COMPRESSION_PROBE_BYTES:
+                if not _worth_compressing(self._compressed.flushed_size(), self.size):
+                    self._compressed.discard()
+                    self._compressed = None
+
+    def write(self, chunk: bytes) -> None:
+        """Append a chunk. Raises BlobTooLarge (and discards the payload) past `max_size`."""
+        self._track(chunk)
+        self._file.write(chunk)
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def finish(self) -> str:
+        """
+        Flush the payload to disk (it must be durable before metadata points at it) and
+        settle on its codec. Returns its hash.
+        """
+        if self.stored_size is not None:
+            return self.sha256
+        if self._compressed is not None:
+            self._compressed.finish()
+            if _worth_compressing(self._compressed.size, self.size):
+                if not self._file.closed:
+                    self._file.close()
+                os.remove(self._tmp_path)
+                self._tmp_path = self._compressed.path
+                self.codec = CODEC_GZIP
+            else:
+                self._compressed.discard()
+            self._compressed = None
+        if not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        self.stored_size = os.path.getsize(self._tmp_path)
+        return self.sha256
+
+    def commit(self, path: str) -> None:
+        """Move the finished payload to its blob path (an identical existing blob is simply replaced)."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self._tmp_path, path)
+
+    def discard(self) -> None:
+        if self._compressed is not None:
+            self._compressed.discard()
+            self._compressed = None
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class BlobStore:
+    """
+    Content-addressed storage for attachment payloads.
+    Each distinct payload is written once to `<directory>/<sha[:2]>/<sha>`
+    (`<sha>.gz` if it is stored gzip-compressed, see BlobWriter);
+    reference counting lives in the store metadata, which calls `delete`
+    once the last attachment pointing at a blob is gone.
+
+    An optional BlobCache keeps recently uploaded or downloaded small
+    payloads in memory (decompressed), so hot documents are served without touching disk.
+    """
+
+    def __init__(self, directory: str, temporary: bool = False, cache: Optional[BlobCache] = None):
+        self._directory = directory
+        self._temporary = temporary  # removed on close (per-process in-memory stores)
+        self._cache = cache
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def temporary(cls, cache: Optional[BlobCache] = None) -> "BlobStore":
+        """Blob store in a private temp directory, for stores that do not outlive the process."""
+        return cls(tempfile.mkdtemp(prefix="zus-blobs-"), temporary=True, cache=cache)
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def path(self, sha256: str, codec: str = CODEC_IDENTITY) -> str:
+        return os.path.join(self._directory, sha256[:2], sha256 + _CODEC_SUFFIXES[codec])
+
+    def locate(self, sha256: str) -> Tuple[str, str]:
+        """(path, codec) of the stored payload. Raises FileNotFoundError if there is none."""
+        for codec in _CODEC_SUFFIXES:
+            path = self.path(sha256, codec)
+            if os.path.exists(path):
+                return path, codec
+        raise FileNotFoundError(self.path(sha256))
+
+    def stored_info(self, sha256: str) -> Tuple[str, int]:
+        """(codec, bytes on disk) of the stored payload."""
+        path, codec = self.locate(sha256)
+        return codec, os.path.getsize(path)
+
+    def exists(self, sha256: str) -> bool:
+        return any(os.path.exists(self.path(sha256, codec)) for codec in _CODEC_SUFFIXES)
+
+    def put(self, data: bytes, sha256: str) -> None:
+        """Write a payload under its hash unless an identical one is already stored."""
+        # A fresh upload is usually viewed right away
+        if self._cache is not None:
+            self._cache.put(sha256, data)
+        if self.exists(sha256):
+            return
+        codec = CODEC_IDENTITY
+        if BLOB_COMPRESSION_MIN_SAVING > 0:
+            probe = data[:_COMPRESSION_PROBE_BYTES]
+            if _worth_compressing(len(zlib.compress(probe, BLOB_COMPRESSION_LEVEL)), len(probe)):
+                packed = gzip.compress(data, BLOB_COMPRESSION_LEVEL, mtime=0)
+                if _worth_compressing(len(packed), len(data)):
+                    data, codec = packed, CODEC_GZIP
+        path = self.path(sha256, codec)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                # The blob must be durable before any metadata record points at it
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def upload_directory(self) -> str:
+        """Where partial uploads are assembled: on the blobs' filesystem, so they can be moved in."""
+        path = os.path.join(self._directory, UPLOADS_DIR)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def writer(self, max_size: Optional[int] = None) -> BlobWriter:
+        """A BlobWriter for streaming a new payload in; see `commit`."""
+        return BlobWriter(self._directory, max_size)
+
+    def commit(self, writer: BlobWriter) -> str:
+        """
+        Store a finished BlobWriter's payload under its hash and return the hash.
+        An identical payload already stored (in whatever codec) is kept instead.
+        """
+        sha256 = writer.finish()
+        if self.exists(sha256):
+            writer.discard()
+            return sha256
+        writer.commit(self.path(sha256, writer.codec))
+        # As in `put`: a fresh upload is usually viewed right away (the file is still in the page cache)
+        if self._cache is not None and self._cache.admits(writer.size):
+            self._cache.put(sha256, self.read(sha256))
+        return sha256
+
+    def read(self, sha256: str) -> bytes:
+        """The payload as uploaded (decompressed if need be)."""
+        path, codec = self.locate(sha256)
+        with open(path, "rb") as f:
+            data = f.read()
+        return gzip.decompress(data) if codec == CODEC_GZIP else data
+
+    def read_cached(self, sha256: str, size: int) -> Optional[bytes]:
+        """
+        Payload from the memory tier, loading it on a miss.
+        Returns None if there is no cache or the payload is too large for it;
+        stream it from `path` then.
+        """
+        if self._cache is None or not self._cache.admits(size):
+            return None
+        data = self._cache.get(sha256)
+        if data is None:
+            data = self.read(sha256)
+            self._cache.put(sha256, data)
+        return data
+
+    def cache_stats(self) -> Optional[Dict[str, int]]:
+        return self._cache.stats() if self._cache is not None else None
+
+    def iter_chunks(
+        self,
+        sha256: str,
+        chunk_size: int = BLOB_CHUNK_SIZE,
+        start: int = 0,
+        length: Optional[int] = None,
+    ) -> Iterator[bytes]:
+        """
+        The payload as uploaded (or `length` bytes of it from `start`) in chunks of at most
+        `chunk_size`. Compressed payloads are decompressed on the fly, a chunk at a time.
+        """
+        path, codec = self.locate(sha256)
+        with open(path, "rb") as f:
+            if codec == CODEC_IDENTITY:
+                if start:
+                    f.seek(start)
+                remaining = length
+                while remaining is None or remaining > 0:
+                    chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                    if not chunk:
+                        break
+                    if remaining is not None:
+                        remaining -= len(chunk)
+                    yield chunk
+                return
+
+            # A compressed payload can only be read from its start; skip up to `start`
+            position = 0
+            end = None if length is None else start + length
+            for chunk in _decompress(f, chunk_size):
+                chunk_start, position = position, position + len(chunk)
+                if position <= start:
+                    continue
+                if end is not None and chunk_start >= end:
+                    break
+                yield chunk[max(start - chunk_start, 0):None if end is None else end - chunk_start]
+
+    def iter_stored(self, sha256: str, chunk_size: int = BLOB_CHUNK_SIZE) -> Iterator[bytes]:
+        """The payload as stored (gzip data for compressed payloads), in chunks."""
+        path, _ = self.locate(sha256)
+        with open(path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def open_deflated(self, sha256: str, chunk_size: int = BLOB_CHUNK_SIZE) -> Tuple[int, int, Iterator[bytes]]:
+        """
+        The raw deflate data inside a gzip-compressed payload, for containers that can
+        take it as it is (ZIP): (CRC-32 of the payload, length of the deflate data, its chunks).
+        The file is opened right away, so a payload deleted later can still be read to the end.
+        Raises FileNotFoundError, or ValueError for a payload that is not stored compressed.
+        """
+        path, codec = self.locate(sha256)
+        if codec != CODEC_GZIP:
+            raise ValueError(f"Blob {sha256} is not stored compressed")
+        f = open(path, "rb")
+        try:
+            start = _skip_gzip_header(f)
+            end = f.seek(-8, os.SEEK_END)
+            crc, _ = struct.unpack("<II", f.read(8))
+        except BaseException:
+            f.close()
+            raise
+        return crc, end - start, _read_range(f, start, end - start, chunk_size)
+
+    def delete(self, sha256: str) -> None:
+        if self._cache is not None:
+            self._cache.discard(sha256)
+        for codec in _CODEC_SUFFIXES:
+            try:
+                os.remove(self.path(sha256, codec))
+            except FileNotFoundError:
+                pass
+
+    def sweep(self, referenced: Iterable[str], keep_temporary: bool = False) -> int:
+        """
+        Remove blobs (and leftover temp files, unless `keep_temporary`: other processes
+        may be writing them) not in `referenced`. Returns the number removed.
+        """
+        keep = set(referenced)
+        removed = 0
+        for root, dirs, files in os.walk(self._directory):
+            if root == self._directory and UPLOADS_DIR in dirs:
+                # Unfinished uploads are expired by the retention sweeper
+                dirs.remove(UPLOADS_DIR)
+            for name in files:
+                if keep_temporary and name.endswith(".tmp"):
+                    continue
+                if name.removesuffix(_CODEC_SUFFIXES[CODEC_GZIP]) not in keep:
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+        return removed
+
+    def close(self) -> None:
+        if self._temporary:
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+
+def _decompress(f, chunk_size: int) -> Iterator[bytes]:
+    """Decompressed pieces (of at most `chunk_size` bytes) of the gzip stream in file `f`."""
+    decompressor = zlib.decompressobj(31)
+    while compressed := f.read(chunk_size):
+        while compressed:
+            chunk = decompressor.decompress(compressed, chunk_size)
+            compressed = decompressor.unconsumed_tail
+            if chunk:
+                yield chunk
+    if tail := decompressor.flush():
+        yield tail
+
+
+def _skip_gzip_header(f) -> int:
+    """Read past the gzip member header at the start of file `f` (RFC 1952); returns where the deflate data starts."""
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b"\x1f\x8b\x08":
+        raise ValueError("Not a gzip file")
+    flags = header[3]
+    if flags & 0x04:  # FEXTRA
+        (length,) = struct.unpack("<H", f.read(2))
+        f.seek(length, os.SEEK_CUR)
+    for flag in (0x08, 0x10):  # FNAME, FCOMMENT: zero-terminated
+        if flags & flag:
+            while f.read(1) not in (b"\x00", b""):
+                pass
+    if flags & 0x02:  # FHCRC
+        f.seek(2, os.SEEK_CUR)
+    return f.tell()
+
+
+def _read_range(f, start: int, length: int, chunk_size: int) -> Iterator[bytes]:
+    """`length` bytes of open file `f` from `start`, in chunks; closes the file."""
+    with f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
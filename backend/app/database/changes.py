@@ -0,0 +1,54 @@
+import os
+import threading
+from collections import deque
+from itertools import islice
+from typing import List, Optional
+
+# How many of the latest store versions the change feed can replay to a reconnecting client
+STORE_CHANGE_LOG_SIZE = int(os.getenv("STORE_CHANGE_LOG_SIZE", "10000"))
+
+
+def change_event(version: int, op: str, app_id: str, status: Optional[str] = None) -> dict:
+    """Compact change-feed event: an application was created, updated or deleted at `version`."""
+    event = {"version": version, "op": op, "id": app_id}
+    if op != "delete":
+        event["status"] = status
+    return event
+
+
+class ChangeLog:
+    """
+    The latest mutations of the in-memory store as change events, one per version
+    (every mutation there takes the next version). Appended under the store write
+    lock before the store's version moves on, so a reader that sees a version also
+    finds its event; read by the change feed from any thread.
+    """
+
+    def __init__(self, size: int = STORE_CHANGE_LOG_SIZE):
+        self._events: deque = deque(maxlen=size)
+        self._horizon = 0  # every version above this one is still in the log
+        self._lock = threading.Lock()
+
+    def reset(self, version: int) -> None:
+        """Start over at `version` (e.g. after loading a snapshot, which carries no history)."""
+        with self._lock:
+            self._events.clear()
+            self._horizon = version
+
+    def append(self, event: dict) -> None:
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self._horizon += 1
+            self._events.append(event)
+
+    def since(self, version: int, limit: int) -> Optional[List[dict]]:
+        """
+        Events of versions in (version, version + limit], oldest first.
+        None if the log no longer reaches back to `version` or has never been there.
+        """
+        with self._lock:
+            # One event per version: the log holds versions horizon + 1 .. horizon + len
+            start = version - self._horizon
+            if start < 0 or start > len(self._events):
+                return None
+            return list(islice(self._events, start, start + limit))
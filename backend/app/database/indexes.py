@@ -0,0 +1,344 @@
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.database.search import InvertedIndex, search_text_of
+
+# Formats accepted for `szczegoly.data` (the wizard sends ISO dates, the agents sometimes Polish ones)
+_ACCIDENT_DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d-%m-%Y", "%d/%m/%Y")
+
+
+def parse_accident_date(value: Optional[str]) -> Optional[date]:
+    """Parse the free-text accident date from the form. Returns None when it is empty or unparseable."""
+    if not value:
+        return None
+    value = value.strip()
+    for fmt in _ACCIDENT_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def accident_date_of(app: dict) -> Optional[date]:
+    # Stored ApplicationRecords carry the parsed date; plain dicts have to parse it from the form
+    if hasattr(app, "accident_date"):
+        return app.accident_date
+    return parse_accident_date((app.get("form_data") or {}).get("szczegoly", {}).get("data"))
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Store timestamps are naive UTC; bring filter values into the same form."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+@dataclass
+class ApplicationFilters:
+    """Filters accepted by `list_applications`. Date bounds are inclusive."""
+    pesel: Optional[str] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    status: Optional[str] = None
+    accident_date_from: Optional[date] = None
+    accident_date_to: Optional[date] = None
+    ai_suggestion_min: Optional[float] = None
+    ai_suggestion_max: Optional[float] = None
+
+    def __post_init__(self):
+        self.date_from = to_naive_utc(self.date_from)
+        self.date_to = to_naive_utc(self.date_to)
+
+    @property
+    def has_accident_date(self) -> bool:
+        return self.accident_date_from is not None or self.accident_date_to is not None
+
+    @property
+    def has_ai_suggestion(self) -> bool:
+        return self.ai_suggestion_min is not None or self.ai_suggestion_max is not None
+
+    @property
+    def only_created_at(self) -> bool:
+        """True when the created_at range is the only filter."""
+        return not (self.pesel or self.status is not None or self.has_accident_date or self.has_ai_suggestion)
+
+    def matches(self, app: dict) -> bool:
+        if self.pesel and app["pesel"] != self.pesel:
+            return False
+        if self.date_from and app["created_at"] < self.date_from:
+            return False
+        if self.date_to and app["created_at"] > self.date_to:
+            return False
+        if self.status is not None and app.get("status") != self.status:
+            return False
+        if self.has_accident_date:
+            accident_date = accident_date_of(app)
+            if accident_date is None:
+                return False
+            if self.accident_date_from and accident_date < self.accident_date_from:
+                return False
+            if self.accident_date_to and accident_date > self.accident_date_to:
+                return False
+        if self.has_ai_suggestion:
+            suggestion = app.get("ai_suggestion")
+            if suggestion is None:
+                return False
+            if self.ai_suggestion_min is not None and suggestion < self.ai_suggestion_min:
+                return False
+            if self.ai_suggestion_max is not None and suggestion > self.ai_suggestion_max:
+                return False
+        return True
+
+
+class SortedIndex:
+    """(key, app_id) pairs kept sorted, for range counts and range scans in O(log N + k)."""
+
+    def __init__(self):
+        self._entries: List[Tuple[Any, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: Any, app_id: str) -> None:
+        insort(self._entries, (key, app_id))
+
+    def remove(self, key: Any, app_id: str) -> None:
+        i = bisect_left(self._entries, (key, app_id))
+        if i < len(self._entries) and self._entries[i] == (key, app_id):
+            del self._entries[i]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def bounds(self, lo: Any = None, hi: Any = None, before: Optional[Tuple[Any, str]] = None) -> Tuple[int, int]:
+        """
+        Positions [start, end) of the entries with lo <= key <= hi,
+        additionally limited to entries strictly below the (key, id) pair `before`.
+        """
+        start = 0 if lo is None else bisect_left(self._entries, lo, key=lambda e: e[0])
+        end = len(self._entries) if hi is None else bisect_right(self._entries, hi, key=lambda e: e[0])
+        if before is not None:
+            end = min(end, bisect_left(self._entries, before))
+        return start, max(start, end)
+
+    def count(self, lo: Any = None, hi: Any = None) -> int:
+        start, end = self.bounds(lo, hi)
+        return end - start
+
+    def ids(
+        self,
+        lo: Any = None,
+        hi: Any = None,
+        reverse: bool = False,
+        before: Optional[Tuple[Any, str]] = None,
+    ) -> Iterator[str]:
+        start, end = self.bounds(lo, hi, before)
+        positions = range(end - 1, start - 1, -1) if reverse else range(start, end)
+        for i in positions:
+            yield self._entries[i][1]
+
+    def slice_desc(self, start: int, end: int, offset: int, limit: int) -> List[str]:
+        """Ids of entries [start, end) in descending order, skipping `offset` and taking `limit`."""
+        hi = end - offset
+        lo = max(start, hi - limit)
+        return [self._entries[i][1] for i in range(hi - 1, lo - 1, -1)]
+
+
+class HashIndex:
+    """Exact-match index: key -> set of application ids."""
+
+    def __init__(self):
+        self._buckets: Dict[Any, Set[str]] = {}
+
+    def add(self, key: Any, app_id: str) -> None:
+        self._buckets.setdefault(key, set()).add(app_id)
+
+    def remove(self, key: Any, app_id: str) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return
+        bucket.discard(app_id)
+        if not bucket:
+            del self._buckets[key]
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+    def get(self, key: Any) -> Set[str]:
+        return self._buckets.get(key, set())
+
+    def count(self, key: Any) -> int:
+        return len(self._buckets.get(key, ()))
+
+
+class ApplicationIndexes:
+    """
+    Secondary indexes over the in-memory applications plus a small planner,
+    and the full-text index over the accident descriptions.
+
+    `query` estimates how many candidates each usable index yields for the
+    given filters, drives the scan from the most selective one and checks
+    the remaining filters on those candidates only. Unfiltered (or purely
+    created_at-filtered) listings are answered straight from the sorted
+    created_at index without touching the other records.
+    """
+
+    def __init__(self):
+        self.created_at = SortedIndex()
+        self.pesel = HashIndex()
+        self.status = HashIndex()
+        self.accident_date = SortedIndex()
+        self.ai_suggestion = SortedIndex()
+        self.text = InvertedIndex()
+
+    def add(self, app: dict) -> None:
+        self._add_fields(app)
+        self.text.add(app["id"], search_text_of(app))
+
+    def remove(self, app: dict) -> None:
+        self._remove_fields(app)
+        self.text.remove(app["id"])
+
+    def replace(self, old: dict, new: dict, form_changed: bool = True) -> None:
+        """
+        Re-index an updated application. Only indexes whose key changed are touched
+        (moving an entry in a sorted index shifts the list), and the text is only
+        re-analyzed if the form (and its text) changed.
+        """
+        app_id = new["id"]
+        keys = (
+            # index, old key, new key, whether None is indexed
+            (self.created_at, old["created_at"], new["created_at"], True),
+            (self.pesel, old["pesel"], new["pesel"], True),
+            (self.status, old.get("status"), new.get("status"), True),
+            (self.accident_date, accident_date_of(old), accident_date_of(new), False),
+            (self.ai_suggestion, old.get("ai_suggestion"), new.get("ai_suggestion"), False),
+        )
+        for index, old_key, new_key, indexes_none in keys:
+            if old_key == new_key:
+                continue
+            if old_key is not None or indexes_none:
+                index.remove(old_key, app_id)
+            if new_key is not None or indexes_none:
+                index.add(new_key, app_id)
+        if not form_changed:
+            return
+        new_text = search_text_of(new)
+        if new_text != search_text_of(old):
+            self.text.remove(old["id"])
+            self.text.add(new["id"], new_text)
+
+    def _add_fields(self, app: dict) -> None:
+        app_id = app["id"]
+        self.created_at.add(app["created_at"], app_id)
+        self.pesel.add(app["pesel"], app_id)
+        self.status.add(app.get("status"), app_id)
+        accident_date = accident_date_of(app)
+        if accident_date is not None:
+            self.accident_date.add(accident_date, app_id)
+        if app.get("ai_suggestion") is not None:
+            self.ai_suggestion.add(app["ai_suggestion"], app_id)
+
+    def _remove_fields(self, app: dict) -> None:
+        app_id = app["id"]
+        self.created_at.remove(app["created_at"], app_id)
+        self.pesel.remove(app["pesel"], app_id)
+        self.status.remove(app.get("status"), app_id)
+        accident_date = accident_date_of(app)
+        if accident_date is not None:
+            self.accident_date.remove(accident_date, app_id)
+        if app.get("ai_suggestion") is not None:
+            self.ai_suggestion.remove(app["ai_suggestion"], app_id)
+
+    def clear(self) -> None:
+        for index in (self.created_at, self.pesel, self.status, self.accident_date, self.ai_suggestion, self.text):
+            index.clear()
+
+    def plan(self, filters: ApplicationFilters) -> Tuple[str, int]:
+        """Pick the index with the fewest candidates. Returns (index name, estimated candidates)."""
+        options = [("created_at", self.created_at.count(filters.date_from, filters.date_to))]
+        if filters.pesel:
+            options.append(("pesel", self.pesel.count(filters.pesel)))
+        if filters.status is not None:
+            options.append(("status", self.status.count(filters.status)))
+        if filters.has_accident_date:
+            options.append(
+                ("accident_date", self.accident_date.count(filters.accident_date_from, filters.accident_date_to))
+            )
+        if filters.has_ai_suggestion:
+            options.append(
+                ("ai_suggestion", self.ai_suggestion.count(filters.ai_suggestion_min, filters.ai_suggestion_max))
+            )
+        return min(options, key=lambda option: option[1])
+
+    def _candidates(
+        self,
+        index_name: str,
+        filters: ApplicationFilters,
+        before: Optional[Tuple[datetime, str]] = None,
+    ) -> Iterator[str]:
+        if index_name == "pesel":
+            return iter(self.pesel.get(filters.pesel))
+        if index_name == "status":
+            return iter(self.status.get(filters.status))
+        if index_name == "accident_date":
+            return self.accident_date.ids(filters.accident_date_from, filters.accident_date_to)
+        if index_name == "ai_suggestion":
+            return self.ai_suggestion.ids(filters.ai_suggestion_min, filters.ai_suggestion_max)
+        return self.created_at.ids(filters.date_from, filters.date_to, reverse=True, before=before)
+
+    def query(
+        self,
+        applications: Dict[str, dict],
+        filters: ApplicationFilters,
+        offset: int,
+        limit: int,
+        after: Optional[Tuple[datetime, str]] = None,
+        exact_total: bool = True,
+    ) -> Tuple[List[dict], int]:
+        """
+        Return one page (newest first) of matching applications and the match count.
+        `after` is a (created_at, id) keyset position: only older items are returned.
+        Without `exact_total` the count is the planner's upper-bound estimate, which
+        lets created_at-driven scans stop as soon as the page is full.
+        """
+        if after is not None:
+            # A cursor may carry a UTC offset; compare it like the date filters
+            after = (to_naive_utc(after[0]), after[1])
+        index_name, estimate = self.plan(filters)
+
+        if index_name == "created_at" and filters.only_created_at:
+            start, end = self.created_at.bounds(filters.date_from, filters.date_to)
+            if after is not None:
+                _, page_end = self.created_at.bounds(filters.date_from, filters.date_to, before=after)
+            else:
+                page_end = end
+            page_ids = self.created_at.slice_desc(start, page_end, offset, limit)
+            return [applications[aid] for aid in page_ids], end - start
+
+        # created_at scans come out newest first and can stop early; other indexes need a top-k
+        ordered = index_name == "created_at"
+        wanted = offset + limit
+        candidates = self._candidates(index_name, filters, before=None if exact_total else after)
+
+        page: List[dict] = []
+        total = 0
+        for aid in candidates:
+            app = applications[aid]
+            if not filters.matches(app):
+                continue
+            total += 1
+            if after is not None and (app["created_at"], app["id"]) >= after:
+                continue
+            if not ordered or len(page) < wanted:
+                page.append(app)
+            elif not exact_total:
+                break
+
+        if not ordered:
+            page = heapq.nlargest(wanted, page, key=lambda app: (app["created_at"], app["id"]))
+        return page[offset:wanted], total if exact_total else estimate
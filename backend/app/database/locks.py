@@ -0,0 +1,75 @@
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List
+
+
+class ReadWriteLock:
+    """
+    Any number of concurrent readers or a single writer.
+    A waiting writer blocks new readers, so a steady stream of list/get
+    requests cannot starve mutations. Not reentrant.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class StripedLock:
+    """
+    A fixed pool of locks picked by key hash.
+    Serializes work on the same record while different records proceed in
+    parallel, without keeping a lock object per record.
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def _index(self, key: str) -> int:
+        return hash(key) % len(self._locks)
+
+    @contextmanager
+    def hold(self, *keys: str) -> Iterator[None]:
+        """Hold the stripes of all `keys`, acquired in a fixed order to avoid deadlocks."""
+        locks = self._ordered(keys)
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def _ordered(self, keys: Iterable[str]) -> List[threading.Lock]:
+        return [self._locks[i] for i in sorted({self._index(key) for key in keys})]
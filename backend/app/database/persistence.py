@@ -0,0 +1,264 @@
+import logging
+import os
+import pickle
+import struct
+import threading
+import zlib
+from typing import Any, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Every WAL record: payload length, CRC32 of the payload, sequence number
+_RECORD_HEADER = struct.Struct("<IIQ")
+_SEGMENT_PREFIX = "wal-"
+_SEGMENT_SUFFIX = ".log"
+_SNAPSHOT_FILE = "snapshot.bin"
+_LOCK_FILE = "LOCK"
+
+FSYNC_MODES = ("always", "batch", "off")
+
+
+class StoreJournal:
+    """
+    Append-only write-ahead log plus periodic snapshots for the in-memory store.
+
+    The log is split into segments named after their first sequence number.
+    Taking a snapshot starts a new segment, writes the snapshot in the
+    background and then drops the segments it covers, so recovery only ever
+    reads the latest snapshot plus a short WAL tail.
+
+    Records are pickled: the files are private to the server and pickle is by
+    far the fastest way to restore hundreds of thousands of dicts.
+
+    fsync_mode:
+        "always" - fsync after every record (safest, slowest)
+        "batch"  - a background thread fsyncs every `fsync_interval` seconds
+        "off"    - leave flushing to the OS (survives process crashes only)
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        fsync_mode: str = "batch",
+        fsync_interval: float = 0.05,
+        snapshot_every: int = 50_000,
+    ):
+        if fsync_mode not in FSYNC_MODES:
+            raise ValueError(f"Unknown fsync mode '{fsync_mode}'. Use one of: {', '.join(FSYNC_MODES)}")
+        self._directory = directory
+        self._fsync_mode = fsync_mode
+        self._fsync_interval = fsync_interval
+        self._snapshot_every = snapshot_every
+
+        self._seq = 0
+        self._records_since_snapshot = 0
+        self._file = None
+        self._dirty = False
+        self._io_lock = threading.Lock()  # guards the segment file between writers and the flusher
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._snapshot_thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Recovery
+    # ------------------------------------------------------------------
+
+    def recover(self) -> Tuple[Optional[Any], Iterator[Tuple[str, tuple]]]:
+        """
+        Lock the data directory and load what is on disk.
+        Returns (snapshot_state or None, iterator of (op, args) records newer than the snapshot).
+        """
+        os.makedirs(self._directory, exist_ok=True)
+        self._acquire_directory_lock()
+        # Snapshots that a crash interrupted
+        for name in os.listdir(self._directory):
+            if name.startswith(f"{_SNAPSHOT_FILE}.") and name.endswith(".tmp"):
+                os.remove(os.path.join(self._directory, name))
+
+        state = None
+        snapshot_seq = 0
+        snapshot_path = os.path.join(self._directory, _SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "rb") as f:
+                snapshot_seq, state = pickle.load(f)
+        self._seq = snapshot_seq
+
+        return state, self._replay(snapshot_seq)
+
+    def _replay(self, after_seq: int) -> Iterator[Tuple[str, tuple]]:
+        for path in self._segments():
+            for seq, op, args in self._read_segment(path):
+                if seq <= after_seq:
+                    continue
+                self._seq = seq
+                self._records_since_snapshot += 1
+                yield op, args
+
+    def _read_segment(self, path: str) -> Iterator[Tuple[int, str, tuple]]:
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(_RECORD_HEADER.size)
+                if not header:
+                    return
+                if len(header) < _RECORD_HEADER.size:
+                    logger.warning("Truncated WAL record header in %s, ignoring the tail", path)
+                    return
+                length, crc, seq = _RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    # Torn write from a crash: everything after it was never acknowledged
+                    logger.warning("Corrupt WAL record %d in %s, ignoring the tail", seq, path)
+                    return
+                op, args = pickle.loads(payload)
+                yield seq, op, args
+
+    def _segments(self) -> List[str]:
+        names = sorted(
+            name
+            for name in os.listdir(self._directory)
+            if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX)
+        )
+        return [os.path.join(self._directory, name) for name in names]
+
+    def _acquire_directory_lock(self) -> None:
+        if fcntl is None or self._lock_file is not None:
+            return
+        self._lock_file = open(os.path.join(self._directory, _LOCK_FILE), "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            self._lock_file = None
+            raise RuntimeError(
+                f"Store data directory '{self._directory}' is used by another process. "
+                "The in-memory store journal supports a single worker; use STORE_BACKEND=sqlite for several."
+            )
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Open a fresh segment for appends. Call after the recovery iterator is exhausted."""
+        self._open_segment()
+        if self._fsync_mode == "batch":
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._flush_loop, name="store-wal-flusher", daemon=True)
+            self._flusher.start()
+
+    def _open_segment(self) -> None:
+        path = os.path.join(self._directory, f"{_SEGMENT_PREFIX}{self._seq + 1:020d}{_SEGMENT_SUFFIX}")
+        with self._io_lock:
+            if self._file is not None:
+                self._sync_locked()
+                self._file.close()
+            # A segment with this name can only hold a torn first record, never acknowledged data
+            self._file = open(path, "wb")
+
+    def append(self, op: str, *args) -> None:
+        """Append one mutation. Callers hold the store lock, which orders the records."""
+        payload = pickle.dumps((op, args), protocol=pickle.HIGHEST_PROTOCOL)
+        self._seq += 1
+        with self._io_lock:
+            self._file.write(_RECORD_HEADER.pack(len(payload), zlib.crc32(payload), self._seq))
+            self._file.write(payload)
+            # Hand the bytes to the OS right away so a process crash loses nothing
+            self._file.flush()
+            if self._fsync_mode == "always":
+                os.fsync(self._file.fileno())
+            else:
+                self._dirty = True
+        self._records_since_snapshot += 1
+
+    def _sync_locked(self) -> None:
+        if self._dirty and self._fsync_mode != "off":
+            os.fsync(self._file.fileno())
+        self._dirty = False
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self._fsync_interval):
+            with self._io_lock:
+                if self._file is not None:
+                    self._sync_locked()
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def should_snapshot(self) -> bool:
+        in_progress = self._snapshot_thread is not None and self._snapshot_thread.is_alive()
+        return not in_progress and self._records_since_snapshot >= self._snapshot_every
+
+    def snapshot(self, state: Any, background: bool = True) -> None:
+        """
+        Persist `state` as of the current sequence number.
+        Must be called under the store lock with a state that is no longer
+        mutated; the (slow) pickling and writing then happen off the lock.
+        """
+        # An older snapshot still being written must not land after this one
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+            self._snapshot_thread = None
+        seq = self._seq
+        self._records_since_snapshot = 0
+        self._open_segment()
+
+        if background:
+            self._snapshot_thread = threading.Thread(
+                target=self._write_snapshot, args=(seq, state), name="store-snapshot", daemon=True
+            )
+            self._snapshot_thread.start()
+        else:
+            self._write_snapshot(seq, state)
+
+    def _write_snapshot(self, seq: int, state: Any) -> None:
+        path = os.path.join(self._directory, _SNAPSHOT_FILE)
+        tmp_path = f"{path}.{seq}.tmp"  # one per writer: two snapshots never share a temp file
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump((seq, state), f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            logger.exception("Failed to write store snapshot")
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            return
+
+        # Segments that only hold records up to `seq` are now redundant
+        with self._io_lock:
+            current = os.path.basename(self._file.name) if self._file is not None else None
+        for segment in self._segments():
+            name = os.path.basename(segment)
+            first_seq = int(name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)])
+            if name != current and first_seq <= seq:
+                try:
+                    os.remove(segment)
+                except FileNotFoundError:
+                    pass
+        logger.info("Store snapshot written at sequence %d", seq)
+
+    def close(self) -> None:
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        with self._io_lock:
+            if self._file is not None:
+                self._sync_locked()
+                self._file.close()
+                self._file = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
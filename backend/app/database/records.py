@@ -0,0 +1,182 @@
+import json
+import os
+import sys
+import zlib
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.database.indexes import parse_accident_date
+
+# Encoded form_data at least this long is stored zlib-compressed; 0 disables compression
+STORE_COMPRESS_MIN_BYTES = int(os.getenv("STORE_COMPRESS_MIN_BYTES", "512"))
+
+
+class FrozenRecord(dict):
+    """
+    A dict that refuses in-place changes.
+
+    Stored records are shared with readers that take no lock, so writers never
+    mutate them: `replace` derives the next version and the store swaps it in
+    with a single dict assignment. The freeze is shallow, nested values
+    (`form_data`, `ai_comments`) must be treated as read-only by convention.
+    """
+
+    __slots__ = ()
+
+    def _readonly(self, *args: Any, **kwargs: Any):
+        raise TypeError(f"{type(self).__name__} is immutable, use replace()")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def replace(self, **changes: Any) -> "FrozenRecord":
+        """Return a copy with `changes` applied."""
+        return type(self)({**self, **changes})
+
+    def __reduce__(self):
+        # The default dict-subclass pickling rebuilds the record item by item
+        return type(self), (dict(self),)
+
+
+def encode_form(form_data: Dict[str, Any]) -> bytes:
+    """Compact UTF-8 JSON of a form, compressed when it is long (mostly the free-text descriptions)."""
+    data = json.dumps(form_data, ensure_ascii=False, separators=(",", ":")).encode()
+    if STORE_COMPRESS_MIN_BYTES and len(data) >= STORE_COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(data)
+        if len(compressed) < len(data):
+            return compressed
+    return data
+
+
+def decode_form(data: bytes) -> Dict[str, Any]:
+    # JSON objects start with "{", zlib streams never do
+    if data[:1] != b"{":
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+
+class ApplicationRecord(Mapping):
+    """
+    Compact, immutable stored application.
+
+    Reads like the application dict (`app["status"]`, `app.get(...)`,
+    `ApplicationResponse(**app)`), but keeps its fields in slots and the
+    `form_data` tree (dozens of small dicts and strings) as one encoded bytes
+    object, decoded on access. The parsed accident date is kept alongside so
+    that filtering never has to decode the form.
+    """
+
+    __slots__ = (
+        "id",
+        "version",
+        "created_at",
+        "updated_at",
+        "pesel",
+        "status",
+        "ai_suggestion",
+        "ai_comments",
+        "attachment_ids",
+        "accident_date",
+        "_form",
+    )
+
+    # Mapping keys, in the order of the API model
+    _KEYS = (
+        "id",
+        "version",
+        "created_at",
+        "updated_at",
+        "pesel",
+        "form_data",
+        "ai_suggestion",
+        "ai_comments",
+        "status",
+        "attachment_ids",
+    )
+    _KEY_SET = frozenset(_KEYS)
+
+    def __init__(
+        self,
+        id: str,
+        version: int,
+        created_at: datetime,
+        updated_at: datetime,
+        pesel: str,
+        form_data: Dict[str, Any],
+        ai_suggestion: Optional[float] = None,
+        ai_comments: Optional[Dict[str, Any]] = None,
+        status: Optional[str] = None,
+        attachment_ids: Tuple[str, ...] = (),
+    ):
+        self._set(
+            id=id,
+            version=version,
+            created_at=created_at,
+            updated_at=updated_at,
+            pesel=pesel,
+            ai_suggestion=ai_suggestion,
+            ai_comments=ai_comments,
+            # Status values repeat across all applications; share one string object each
+            status=sys.intern(status) if status is not None else None,
+            attachment_ids=tuple(attachment_ids),
+            accident_date=parse_accident_date((form_data.get("szczegoly") or {}).get("data")),
+            _form=encode_form(form_data),
+        )
+
+    def _set(self, **values: Any) -> None:
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise TypeError("ApplicationRecord is immutable, use replace()")
+
+    __delattr__ = __setattr__
+
+    @property
+    def form_data(self) -> Dict[str, Any]:
+        """A freshly decoded copy of the form; changing it does not affect the record."""
+        return decode_form(self._form)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._KEY_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
+
+    def __repr__(self) -> str:
+        return f"ApplicationRecord(id={self.id!r}, version={self.version})"
+
+    def replace(self, **changes: Any) -> "ApplicationRecord":
+        """Return a copy with `changes` applied; the encoded form is reused unless form_data changes."""
+        record = object.__new__(ApplicationRecord)
+        values = {name: getattr(self, name) for name in self.__slots__}
+        if "form_data" in changes:
+            form_data = changes.pop("form_data")
+            values["_form"] = encode_form(form_data)
+            values["accident_date"] = parse_accident_date((form_data.get("szczegoly") or {}).get("data"))
+        if changes.get("status") is not None:
+            changes["status"] = sys.intern(changes["status"])
+        unknown = set(changes) - self._KEY_SET
+        if unknown:
+            raise KeyError(", ".join(sorted(unknown)))
+        values.update(changes)
+        record._set(**values)
+        return record
+
+    def __reduce__(self):
+        return _restore_application, tuple(getattr(self, name) for name in self.__slots__)
+
+
+def _restore_application(*values: Any) -> ApplicationRecord:
+    """Unpickle an ApplicationRecord without re-encoding its form."""
+    record = object.__new__(ApplicationRecord)
+    record._set(**dict(zip(ApplicationRecord.__slots__, values)))
+    if record.status is not None:
+        record._set(status=sys.intern(record.status))
+    return record
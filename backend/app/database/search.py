@@ -0,0 +1,139 @@
+import heapq
+import math
+import re
+import sys
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+# Accident details that are searched (keys of `form_data["szczegoly"]`)
+SEARCH_FIELDS = ("opis_okolicznosci", "opis_urazow", "miejsce", "maszyny_opis")
+
+# Frequent Polish function words (already folded); they carry no meaning for search
+STOPWORDS = frozenset(
+    "a aby ale bo by byl byla bylo do dla gdy i ich jak jest jego jej juz lub na nad nie o od oraz po pod "
+    "przez przy sie ta tak te to tym u w we z za ze".split()
+)
+
+# Inflectional endings stripped by the light stemmer, longest first (folded)
+_SUFFIXES = sorted(
+    (
+        "owaniami owaniach owaniem owania owanie aniami aniach eniami eniach aniem eniem ania anie enia enie "
+        "ami ach ego emu ych ymi imi iej owi ow om em ej ie ia iu y a e i o u"
+    ).split(),
+    key=len,
+    reverse=True,
+)
+_MIN_STEM = 3
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# BM25 parameters (the usual defaults, same as SQLite FTS5)
+_K1 = 1.2
+_B = 0.75
+
+
+_POLISH_LETTERS = str.maketrans("ąćęłńóśźż", "acelnoszz")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip diacritics: 'Łódź, ŻURAW' -> 'lodz, zuraw'."""
+    text = text.lower().translate(_POLISH_LETTERS)
+    if text.isascii():
+        return text
+    # Rare non-Polish accents: decompose and drop the combining marks
+    return "".join(ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch))
+
+
+@lru_cache(maxsize=100_000)
+def stem(token: str) -> str:
+    """Strip one inflectional ending, keeping at least a three-letter stem. Memoized: the vocabulary is small."""
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= _MIN_STEM:
+            return token[: -len(suffix)]
+    return token
+
+
+def analyze(text: str) -> List[str]:
+    """Turn text into index terms: fold, tokenize, drop stopwords, stem."""
+    return [stem(token) for token in _TOKEN_RE.findall(fold(text)) if token not in STOPWORDS]
+
+
+def search_text_of(app: dict) -> str:
+    """The searched part of an application: the free-text accident details."""
+    details = (app.get("form_data") or {}).get("szczegoly") or {}
+    return " ".join(details.get(field) or "" for field in SEARCH_FIELDS)
+
+
+class InvertedIndex:
+    """
+    Term -> {document id: term frequency} postings, maintained incrementally.
+
+    Queries match documents containing all query terms (after analysis) and
+    rank them with BM25. Intersection starts from the rarest term, so the
+    cost follows the most selective word rather than the collection size.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Tuple[str, ...]] = {}  # distinct terms per document, to remove it again
+        self._doc_lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def add(self, doc_id: str, text: str) -> None:
+        terms = analyze(text)
+        counts = Counter(sys.intern(term) for term in terms)
+        for term, count in counts.items():
+            self._postings.setdefault(term, {})[doc_id] = count
+        self._doc_terms[doc_id] = tuple(counts)
+        self._doc_lengths[doc_id] = len(terms)
+        self._total_length += len(terms)
+
+    def remove(self, doc_id: str) -> None:
+        for term in self._doc_terms.pop(doc_id, ()):
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id, 0)
+
+    def clear(self) -> None:
+        self._postings.clear()
+        self._doc_terms.clear()
+        self._doc_lengths.clear()
+        self._total_length = 0
+
+    def search(self, query: str, offset: int, limit: int) -> Tuple[List[Tuple[str, float]], int]:
+        """Return one page of (document id, score), best first, and the number of matches."""
+        terms = set(analyze(query))
+        if not terms or not self._doc_lengths:
+            return [], 0
+        postings = sorted((self._postings.get(term, {}) for term in terms), key=len)
+        if not postings[0]:
+            return [], 0
+
+        docs = len(self._doc_lengths)
+        avg_length = self._total_length / docs
+        idfs = [math.log(1 + (docs - len(p) + 0.5) / (len(p) + 0.5)) for p in postings]
+
+        # Set intersection of the key views runs in C, rarest term first
+        matches = postings[0].keys()
+        for other in postings[1:]:
+            matches = matches & other.keys()
+
+        lengths = self._doc_lengths
+        scored = []
+        for doc_id in matches:
+            norm = _K1 * (1 - _B + _B * lengths[doc_id] / avg_length)
+            score = 0.0
+            for idf, p in zip(idfs, postings):
+                tf = p[doc_id]
+                score += idf * tf * (_K1 + 1) / (tf + norm)
+            scored.append((score, doc_id))
+
+        top = heapq.nlargest(offset + limit, scored)
+        return [(doc_id, score) for score, doc_id in top[offset:]], len(scored)
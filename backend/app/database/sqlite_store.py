@@ -0,0 +1,936 @@
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+from app.database.base import StoreBackend, VersionConflict
+from app.database.blobs import BlobStore, BlobWriter
+from app.database.changes import STORE_CHANGE_LOG_SIZE, change_event
+from app.database.indexes import parse_accident_date
+from app.database.search import analyze, search_text_of
+from app.database.stats import AI_SUGGESTION_BUCKETS, NO_STATUS
+from app.models.schemas import AccidentReportFormData
+
+logger = logging.getLogger(__name__)
+
+# Fixed-width timestamp format so that text ordering equals chronological ordering
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS applications (
+    id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    pesel TEXT NOT NULL,
+    status TEXT,
+    ai_suggestion REAL,
+    ai_comments TEXT,
+    accident_date TEXT,
+    search_rowid INTEGER,
+    form_data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_applications_created ON applications (created_at, id);
+CREATE INDEX IF NOT EXISTS ix_applications_pesel ON applications (pesel, created_at);
+CREATE INDEX IF NOT EXISTS ix_applications_status ON applications (status, created_at);
+CREATE INDEX IF NOT EXISTS ix_applications_accident_date ON applications (accident_date);
+CREATE INDEX IF NOT EXISTS ix_applications_ai_suggestion ON applications (ai_suggestion);
+
+CREATE TABLE IF NOT EXISTS attachments (
+    id TEXT PRIMARY KEY,
+    application_id TEXT NOT NULL REFERENCES applications (id) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    mime_type TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    codec TEXT NOT NULL DEFAULT 'identity',
+    stored_bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_attachments_application ON attachments (application_id);
+CREATE INDEX IF NOT EXISTS ix_attachments_created_at ON attachments (created_at);
+
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    refcount INTEGER NOT NULL
+) WITHOUT ROWID;
+
+-- Full-text index; `content` holds the analyzed (folded, stemmed) terms of the accident description
+CREATE VIRTUAL TABLE IF NOT EXISTS applications_fts USING fts5 (content, id UNINDEXED);
+
+-- Store-wide counters; `version` numbers mutations across all workers
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO counters (name, value) VALUES ('version', 0);
+
+-- Recent mutations for the change feed (see changes_since), trimmed to the last STORE_CHANGE_LOG_SIZE versions
+CREATE TABLE IF NOT EXISTS changes (
+    version INTEGER NOT NULL,
+    op TEXT NOT NULL,
+    id TEXT NOT NULL,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_changes_version ON changes (version);
+
+-- Dashboard counters maintained by the triggers below (see get_stats)
+CREATE TABLE IF NOT EXISTS stats (
+    dimension TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, bucket)
+) WITHOUT ROWID;
+"""
+
+
+def _stats_buckets(row: str) -> List[Tuple[str, str]]:
+    """(dimension, bucket expression) pairs an applications row (NEW or OLD) is counted in."""
+    status = f"COALESCE({row}.status, '{NO_STATUS}')"
+    day = f"substr({row}.created_at, 1, 10)"
+    ai_bucket = (
+        f"CASE WHEN {row}.ai_suggestion IS NULL THEN 'none' "
+        f"ELSE CAST(MIN(CAST({row}.ai_suggestion * {AI_SUGGESTION_BUCKETS} AS INTEGER), {AI_SUGGESTION_BUCKETS - 1}) AS TEXT) END"
+    )
+    return [("total", "''"), ("status", status), ("day_status", f"{day} || '|' || {status}"), ("ai_suggestion", ai_bucket)]
+
+
+def _stats_add(dimension: str, bucket: str, delta: int) -> str:
+    return (
+        f"INSERT INTO stats (dimension, bucket, count) VALUES ('{dimension}', {bucket}, {delta}) "
+        f"ON CONFLICT (dimension, bucket) DO UPDATE SET count = count + {delta};"
+    )
+
+
+def _stats_row_delta(row: str, delta: int) -> str:
+    return "\n".join(_stats_add(dimension, bucket, delta) for dimension, bucket in _stats_buckets(row))
+
+
+# Every counter changes by a fixed amount per written row, so the cost does not grow with the data
+_STATS_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS applications_stats_insert AFTER INSERT ON applications BEGIN {_stats_row_delta('NEW', 1)} END",
+    f"CREATE TRIGGER IF NOT EXISTS applications_stats_delete AFTER DELETE ON applications BEGIN {_stats_row_delta('OLD', -1)} END",
+    "CREATE TRIGGER IF NOT EXISTS applications_stats_update AFTER UPDATE OF status, ai_suggestion ON applications "
+    f"BEGIN {_stats_row_delta('OLD', -1)} {_stats_row_delta('NEW', 1)} END",
+    # with_attachments counts applications that have at least one attachment (cascaded deletes fire too)
+    "CREATE TRIGGER IF NOT EXISTS attachments_stats_insert AFTER INSERT ON attachments "
+    "WHEN (SELECT COUNT(*) FROM attachments WHERE application_id = NEW.application_id) = 1 "
+    "BEGIN " + _stats_add("with_attachments", "''", 1) + " END",
+    "CREATE TRIGGER IF NOT EXISTS attachments_stats_delete AFTER DELETE ON attachments "
+    "WHEN NOT EXISTS (SELECT 1 FROM attachments WHERE application_id = OLD.application_id) "
+    "BEGIN " + _stats_add("with_attachments", "''", -1) + " END",
+]
+
+_APPLICATION_COLUMNS = "id, version, created_at, updated_at, pesel, status, ai_suggestion, ai_comments, form_data"
+_ATTACHMENT_COLUMNS = "id, title, mime_type, size_bytes, created_at, sha256, codec, stored_bytes"
+_QUALIFIED_APPLICATION_COLUMNS = ", ".join(f"a.{column.strip()}" for column in _APPLICATION_COLUMNS.split(","))
+
+
+def _to_db_time(value: datetime) -> str:
+    """Serialize a datetime as naive UTC text (the store works in UTC)."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime(_TIME_FORMAT)
+
+
+def _from_db_time(value: str) -> datetime:
+    return datetime.strptime(value, _TIME_FORMAT)
+
+
+def _accident_date(form_data: AccidentReportFormData) -> Optional[str]:
+    """Accident date as ISO text for the indexed column, None when it cannot be parsed."""
+    parsed = parse_accident_date(form_data.szczegoly.data)
+    return parsed.isoformat() if parsed else None
+
+
+def _search_content(form_data: dict) -> str:
+    """Analyzed terms for applications_fts, so FTS5 matches the same way as the in-memory index."""
+    return " ".join(analyze(search_text_of({"form_data": form_data})))
+
+
+class SQLiteStore(StoreBackend):
+    """
+    SQLite-backed store shared by all worker processes.
+    Runs in WAL mode so readers never block the single writer; every thread
+    gets its own connection with a statement cache, so the constant SQL below
+    is prepared once per connection and reused. Multi-statement reads run in
+    one read transaction and therefore see a single snapshot.
+
+    Full-text search uses an FTS5 table holding the output of the same
+    analyzer as the in-memory index; FTS5 then ranks the matches with BM25.
+
+    Every write transaction takes the next value of the `version` counter;
+    the rows it changes carry that number, as in InMemoryStore.
+
+    Attachment payloads live in a shared content-addressed BlobStore; the
+    `blobs` table counts references so identical uploads are stored once.
+    Blob files are only deleted under the write lock, after the transaction that
+    stopped using them has committed, which serializes that with concurrent
+    uploads of the same content from other workers.
+    """
+
+    def __init__(self, path: str, blobs: BlobStore):
+        self._path = path
+        self.blobs = blobs
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._connections: List[sqlite3.Connection] = []
+
+    def open(self) -> None:
+        conn = self._conn()
+        # Blob files a failed cleanup left behind. Under the write lock, so no other
+        # worker is between placing a new blob file and committing its reference
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            referenced = [row[0] for row in conn.execute("SELECT sha256 FROM blobs")]
+            self.blobs.sweep(referenced, keep_temporary=True)
+        finally:
+            conn.execute("COMMIT")
+
+    def close(self) -> None:
+        with self._schema_lock:
+            for conn in self._connections:
+                # Refresh the statistics SQLite's own planner uses to pick indexes
+                conn.execute("PRAGMA optimize")
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+        self.blobs.close()
+
+    @property
+    def version(self) -> int:
+        return self._conn().execute("SELECT value FROM counters WHERE name = 'version'").fetchone()[0]
+
+    def changes_since(self, version: int, limit: int = 1000) -> Optional[List[dict]]:
+        with self._read() as conn:
+            current = conn.execute("SELECT value FROM counters WHERE name = 'version'").fetchone()[0]
+            # The table keeps the versions above current - STORE_CHANGE_LOG_SIZE
+            if version > current or version < current - STORE_CHANGE_LOG_SIZE:
+                return None
+            rows = conn.execute(
+                "SELECT version, op, id, status FROM changes WHERE version > ? AND version <= ? ORDER BY version, rowid",
+                (version, version + limit),
+            )
+            return [change_event(row["version"], row["op"], row["id"], row["status"]) for row in rows]
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(
+            self._path,
+            isolation_level=None,  # explicit BEGIN/COMMIT below
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA busy_timeout=5000")
+
+        self._local.conn = conn
+        with self._schema_lock:
+            self._connections.append(conn)
+            if not self._schema_ready:
+                conn.executescript(_SCHEMA)
+                self._migrate()
+                self._schema_ready = True
+        return conn
+
+    def _migrate(self) -> None:
+        """
+        Bring databases created by older versions up to the current schema.
+        Runs in one write transaction, so workers starting together do it once.
+        """
+        with self._write() as conn:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(applications)")}
+            if "version" not in columns:
+                conn.execute("ALTER TABLE applications ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            if "search_rowid" not in columns:
+                conn.execute("ALTER TABLE applications ADD COLUMN search_rowid INTEGER")
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(attachments)")}
+            if "codec" not in columns:
+                conn.execute("ALTER TABLE attachments ADD COLUMN codec TEXT NOT NULL DEFAULT 'identity'")
+                conn.execute("ALTER TABLE attachments ADD COLUMN stored_bytes INTEGER")
+
+            # Count applications written before the stats triggers existed
+            has_triggers = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'applications_stats_insert'"
+            ).fetchone()
+            if not has_triggers:
+                for statement in _STATS_TRIGGERS:
+                    conn.execute(statement)
+                conn.execute("DELETE FROM stats")
+                for dimension, bucket in _stats_buckets("applications"):
+                    conn.execute(
+                        f"INSERT INTO stats (dimension, bucket, count) "
+                        f"SELECT '{dimension}', {bucket}, COUNT(*) FROM applications GROUP BY 2"
+                    )
+                conn.execute(
+                    "INSERT INTO stats (dimension, bucket, count) "
+                    "SELECT 'with_attachments', '', COUNT(DISTINCT application_id) FROM attachments"
+                )
+
+            # Index applications written before full-text search existed
+            rows = conn.execute("SELECT id, form_data FROM applications WHERE search_rowid IS NULL").fetchall()
+            for row in rows:
+                search_rowid = conn.execute(
+                    "INSERT INTO applications_fts (content, id) VALUES (?, ?)",
+                    (_search_content(json.loads(row["form_data"])), row["id"]),
+                ).lastrowid
+                conn.execute("UPDATE applications SET search_rowid = ? WHERE id = ?", (search_rowid, row["id"]))
+
+    @contextmanager
+    def _read(self) -> Iterator[sqlite3.Connection]:
+        """Run several queries against one consistent snapshot of the database."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """
+        Run a write transaction, taking the database write lock up front. Blob files
+        the transaction stopped using are deleted once it has committed.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.unused_blobs = []
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        if self._local.unused_blobs:
+            try:
+                self._delete_unused_blobs(conn, self._local.unused_blobs)
+            except Exception:
+                # The write itself succeeded; the files are swept when the store next opens
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                logger.exception("Failed to delete %d unused blob file(s)", len(set(self._local.unused_blobs)))
+
+    def _delete_unused_blobs(self, conn: sqlite3.Connection, hashes: List[str]) -> None:
+        """
+        Delete the files of blobs a committed transaction stopped using. Runs under the
+        write lock again, so an upload cannot start using one of them between the check
+        and the unlink; if it fails the files are only left over (until `open` sweeps
+        them), never missing.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sha256 in set(hashes):
+                if conn.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (sha256,)).fetchone() is None:
+                    self.blobs.delete(sha256)
+        finally:
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _next_version(conn: sqlite3.Connection) -> int:
+        """Take the next store-wide version number. Runs inside a write transaction."""
+        version = conn.execute(
+            "UPDATE counters SET value = value + 1 WHERE name = 'version' RETURNING value"
+        ).fetchone()[0]
+        conn.execute("DELETE FROM changes WHERE version <= ?", (version - STORE_CHANGE_LOG_SIZE,))
+        return version
+
+    @staticmethod
+    def _log_change(conn: sqlite3.Connection, version: int, op: str, app_id: str, status: Optional[str] = None) -> None:
+        """Record a change event for the change feed. Runs inside the write transaction making the change."""
+        conn.execute("INSERT INTO changes (version, op, id, status) VALUES (?, ?, ?, ?)", (version, op, app_id, status))
+
+    def _attachment_ids(self, conn: sqlite3.Connection, app_ids: List[str]) -> Dict[str, List[str]]:
+        """Fetch attachment ids (in insertion order) for a batch of applications."""
+        result: Dict[str, List[str]] = {aid: [] for aid in app_ids}
+        if not app_ids:
+            return result
+        placeholders = ",".join("?" * len(app_ids))
+        rows = conn.execute(
+            f"SELECT application_id, id FROM attachments WHERE application_id IN ({placeholders}) ORDER BY rowid",
+            app_ids,
+        )
+        for row in rows:
+            result[row["application_id"]].append(row["id"])
+        return result
+
+    @staticmethod
+    def _row_to_application(row: sqlite3.Row, attachment_ids: List[str]) -> dict:
+        return {
+            "id": row["id"],
+            "version": row["version"],
+            "created_at": _from_db_time(row["created_at"]),
+            "updated_at": _from_db_time(row["updated_at"]),
+            "pesel": row["pesel"],
+            "form_data": json.loads(row["form_data"]),
+            "ai_suggestion": row["ai_suggestion"],
+            "ai_comments": json.loads(row["ai_comments"]) if row["ai_comments"] is not None else None,
+            "status": row["status"],
+            "attachment_ids": attachment_ids,
+        }
+
+    @staticmethod
+    def _row_to_attachment(row: sqlite3.Row) -> dict:
+        return {
+            "id": row["id"],
+            "title": row["title"],
+            "mime_type": row["mime_type"],
+            "sha256": row["sha256"],
+            "size_bytes": row["size_bytes"],
+            "codec": row["codec"],
+            # Attachments recorded before compression existed are stored as uploaded
+            "stored_bytes": row["stored_bytes"] if row["stored_bytes"] is not None else row["size_bytes"],
+            "created_at": _from_db_time(row["created_at"]),
+        }
+
+    def _unref_blobs(self, conn: sqlite3.Connection, hashes: List[str]) -> None:
+        """
+        Drop one reference per hash, forgetting blobs nobody uses any more; their files go
+        when the transaction commits (see `_write`). Runs inside a write transaction.
+        """
+        for sha256 in hashes:
+            conn.execute("UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = ?", (sha256,))
+            row = conn.execute("SELECT refcount FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            if row is not None and row["refcount"] <= 0:
+                conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+                self._local.unused_blobs.append(sha256)
+
+    def _fetch_application(self, conn: sqlite3.Connection, app_id: str) -> Optional[dict]:
+        row = conn.execute(
+            f"SELECT {_APPLICATION_COLUMNS} FROM applications WHERE id = ?", (app_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return self._row_to_application(row, self._attachment_ids(conn, [app_id])[app_id])
+
+    def create_application(
+        self,
+        form_data: AccidentReportFormData,
+        status: Optional[str] = None,
+        ai_suggestion: Optional[float] = None,
+        ai_comments: Optional[Dict] = None,
+    ) -> dict:
+        """Create a new application and return it."""
+        app_id = str(uuid4())
+        now = _to_db_time(datetime.utcnow())
+        form_json = form_data.model_dump_json()
+        search_content = _search_content(form_data.model_dump())
+
+        with self._write() as conn:
+            version = self._next_version(conn)
+            search_rowid = conn.execute(
+                "INSERT INTO applications_fts (content, id) VALUES (?, ?)", (search_content, app_id)
+            ).lastrowid
+            conn.execute(
+                f"INSERT INTO applications ({_APPLICATION_COLUMNS}, accident_date, search_rowid) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    app_id,
+                    version,
+                    now,
+                    now,
+                    form_data.poszkodowany.pesel,
+                    status,
+                    ai_suggestion,
+                    json.dumps(ai_comments) if ai_comments is not None else None,
+                    form_json,
+                    _accident_date(form_data),
+                    search_rowid,
+                ),
+            )
+            self._log_change(conn, version, "create", app_id, status)
+            return self._fetch_application(conn, app_id)
+
+    def create_applications(self, applications: List[dict]) -> List[Optional[dict]]:
+        """
+        Create a batch of applications in one write transaction, each taking a version.
+        Returns them in input order, None where the id already exists.
+        """
+        now = datetime.utcnow()
+        prepared = []
+        for item in applications:
+            form_data = item["form_data"]
+            created_at = _to_db_time(item.get("created_at") or now)
+            prepared.append({
+                "id": item.get("id") or str(uuid4()),
+                "created_at": created_at,
+                "updated_at": _to_db_time(item["updated_at"]) if item.get("updated_at") else created_at,
+                "pesel": form_data.poszkodowany.pesel,
+                "status": item.get("status"),
+                "ai_suggestion": item.get("ai_suggestion"),
+                "ai_comments": item.get("ai_comments"),
+                "form_json": form_data.model_dump_json(),
+                "accident_date": _accident_date(form_data),
+                "search_content": _search_content(form_data.model_dump()),
+            })
+
+        created: List[Optional[dict]] = []
+        with self._write() as conn:
+            for row in prepared:
+                if conn.execute("SELECT 1 FROM applications WHERE id = ?", (row["id"],)).fetchone() is not None:
+                    created.append(None)
+                    continue
+                version = self._next_version(conn)
+                search_rowid = conn.execute(
+                    "INSERT INTO applications_fts (content, id) VALUES (?, ?)", (row["search_content"], row["id"])
+                ).lastrowid
+                conn.execute(
+                    f"INSERT INTO applications ({_APPLICATION_COLUMNS}, accident_date, search_rowid) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        row["id"],
+                        version,
+                        row["created_at"],
+                        row["updated_at"],
+                        row["pesel"],
+                        row["status"],
+                        row["ai_suggestion"],
+                        json.dumps(row["ai_comments"]) if row["ai_comments"] is not None else None,
+                        row["form_json"],
+                        row["accident_date"],
+                        search_rowid,
+                    ),
+                )
+                self._log_change(conn, version, "create", row["id"], row["status"])
+                created.append({
+                    "id": row["id"],
+                    "version": version,
+                    "created_at": _from_db_time(row["created_at"]),
+                    "updated_at": _from_db_time(row["updated_at"]),
+                    "pesel": row["pesel"],
+                    "form_data": json.loads(row["form_json"]),
+                    "ai_suggestion": row["ai_suggestion"],
+                    "ai_comments": row["ai_comments"],
+                    "status": row["status"],
+                    "attachment_ids": [],
+                })
+        return created
+
+    def get_application(self, app_id: str) -> Optional[dict]:
+        """Get an application by ID."""
+        with self._read() as conn:
+            return self._fetch_application(conn, app_id)
+
+    def list_applications(
+        self,
+        page: int = 1,
+        page_size: int = 10,
+        pesel: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        status: Optional[str] = None,
+        accident_date_from: Optional[date] = None,
+        accident_date_to: Optional[date] = None,
+        ai_suggestion_min: Optional[float] = None,
+        ai_suggestion_max: Optional[float] = None,
+        after: Optional[Tuple[datetime, str]] = None,
+        exact_total: bool = True,
+    ) -> tuple[List[dict], Optional[int]]:
+        """
+        List applications with pagination and filters.
+        Returns (items, total_count)
+        """
+        clauses = []
+        params: list = []
+        if pesel:
+            clauses.append("pesel = ?")
+            params.append(pesel)
+        if date_from:
+            clauses.append("created_at >= ?")
+            params.append(_to_db_time(date_from))
+        if date_to:
+            clauses.append("created_at <= ?")
+            params.append(_to_db_time(date_to))
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if accident_date_from:
+            clauses.append("accident_date >= ?")
+            params.append(accident_date_from.isoformat())
+        if accident_date_to:
+            clauses.append("accident_date <= ?")
+            params.append(accident_date_to.isoformat())
+        if ai_suggestion_min is not None:
+            clauses.append("ai_suggestion >= ?")
+            params.append(ai_suggestion_min)
+        if ai_suggestion_max is not None:
+            clauses.append("ai_suggestion <= ?")
+            params.append(ai_suggestion_max)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        page_clauses = list(clauses)
+        page_params = list(params)
+        if after is not None:
+            # Row-value comparison walks ix_applications_created from the cursor position
+            page_clauses.append("(created_at, id) < (?, ?)")
+            page_params += [_to_db_time(after[0]), after[1]]
+        page_where = f"WHERE {' AND '.join(page_clauses)}" if page_clauses else ""
+
+        # The count and the page must see the same snapshot
+        with self._read() as conn:
+            total = None
+            if exact_total:
+                total = conn.execute(f"SELECT COUNT(*) FROM applications {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {_APPLICATION_COLUMNS} FROM applications {page_where} "
+                "ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+                [*page_params, page_size, (page - 1) * page_size],
+            ).fetchall()
+            attachment_ids = self._attachment_ids(conn, [row["id"] for row in rows])
+
+        return [self._row_to_application(row, attachment_ids[row["id"]]) for row in rows], total
+
+    def search_applications(self, query: str, page: int = 1, page_size: int = 10) -> Tuple[List[Tuple[dict, float]], int]:
+        """
+        Full-text search over the accident descriptions, best match first.
+        Returns ([(application, score)], total_count)
+        """
+        terms = set(analyze(query))
+        if not terms:
+            return [], 0
+        # Terms are plain [a-z0-9] words; quoted and space-separated they must all match
+        match = " ".join(f'"{term}"' for term in terms)
+
+        with self._read() as conn:
+            total = conn.execute(
+                "SELECT COUNT(*) FROM applications_fts WHERE applications_fts MATCH ?", (match,)
+            ).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {_QUALIFIED_APPLICATION_COLUMNS}, bm25(applications_fts) AS rank "
+                "FROM applications_fts JOIN applications a ON a.id = applications_fts.id "
+                "WHERE applications_fts MATCH ? ORDER BY rank LIMIT ? OFFSET ?",
+                (match, page_size, (page - 1) * page_size),
+            ).fetchall()
+            attachment_ids = self._attachment_ids(conn, [row["id"] for row in rows])
+
+        # FTS5 ranks better matches with more negative values
+        return [(self._row_to_application(row, attachment_ids[row["id"]]), -row["rank"]) for row in rows], total
+
+    def get_stats(self) -> dict:
+        """Dashboard counters, maintained by triggers on every write."""
+        stats = {
+            "total": 0,
+            "with_attachments": 0,
+            "by_status": {},
+            "by_day": {},
+            "ai_suggestion_histogram": [0] * AI_SUGGESTION_BUCKETS,
+            "ai_suggestion_missing": 0,
+        }
+        rows = self._conn().execute(
+            "SELECT dimension, bucket, count FROM stats WHERE count != 0 ORDER BY dimension, bucket"
+        )
+        for dimension, bucket, count in rows:
+            if dimension in ("total", "with_attachments"):
+                stats[dimension] = count
+            elif dimension == "status":
+                stats["by_status"][bucket] = count
+            elif dimension == "day_status":
+                # Buckets are "YYYY-MM-DD|status"
+                stats["by_day"].setdefault(bucket[:10], {})[bucket[11:]] = count
+            elif bucket == "none":
+                stats["ai_suggestion_missing"] = count
+            else:
+                stats["ai_suggestion_histogram"][int(bucket)] = count
+        return stats
+
+    def update_application(
+        self,
+        app_id: str,
+        form_data: Optional[AccidentReportFormData] = None,
+        ai_suggestion: Optional[float] = None,
+        ai_comments: Optional[Dict] = None,
+        status: Optional[str] = None,
+        expected_version: Optional[int] = None,
+    ) -> Optional[dict]:
+        """
+        Update an application. Returns updated application or None if not found.
+        Raises VersionConflict if `expected_version` is given and no longer current.
+        """
+        assignments = ["updated_at = ?"]
+        params: list = [_to_db_time(datetime.utcnow())]
+        if form_data is not None:
+            assignments += ["form_data = ?", "pesel = ?", "accident_date = ?"]
+            params += [form_data.model_dump_json(), form_data.poszkodowany.pesel, _accident_date(form_data)]
+        if ai_suggestion is not None:
+            assignments.append("ai_suggestion = ?")
+            params.append(ai_suggestion)
+        if ai_comments is not None:
+            assignments.append("ai_comments = ?")
+            params.append(json.dumps(ai_comments))
+        if status is not None:
+            assignments.append("status = ?")
+            params.append(status)
+
+        search_content = _search_content(form_data.model_dump()) if form_data is not None else None
+
+        with self._write() as conn:
+            # Checked before a version is taken: a missing application or a conflict changes nothing
+            row = conn.execute("SELECT version FROM applications WHERE id = ?", (app_id,)).fetchone()
+            if row is None:
+                return None
+            if expected_version is not None and row["version"] != expected_version:
+                raise VersionConflict(app_id, row["version"])
+            version = self._next_version(conn)
+            conn.execute(
+                f"UPDATE applications SET {', '.join(assignments)}, version = ? WHERE id = ?",
+                [*params, version, app_id],
+            )
+            if search_content is not None:
+                conn.execute(
+                    "UPDATE applications_fts SET content = ? "
+                    "WHERE rowid = (SELECT search_rowid FROM applications WHERE id = ?)",
+                    (search_content, app_id),
+                )
+            app = self._fetch_application(conn, app_id)
+            self._log_change(conn, version, "update", app_id, app["status"])
+            return app
+
+    def delete_application(self, app_id: str) -> bool:
+        """
+        Hard delete an application and all its attachments.
+        Returns True if deleted, False if not found.
+        """
+        with self._write() as conn:
+            if not self._delete_application(conn, app_id):
+                return False
+            self._log_change(conn, self._next_version(conn), "delete", app_id)
+            return True
+
+    def _delete_application(self, conn: sqlite3.Connection, app_id: str) -> bool:
+        """Delete an application with its search entry and attachments. Runs inside a write transaction."""
+        hashes = [
+            row["sha256"]
+            for row in conn.execute("SELECT sha256 FROM attachments WHERE application_id = ?", (app_id,))
+        ]
+        conn.execute(
+            "DELETE FROM applications_fts WHERE rowid = (SELECT search_rowid FROM applications WHERE id = ?)",
+            (app_id,),
+        )
+        # Attachments go with it through ON DELETE CASCADE
+        cursor = conn.execute("DELETE FROM applications WHERE id = ?", (app_id,))
+        if cursor.rowcount == 0:
+            return False
+        self._unref_blobs(conn, hashes)
+        return True
+
+    def apply_bulk(self, operations: List[dict]) -> List[dict]:
+        """
+        Apply updates and deletions in one write transaction. Like the single-record
+        calls, every applied operation takes a version of its own.
+        """
+        results = []
+        now = _to_db_time(datetime.utcnow())
+        with self._write() as conn:
+            for operation in operations:
+                app_id = operation["id"]
+                row = conn.execute("SELECT version, status FROM applications WHERE id = ?", (app_id,)).fetchone()
+                if row is None:
+                    results.append({"id": app_id, "result": "not_found", "version": None})
+                    continue
+
+                expected_version = operation.get("expected_version")
+                if expected_version is not None and row["version"] != expected_version:
+                    results.append({"id": app_id, "result": "conflict", "version": row["version"]})
+                    continue
+
+                version = self._next_version(conn)
+                if operation["op"] == "delete":
+                    self._delete_application(conn, app_id)
+                    self._log_change(conn, version, "delete", app_id)
+                    results.append({"id": app_id, "result": "deleted", "version": None})
+                    continue
+
+                assignments = ["updated_at = ?", "version = ?"]
+                params: list = [now, version]
+                if operation.get("status") is not None:
+                    assignments.append("status = ?")
+                    params.append(operation["status"])
+                if operation.get("ai_suggestion") is not None:
+                    assignments.append("ai_suggestion = ?")
+                    params.append(operation["ai_suggestion"])
+                if operation.get("ai_comments") is not None:
+                    assignments.append("ai_comments = ?")
+                    params.append(json.dumps(operation["ai_comments"]))
+                conn.execute(f"UPDATE applications SET {', '.join(assignments)} WHERE id = ?", [*params, app_id])
+                self._log_change(conn, version, "update", app_id, operation.get("status") or row["status"])
+                results.append({"id": app_id, "result": "updated", "version": version})
+        return results
+
+    def create_attachment(
+        self,
+        app_id: str,
+        title: str,
+        mime_type: str,
+        data_base64: str,
+    ) -> Optional[dict]:
+        """
+        Create an attachment for an application.
+        Returns attachment dict or None if application not found.
+        """
+        data_bytes = base64.b64decode(data_base64)
+        sha256 = self.blobs.digest(data_bytes)
+        # Write (and compress) the payload outside the transaction; identical payloads are stored once
+        self.blobs.put(data_bytes, sha256)
+
+        with self._write() as conn:
+            # Another worker may have dropped the last reference (and the file) since put()
+            self.blobs.put(data_bytes, sha256)
+            return self._insert_attachment_or_release(conn, app_id, title, mime_type, sha256, len(data_bytes))
+
+    def create_attachment_from_blob(
+        self,
+        app_id: str,
+        title: str,
+        mime_type: str,
+        writer: BlobWriter,
+    ) -> Optional[dict]:
+        """
+        Create an attachment from a streamed payload.
+        Returns attachment dict or None if application not found.
+        """
+        # The fsync happens here, before the write lock is taken
+        sha256 = writer.finish()
+
+        with self._write() as conn:
+            # Blob files are only deleted under the write lock, so this cannot race with that
+            self.blobs.commit(writer)
+            return self._insert_attachment_or_release(conn, app_id, title, mime_type, sha256, writer.size)
+
+    def _insert_attachment_or_release(
+        self,
+        conn: sqlite3.Connection,
+        app_id: str,
+        title: str,
+        mime_type: str,
+        sha256: str,
+        size_bytes: int,
+    ) -> Optional[dict]:
+        """
+        `_insert_attachment` for a payload just placed in the blob store, deleting it again
+        if the application does not exist and no other attachment uses it.
+        """
+        attachment = self._insert_attachment(conn, app_id, title, mime_type, sha256, size_bytes)
+        if attachment is None:
+            self._local.unused_blobs.append(sha256)
+        return attachment
+
+    def _insert_attachment(
+        self,
+        conn: sqlite3.Connection,
+        app_id: str,
+        title: str,
+        mime_type: str,
+        sha256: str,
+        size_bytes: int,
+    ) -> Optional[dict]:
+        """
+        Record an attachment and take a reference on its blob (the caller places the payload first).
+        Returns None if the application does not exist. Runs inside a write transaction.
+        """
+        att_id = str(uuid4())
+        now = _to_db_time(datetime.utcnow())
+        if conn.execute("SELECT 1 FROM applications WHERE id = ?", (app_id,)).fetchone() is None:
+            return None
+        version = self._next_version(conn)
+        updated = conn.execute(
+            "UPDATE applications SET updated_at = ?, version = ? WHERE id = ? RETURNING status",
+            (now, version, app_id),
+        ).fetchone()
+        # An identical payload stored earlier keeps its codec, whatever this upload would have used
+        codec, stored_bytes = self.blobs.stored_info(sha256)
+        conn.execute(
+            "INSERT INTO blobs (sha256, refcount) VALUES (?, 1) "
+            "ON CONFLICT (sha256) DO UPDATE SET refcount = refcount + 1",
+            (sha256,),
+        )
+        conn.execute(
+            f"INSERT INTO attachments ({_ATTACHMENT_COLUMNS}, application_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (att_id, title, mime_type, size_bytes, now, sha256, codec, stored_bytes, app_id),
+        )
+        self._log_change(conn, version, "update", app_id, updated["status"])
+        return {
+            "id": att_id,
+            "title": title,
+            "mime_type": mime_type,
+            "sha256": sha256,
+            "size_bytes": size_bytes,
+            "codec": codec,
+            "stored_bytes": stored_bytes,
+            "created_at": _from_db_time(now),
+        }
+
+    def get_attachment(self, att_id: str) -> Optional[dict]:
+        """Get an attachment by ID."""
+        row = self._conn().execute(
+            f"SELECT {_ATTACHMENT_COLUMNS} FROM attachments WHERE id = ?", (att_id,)
+        ).fetchone()
+        return self._row_to_attachment(row) if row is not None else None
+
+    def get_application_attachments(self, app_id: str) -> List[dict]:
+        """Get all attachments for an application."""
+        rows = self._conn().execute(
+            f"SELECT {_ATTACHMENT_COLUMNS} FROM attachments WHERE application_id = ? ORDER BY rowid",
+            (app_id,),
+        )
+        return [self._row_to_attachment(row) for row in rows]
+
+    def expired_attachments(self, created_before: datetime, limit: int) -> List[Tuple[str, str]]:
+        rows = self._conn().execute(
+            "SELECT application_id, id FROM attachments WHERE created_at < ? LIMIT ?",
+            (_to_db_time(created_before), limit),
+        )
+        return [(row["application_id"], row["id"]) for row in rows]
+
+    def attachment_storage_stats(self) -> Dict[str, dict]:
+        rows = self._conn().execute(
+            "SELECT mime_type, COUNT(*) AS attachments, SUM(size_bytes) AS size_bytes, "
+            "SUM(COALESCE(stored_bytes, size_bytes)) AS stored_bytes, "
+            "SUM(codec != 'identity') AS compressed "
+            "FROM attachments GROUP BY mime_type"
+        )
+        return {
+            row["mime_type"]: {
+                "attachments": row["attachments"],
+                "size_bytes": row["size_bytes"],
+                "stored_bytes": row["stored_bytes"],
+                "compressed": row["compressed"],
+            }
+            for row in rows
+        }
+
+    def delete_attachment(self, app_id: str, att_id: str) -> bool:
+        """
+        Delete an attachment from an application.
+        Returns True if deleted, False if not found.
+        """
+        with self._write() as conn:
+            row = conn.execute(
+                "SELECT sha256 FROM attachments WHERE id = ? AND application_id = ?", (att_id, app_id)
+            ).fetchone()
+            if row is None:
+                return False
+            conn.execute("DELETE FROM attachments WHERE id = ?", (att_id,))
+            self._unref_blobs(conn, [row["sha256"]])
+            version = self._next_version(conn)
+            updated = conn.execute(
+                "UPDATE applications SET updated_at = ?, version = ? WHERE id = ? RETURNING status",
+                (_to_db_time(datetime.utcnow()), version, app_id),
+            ).fetchone()
+            self._log_change(conn, version, "update", app_id, updated["status"])
+            return True
@@ -0,0 +1,77 @@
+from collections import Counter
+from typing import Dict, Optional
+
+# ai_suggestion histogram: [0.0, 0.1), [0.1, 0.2), ..., [0.9, 1.0]
+AI_SUGGESTION_BUCKETS = 10
+
+# Key used for applications without a status
+NO_STATUS = "none"
+
+
+def status_key(status: Optional[str]) -> str:
+    return status if status is not None else NO_STATUS
+
+
+def ai_suggestion_bucket(value: float) -> int:
+    return min(int(value * AI_SUGGESTION_BUCKETS), AI_SUGGESTION_BUCKETS - 1)
+
+
+class ApplicationStats:
+    """
+    Dashboard counters over the in-memory applications.
+    Adding or removing an application touches a fixed number of counters, so
+    the store keeps them current on every mutation (an update is remove + add).
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self.total = 0
+        self.with_attachments = 0
+        self.by_status: Counter = Counter()
+        self.by_day: Dict[str, Counter] = {}  # ISO date of created_at -> status -> count
+        self.ai_suggestion_histogram = [0] * AI_SUGGESTION_BUCKETS
+        self.ai_suggestion_missing = 0
+
+    def add(self, app: dict) -> None:
+        self._count(app, 1)
+
+    def remove(self, app: dict) -> None:
+        self._count(app, -1)
+
+    def _count(self, app: dict, delta: int) -> None:
+        status = status_key(app.get("status"))
+        day = app["created_at"].date().isoformat()
+
+        self.total += delta
+        if app["attachment_ids"]:
+            self.with_attachments += delta
+
+        self.by_status[status] += delta
+        if not self.by_status[status]:
+            del self.by_status[status]
+
+        per_day = self.by_day.setdefault(day, Counter())
+        per_day[status] += delta
+        if not per_day[status]:
+            del per_day[status]
+            if not per_day:
+                del self.by_day[day]
+
+        suggestion = app.get("ai_suggestion")
+        if suggestion is None:
+            self.ai_suggestion_missing += delta
+        else:
+            self.ai_suggestion_histogram[ai_suggestion_bucket(suggestion)] += delta
+
+    def snapshot(self) -> dict:
+        """Copy of the counters in the format of `StoreBackend.get_stats`."""
+        return {
+            "total": self.total,
+            "with_attachments": self.with_attachments,
+            "by_status": dict(self.by_status),
+            "by_day": {day: dict(per_day) for day, per_day in sorted(self.by_day.items())},
+            "ai_suggestion_histogram": list(self.ai_suggestion_histogram),
+            "ai_suggestion_missing": self.ai_suggestion_missing,
+        }
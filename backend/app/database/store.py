@@ -1,23 +1,155 @@
 import base64
-import threading
-from datetime import datetime
-from typing import Dict, List, Optional
+import gc
+import os
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
 from uuid import uuid4
 
+from app.database.base import StoreBackend, VersionConflict
+from app.database.blobs import CODEC_IDENTITY, BlobCache, BlobStore, BlobWriter
+from app.database.changes import ChangeLog, change_event
+from app.database.indexes import ApplicationFilters, ApplicationIndexes, to_naive_utc
+from app.database.locks import ReadWriteLock, StripedLock
+from app.database.persistence import StoreJournal
+from app.database.records import ApplicationRecord, FrozenRecord
+from app.database.stats import ApplicationStats
 from app.models.schemas import AccidentReportFormData
 
+# "memory" keeps data per process; "sqlite" shares one database between all workers
+STORE_BACKEND = os.getenv("STORE_BACKEND", "memory")
+STORE_SQLITE_PATH = os.getenv("STORE_SQLITE_PATH", "data/store.db")
+# Attachment payloads for the SQLite backend (journaled in-memory stores keep them in STORE_DATA_DIR/blobs)
+STORE_BLOB_DIR = os.getenv("STORE_BLOB_DIR", "data/blobs")
+# Memory tier for hot attachment payloads (per worker); 0 disables it
+STORE_BLOB_CACHE_MB = int(os.getenv("STORE_BLOB_CACHE_MB", "64"))
+STORE_BLOB_CACHE_MAX_ITEM_KB = int(os.getenv("STORE_BLOB_CACHE_MAX_ITEM_KB", "2048"))
 
-class InMemoryStore:
+# Journal for the in-memory backend; leave STORE_DATA_DIR empty to keep data in memory only
+STORE_DATA_DIR = os.getenv("STORE_DATA_DIR", "")
+STORE_WAL_FSYNC = os.getenv("STORE_WAL_FSYNC", "batch")  # always | batch | off
+STORE_WAL_FSYNC_INTERVAL_MS = int(os.getenv("STORE_WAL_FSYNC_INTERVAL_MS", "50"))
+STORE_SNAPSHOT_EVERY = int(os.getenv("STORE_SNAPSHOT_EVERY", "50000"))
+
+
+class InMemoryStore(StoreBackend):
     """
     Thread-safe in-memory data store for applications and attachments.
-    Uses a lock to guard mutations in a multithreaded environment.
+    Records are immutable snapshots (compact ApplicationRecords, FrozenRecord
+    attachments): a mutation builds the next version and swaps it into the
+    map, so `get_*` calls read without locking and always see one consistent
+    version. Every mutation takes the next
+    store-wide `version` number, which the changed application carries.
+    
+    Listings share a reader-writer lock with the (in place updated) indexes and
+    only wait for the short exclusive section in which a mutation is applied.
+    Expensive preparation (model dumps, base64 decoding, hashing, blob writes)
+    happens before that section, under a per-application stripe lock so
+    concurrent mutations of one record stay ordered.
+    
+    With a journal every mutation is first appended to the write-ahead log
+    and then applied through one of the `_apply_*` methods, which are also
+    used to replay the log on startup.
+    
+    Attachment payloads live in a content-addressed BlobStore; the store only
+    keeps their metadata and how many attachments reference each blob.
     """
     
-    def __init__(self):
-        self._lock = threading.Lock()
-        self._applications: Dict[str, dict] = {}
-        self._attachments: Dict[str, dict] = {}
-        self._pesel_index: Dict[str, List[str]] = {}  # pesel -> list of application ids
+    def __init__(self, journal: Optional[StoreJournal] = None, blobs: Optional[BlobStore] = None):
+        self._lock = ReadWriteLock()
+        self._record_locks = StripedLock()
+        self._journal = journal
+        self._replaying = False
+        self.blobs = blobs or BlobStore.temporary()
+        self._version = 0  # version of the last applied mutation
+        self._applications: Dict[str, ApplicationRecord] = {}
+        self._attachments: Dict[str, FrozenRecord] = {}
+        self._indexes = ApplicationIndexes()  # pesel, status, created_at, accident date, ai_suggestion
+        self._stats = ApplicationStats()  # dashboard counters
+        self._blob_refs: Dict[str, int] = {}  # sha256 -> number of attachments using the blob
+        self._changes = ChangeLog()  # recent mutations for the change feed
+    
+    def open(self) -> None:
+        """Restore the latest snapshot plus the WAL tail, then start journaling."""
+        if self._journal is None:
+            return
+        # Unpickling allocates millions of containers; keep the cyclic GC from rescanning them all the time
+        gc.disable()
+        try:
+            with self._lock.write():
+                state, records = self._journal.recover()
+                if state is not None:
+                    self._version = state["version"]
+                    self._changes.reset(self._version)
+                    self._applications = state["applications"]
+                    self._attachments = state["attachments"]
+                    self._indexes.clear()
+                    self._stats.clear()
+                    for app in self._applications.values():
+                        self._indexes.add(app)
+                        self._stats.add(app)
+                    self._blob_refs = {}
+                    for att in self._attachments.values():
+                        self._blob_refs[att["sha256"]] = self._blob_refs.get(att["sha256"], 0) + 1
+                # A blob deleted early in the log may be re-added later, so replay
+                # only counts references and unreferenced blobs are swept at the end
+                self._replaying = True
+                for op, args in records:
+                    getattr(self, f"_apply_{op}")(*args)
+                self._replaying = False
+                self.blobs.sweep(self._blob_refs)
+                self._journal.start()
+        finally:
+            gc.enable()
+        # The restored records are long-lived; move them out of future GC passes
+        gc.freeze()
+    
+    def close(self) -> None:
+        """Write a final snapshot so the next start only has to load it."""
+        if self._journal is not None:
+            with self._lock.write():
+                self._journal.snapshot(self._snapshot_state(), background=False)
+                self._journal.close()
+        self.blobs.close()
+    
+    @property
+    def version(self) -> int:
+        return self._version
+    
+    def changes_since(self, version: int, limit: int = 1000) -> Optional[List[dict]]:
+        return self._changes.since(version, limit)
+    
+    def _snapshot_state(self) -> dict:
+        """
+        Copy the state for a snapshot. Must be called under the write lock.
+        Records are immutable, so copying the maps is enough.
+        """
+        return {
+            "version": self._version,
+            "applications": dict(self._applications),
+            "attachments": dict(self._attachments),
+        }
+    
+    def _log(self, op: str, *args) -> None:
+        """Append a mutation to the journal (if any). Must be called under the write lock."""
+        if self._journal is None:
+            return
+        # Snapshot before appending: the state must match the journal's sequence number
+        if self._journal.should_snapshot():
+            self._journal.snapshot(self._snapshot_state())
+        self._journal.append(op, *args)
+    
+    def _ref_blob(self, sha256: str) -> None:
+        self._blob_refs[sha256] = self._blob_refs.get(sha256, 0) + 1
+    
+    def _unref_blob(self, sha256: str) -> None:
+        """Drop one reference; the payload is deleted with the last one. Must be called under the write lock."""
+        refs = self._blob_refs.get(sha256, 0) - 1
+        if refs > 0:
+            self._blob_refs[sha256] = refs
+            return
+        self._blob_refs.pop(sha256, None)
+        if not self._replaying:
+            self.blobs.delete(sha256)
     
     def create_application(
         self,
@@ -27,36 +159,76 @@ class InMemoryStore:
         ai_comments: Optional[Dict] = None,
     ) -> dict:
         """Create a new application and return it."""
-        with self._lock:
-            app_id = str(uuid4())
-            pesel = form_data.poszkodowany.pesel
+        app_id = str(uuid4())
+        form_dict = form_data.model_dump()
+        
+        with self._lock.write():
             now = datetime.utcnow()
             
-            application = {
-                "id": app_id,
-                "created_at": now,
-                "updated_at": now,
-                "pesel": pesel,
-                "form_data": form_data.model_dump(),
-                "ai_suggestion": ai_suggestion,
-                "ai_comments": ai_comments,
-                "status": status,
-                "attachment_ids": [],
-            }
+            application = ApplicationRecord(
+                id=app_id,
+                version=self._version + 1,
+                created_at=now,
+                updated_at=now,
+                pesel=form_data.poszkodowany.pesel,
+                form_data=form_dict,
+                ai_suggestion=ai_suggestion,
+                ai_comments=ai_comments,
+                status=status,
+            )
             
-            self._applications[app_id] = application
-            
-            # Update PESEL index
-            if pesel not in self._pesel_index:
-                self._pesel_index[pesel] = []
-            self._pesel_index[pesel].append(app_id)
+            self._log("create_application", application)
+            self._apply_create_application(application)
             
             return application
     
+    def create_applications(self, applications: List[dict]) -> List[Optional[dict]]:
+        """
+        Create a batch of applications under a single write lock acquisition.
+        Returns them in input order, None where the id already exists.
+        """
+        # Encode the records before locking; only the version is assigned inside
+        now = datetime.utcnow()
+        prepared = []
+        for item in applications:
+            form_data = item["form_data"]
+            created_at = to_naive_utc(item.get("created_at")) or now
+            prepared.append(ApplicationRecord(
+                id=item.get("id") or str(uuid4()),
+                version=0,
+                created_at=created_at,
+                updated_at=to_naive_utc(item.get("updated_at")) or created_at,
+                pesel=form_data.poszkodowany.pesel,
+                form_data=form_data.model_dump(),
+                ai_suggestion=item.get("ai_suggestion"),
+                ai_comments=item.get("ai_comments"),
+                status=item.get("status"),
+            ))
+    
+        created: List[Optional[dict]] = []
+        with self._lock.write():
+            for record in prepared:
+                if record["id"] in self._applications:
+                    created.append(None)
+                    continue
+                application = record.replace(version=self._version + 1)
+                self._log("create_application", application)
+                self._apply_create_application(application)
+                created.append(application)
+        return created
+    
+    def _apply_create_application(self, application: ApplicationRecord) -> None:
+        self._applications[application["id"]] = application
+        self._indexes.add(application)
+        self._stats.add(application)
+        self._changes.append(
+            change_event(application["version"], "create", application["id"], application["status"])
+        )
+        self._version = application["version"]
+    
     def get_application(self, app_id: str) -> Optional[dict]:
-        """Get an application by ID."""
-        with self._lock:
-            return self._applications.get(app_id)
+        """Get an application by ID. Lock-free: the returned record is an immutable snapshot."""
+        return self._applications.get(app_id)
     
     def list_applications(
         self,
@@ -66,43 +238,51 @@ class InMemoryStore:
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None,
         status: Optional[str] = None,
-    ) -> tuple[List[dict], int]:
+        accident_date_from: Optional[date] = None,
+        accident_date_to: Optional[date] = None,
+        ai_suggestion_min: Optional[float] = None,
+        ai_suggestion_max: Optional[float] = None,
+        after: Optional[Tuple[datetime, str]] = None,
+        exact_total: bool = True,
+    ) -> tuple[List[dict], Optional[int]]:
         """
         List applications with pagination and filters.
         Returns (items, total_count)
         """
-        with self._lock:
-            # Start with all applications or filter by PESEL
-            if pesel:
-                app_ids = self._pesel_index.get(pesel, [])
-                applications = [self._applications[aid] for aid in app_ids if aid in self._applications]
-            else:
-                applications = list(self._applications.values())
-            
-            # Apply filters
-            filtered = []
-            for app in applications:
-                # Date filter
-                if date_from and app["created_at"] < date_from:
-                    continue
-                if date_to and app["created_at"] > date_to:
-                    continue
-                # Status filter
-                if status is not None and app.get("status") != status:
-                    continue
-                filtered.append(app)
-            
-            # Sort by created_at descending (newest first)
-            filtered.sort(key=lambda x: x["created_at"], reverse=True)
-            
-            total = len(filtered)
-            
-            # Pagination
-            start = (page - 1) * page_size
-            end = start + page_size
-            paginated = filtered[start:end]
-            
-            return paginated, total
+        filters = ApplicationFilters(
+            pesel=pesel,
+            date_from=date_from,
+            date_to=date_to,
+            status=status,
+            accident_date_from=accident_date_from,
+            accident_date_to=accident_date_to,
+            ai_suggestion_min=ai_suggestion_min,
+            ai_suggestion_max=ai_suggestion_max,
+        )
+        with self._lock.read():
+            # The planner drives the scan from the most selective index
+            return self._indexes.query(
+                self._applications,
+                filters,
+                (page - 1) * page_size,
+                page_size,
+                after=after,
+                exact_total=exact_total,
+            )
+    
+    def search_applications(self, query: str, page: int = 1, page_size: int = 10) -> Tuple[List[Tuple[dict, float]], int]:
+        """
+        Full-text search over the accident descriptions, best match first.
+        Returns ([(application, score)], total_count)
+        """
+        with self._lock.read():
+            hits, total = self._indexes.text.search(query, (page - 1) * page_size, page_size)
+            return [(self._applications[app_id], score) for app_id, score in hits], total
+    
+    def get_stats(self) -> dict:
+        """Dashboard counters, maintained on every mutation."""
+        with self._lock.read():
+            return self._stats.snapshot()
     
     def update_application(
         self,
@@ -111,71 +291,121 @@ class InMemoryStore:
         ai_suggestion: Optional[float] = None,
         ai_comments: Optional[Dict] = None,
         status: Optional[str] = None,
+        expected_version: Optional[int] = None,
     ) -> Optional[dict]:
-        """Update an application. Returns updated application or None if not found."""
-        with self._lock:
-            if app_id not in self._applications:
-                return None
-            
-            app = self._applications[app_id]
-            
+        """
+        Update an application. Returns updated application or None if not found.
+        Raises VersionConflict if `expected_version` is given and no longer current.
+        """
+        with self._record_locks.hold(app_id):
+            changes = {}
             if form_data is not None:
-                old_pesel = app["pesel"]
-                new_pesel = form_data.poszkodowany.pesel
-                app["form_data"] = form_data.model_dump()
-                app["pesel"] = new_pesel
-                
-                # Update PESEL index if PESEL changed
-                if old_pesel != new_pesel:
-                    if old_pesel in self._pesel_index:
-                        self._pesel_index[old_pesel] = [
-                            aid for aid in self._pesel_index[old_pesel] if aid != app_id
-                        ]
-                    if new_pesel not in self._pesel_index:
-                        self._pesel_index[new_pesel] = []
-                    self._pesel_index[new_pesel].append(app_id)
-            
+                changes["form_data"] = form_data.model_dump()
+                changes["pesel"] = form_data.poszkodowany.pesel
             if ai_suggestion is not None:
-                app["ai_suggestion"] = ai_suggestion
+                changes["ai_suggestion"] = ai_suggestion
             if ai_comments is not None:
-                app["ai_comments"] = ai_comments
+                changes["ai_comments"] = ai_comments
             if status is not None:
-                app["status"] = status
+                changes["status"] = status
             
-            app["updated_at"] = datetime.utcnow()
-            
-            return app
+            with self._lock.write():
+                if app_id not in self._applications:
+                    return None
+                
+                current_version = self._applications[app_id]["version"]
+                if expected_version is not None and current_version != expected_version:
+                    raise VersionConflict(app_id, current_version)
+                
+                changes["updated_at"] = datetime.utcnow()
+                changes["version"] = self._version + 1
+                self._log("update_application", app_id, changes)
+                return self._apply_update_application(app_id, changes)
+    
+    def _apply_update_application(self, app_id: str, changes: dict) -> ApplicationRecord:
+        old = self._applications[app_id]
+        app = old.replace(**changes)
+        
+        # Re-index under the new pesel/status/accident date/ai_suggestion/description
+        self._applications[app_id] = app
+        self._indexes.replace(old, app, form_changed="form_data" in changes)
+        self._stats.remove(old)
+        self._stats.add(app)
+        self._changes.append(change_event(app["version"], "update", app_id, app["status"]))
+        self._version = app["version"]
+        return app
+    
+    def apply_bulk(self, operations: List[dict]) -> List[dict]:
+        """
+        Apply updates and deletions under a single write lock acquisition.
+        Each operation is journaled like the single-record call it stands for.
+        """
+        results = []
+        with self._lock.write():
+            now = datetime.utcnow()
+            for operation in operations:
+                app_id = operation["id"]
+                app = self._applications.get(app_id)
+                if app is None:
+                    results.append({"id": app_id, "result": "not_found", "version": None})
+                    continue
+    
+                expected_version = operation.get("expected_version")
+                if expected_version is not None and app["version"] != expected_version:
+                    results.append({"id": app_id, "result": "conflict", "version": app["version"]})
+                    continue
+    
+                version = self._version + 1
+                if operation["op"] == "delete":
+                    self._log("delete_application", app_id, version)
+                    self._apply_delete_application(app_id, version)
+                    results.append({"id": app_id, "result": "deleted", "version": None})
+                    continue
+    
+                changes = {
+                    field: operation[field]
+                    for field in ("status", "ai_suggestion", "ai_comments")
+                    if operation.get(field) is not None
+                }
+                changes["updated_at"] = now
+                changes["version"] = version
+                self._log("update_application", app_id, changes)
+                self._apply_update_application(app_id, changes)
+                results.append({"id": app_id, "result": "updated", "version": version})
+        return results
     
     def delete_application(self, app_id: str) -> bool:
         """
         Hard delete an application and all its attachments.
         Returns True if deleted, False if not found.
         """
-        with self._lock:
+        with self._record_locks.hold(app_id), self._lock.write():
             if app_id not in self._applications:
                 return False
             
-            app = self._applications[app_id]
-            pesel = app["pesel"]
-            
-            # Delete all attachments
-            for att_id in app.get("attachment_ids", []):
-                if att_id in self._attachments:
-                    del self._attachments[att_id]
-            
-            # Remove from PESEL index
-            if pesel in self._pesel_index:
-                self._pesel_index[pesel] = [
-                    aid for aid in self._pesel_index[pesel] if aid != app_id
-                ]
-                if not self._pesel_index[pesel]:
-                    del self._pesel_index[pesel]
-            
-            # Delete application
-            del self._applications[app_id]
+            version = self._version + 1
+            self._log("delete_application", app_id, version)
+            self._apply_delete_application(app_id, version)
             
             return True
     
+    def _apply_delete_application(self, app_id: str, version: int) -> None:
+        app = self._applications[app_id]
+        
+        # Delete all attachments
+        for att_id in app.get("attachment_ids", []):
+            if att_id in self._attachments:
+                self._unref_blob(self._attachments.pop(att_id)["sha256"])
+        
+        # Remove from indexes
+        self._indexes.remove(app)
+        self._stats.remove(app)
+        
+        # Delete application
+        del self._applications[app_id]
+        self._changes.append(change_event(version, "delete", app_id))
+        self._version = version
+    
     def create_attachment(
         self,
         app_id: str,
@@ -187,59 +417,133 @@ class InMemoryStore:
         Create an attachment for an application.
         Returns attachment dict or None if application not found.
         """
-        with self._lock:
+        # Decode, hash and write the payload before taking any lock; identical payloads are stored once
+        data_bytes = base64.b64decode(data_base64)
+        sha256 = self.blobs.digest(data_bytes)
+        self.blobs.put(data_bytes, sha256)
+        
+        with self._record_locks.hold(app_id), self._lock.write():
             if app_id not in self._applications:
+                if sha256 not in self._blob_refs:
+                    self.blobs.delete(sha256)
                 return None
             
-            att_id = str(uuid4())
-            data_bytes = base64.b64decode(data_base64)
-            
-            attachment = {
-                "id": att_id,
-                "title": title,
-                "mime_type": mime_type,
-                "data": data_bytes,  # Store as bytes
-                "size_bytes": len(data_bytes),
-                "created_at": datetime.utcnow(),
-            }
+            # The last reference may have been dropped (and the file deleted) since put()
+            if sha256 not in self._blob_refs:
+                self.blobs.put(data_bytes, sha256)
             
-            self._attachments[att_id] = attachment
+            return self._add_attachment(app_id, title, mime_type, sha256, len(data_bytes))
+    
+    def create_attachment_from_blob(
+        self,
+        app_id: str,
+        title: str,
+        mime_type: str,
+        writer: BlobWriter,
+    ) -> Optional[dict]:
+        """
+        Create an attachment from a streamed payload.
+        Returns attachment dict or None if application not found.
+        """
+        # The fsync happens here, outside the locks
+        sha256 = writer.finish()
+        
+        with self._record_locks.hold(app_id), self._lock.write():
+            if app_id not in self._applications:
+                writer.discard()
+                return None
             
-            # Add to application's attachment_ids
-            app = self._applications[app_id]
-            app["attachment_ids"].append(att_id)
-            app["updated_at"] = datetime.utcnow()
+            # A referenced copy cannot be deleted while we hold the write lock
+            if sha256 in self._blob_refs:
+                writer.discard()
+            else:
+                self.blobs.commit(writer)
             
-            return attachment
+            return self._add_attachment(app_id, title, mime_type, sha256, writer.size)
+    
+    def _add_attachment(self, app_id: str, title: str, mime_type: str, sha256: str, size_bytes: int) -> FrozenRecord:
+        """Record an attachment whose payload is stored. Must be called under the write lock."""
+        # An identical payload stored earlier keeps its codec, whatever this upload would have used
+        codec, stored_bytes = self.blobs.stored_info(sha256)
+        attachment = FrozenRecord({
+            "id": str(uuid4()),
+            "title": title,
+            "mime_type": mime_type,
+            "sha256": sha256,  # Payload lives in the blob store
+            "size_bytes": size_bytes,
+            "codec": codec,
+            "stored_bytes": stored_bytes,
+            "created_at": datetime.utcnow(),
+        })
+        
+        version = self._version + 1
+        self._log("create_attachment", app_id, attachment, version)
+        self._apply_create_attachment(app_id, attachment, version)
+        
+        return attachment
+    
+    def _apply_create_attachment(self, app_id: str, attachment: FrozenRecord, version: int) -> None:
+        self._attachments[attachment["id"]] = attachment
+        self._ref_blob(attachment["sha256"])
+        
+        # Add to application's attachment_ids
+        old = self._applications[app_id]
+        app = old.replace(
+            attachment_ids=old["attachment_ids"] + (attachment["id"],),
+            updated_at=attachment["created_at"],
+            version=version,
+        )
+        self._applications[app_id] = app
+        self._stats.remove(old)
+        self._stats.add(app)
+        self._changes.append(change_event(app["version"], "update", app_id, app["status"]))
+        self._version = version
     
     def get_attachment(self, att_id: str) -> Optional[dict]:
-        """Get an attachment by ID."""
-        with self._lock:
-            return self._attachments.get(att_id)
+        """Get an attachment by ID. Lock-free, like `get_application`."""
+        return self._attachments.get(att_id)
     
     def get_application_attachments(self, app_id: str) -> List[dict]:
         """Get all attachments for an application."""
-        with self._lock:
-            if app_id not in self._applications:
-                return []
-            
-            app = self._applications[app_id]
-            attachments = []
-            for att_id in app.get("attachment_ids", []):
-                if att_id in self._attachments:
-                    att = self._attachments[att_id].copy()
-                    # Don't return binary data in list
-                    att.pop("data", None)
-                    attachments.append(att)
-            
-            return attachments
+        app = self._applications.get(app_id)
+        if app is None:
+            return []
+        
+        # An attachment removed after we read the record is simply skipped
+        attachments = (self._attachments.get(att_id) for att_id in app["attachment_ids"])
+        return [att for att in attachments if att is not None]
+    
+    def expired_attachments(self, created_before: datetime, limit: int) -> List[Tuple[str, str]]:
+        """Scan without locking; an attachment deleted meanwhile is simply not found later."""
+        expired = []
+        for app in list(self._applications.values()):
+            for att_id in app["attachment_ids"]:
+                att = self._attachments.get(att_id)
+                if att is not None and att["created_at"] < created_before:
+                    expired.append((app["id"], att_id))
+                    if len(expired) >= limit:
+                        return expired
+        return expired
+    
+    def attachment_storage_stats(self) -> Dict[str, dict]:
+        stats: Dict[str, dict] = {}
+        for att in list(self._attachments.values()):
+            entry = stats.setdefault(
+                att["mime_type"], {"attachments": 0, "size_bytes": 0, "stored_bytes": 0, "compressed": 0}
+            )
+            entry["attachments"] += 1
+            entry["size_bytes"] += att["size_bytes"]
+            # Records from before compression existed are stored as uploaded
+            entry["stored_bytes"] += att.get("stored_bytes", att["size_bytes"])
+            entry["compressed"] += att.get("codec", CODEC_IDENTITY) != CODEC_IDENTITY
+        return stats
     
     def delete_attachment(self, app_id: str, att_id: str) -> bool:
         """
         Delete an attachment from an application.
         Returns True if deleted, False if not found.
         """
-        with self._lock:
+        with self._record_locks.hold(app_id), self._lock.write():
             if app_id not in self._applications:
                 return False
             
@@ -250,16 +554,53 @@ class InMemoryStore:
             if att_id not in app.get("attachment_ids", []):
                 return False
             
-            # Remove from application
-            app["attachment_ids"] = [aid for aid in app["attachment_ids"] if aid != att_id]
-            app["updated_at"] = datetime.utcnow()
-            
-            # Delete attachment
-            del self._attachments[att_id]
+            updated_at = datetime.utcnow()
+            version = self._version + 1
+            self._log("delete_attachment", app_id, att_id, updated_at, version)
+            self._apply_delete_attachment(app_id, att_id, updated_at, version)
             
             return True
+    
+    def _apply_delete_attachment(self, app_id: str, att_id: str, updated_at: datetime, version: int) -> None:
+        # Remove from application
+        old = self._applications[app_id]
+        app = old.replace(
+            attachment_ids=tuple(aid for aid in old["attachment_ids"] if aid != att_id),
+            updated_at=updated_at,
+            version=version,
+        )
+        self._applications[app_id] = app
+        self._stats.remove(old)
+        self._stats.add(app)
+        self._changes.append(change_event(app["version"], "update", app_id, app["status"]))
+        self._version = version
+        
+        # Delete attachment
+        self._unref_blob(self._attachments.pop(att_id)["sha256"])
 
 
-# Global store instance
-store = InMemoryStore()
+def create_store(backend: str = STORE_BACKEND) -> StoreBackend:
+    """Build the store backend selected by the STORE_BACKEND setting."""
+    cache = None
+    if STORE_BLOB_CACHE_MB > 0:
+        cache = BlobCache(STORE_BLOB_CACHE_MB * 1024 * 1024, STORE_BLOB_CACHE_MAX_ITEM_KB * 1024)
+    
+    if backend == "memory":
+        if not STORE_DATA_DIR:
+            return InMemoryStore(blobs=BlobStore.temporary(cache))
+        journal = StoreJournal(
+            STORE_DATA_DIR,
+            fsync_mode=STORE_WAL_FSYNC,
+            fsync_interval=STORE_WAL_FSYNC_INTERVAL_MS / 1000,
+            snapshot_every=STORE_SNAPSHOT_EVERY,
+        )
+        return InMemoryStore(journal, BlobStore(os.path.join(STORE_DATA_DIR, "blobs"), cache=cache))
+    if backend == "sqlite":
+        from app.database.sqlite_store import SQLiteStore
+
+        return SQLiteStore(STORE_SQLITE_PATH, BlobStore(STORE_BLOB_DIR, cache=cache))
+    raise ValueError(f"Unknown STORE_BACKEND '{backend}'. Use 'memory' or 'sqlite'.")
 
+
+# Global store instance
+store = create_store()
@@ -3,7 +3,10 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.database.store import store
 from app.routes import applications, attachments, health, chat, elevenlabs, zus_accidents
+from app.services.previews import preview_service
+from app.services.retention import retention_sweeper
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -12,8 +15,20 @@ load_dotenv()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Initialize connections, clients, or caches here.
+    store.open()
+    retention_sweeper.track_sessions("chat_sessions", chat.sessions)
+    retention_sweeper.track_sessions(
+        "voice_sessions",
+        elevenlabs.elevenlabs_sessions,
+        # A conversation someone is still listening to is not abandoned
+        in_use=lambda conversation_id: elevenlabs.sse_manager.listener_count(conversation_id) > 0,
+    )
+    retention_sweeper.start()
     yield
     # Close resources gracefully here.
+    await retention_sweeper.stop()
+    preview_service.close()
+    store.close()
 
 
 app = FastAPI(title="ZUS Accident Reporter API", lifespan=lifespan)
@@ -25,6 +40,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # Lets the UI send it back in If-None-Match / If-Match
 )
 
 app.include_router(health.router)
@@ -1,5 +1,5 @@
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+from datetime import date, datetime
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
 
 from pydantic import BaseModel, Field, field_validator
 
@@ -120,6 +120,7 @@ class ApplicationUpdate(BaseModel):
 
 class ApplicationResponse(BaseModel):
     id: str
+    version: int  # Store-wide mutation number, grows with every change of the application
     created_at: datetime
     updated_at: datetime
     pesel: str
@@ -142,11 +143,106 @@ class ApplicationListItem(BaseModel):
 
 class ApplicationListResponse(BaseModel):
     items: List[ApplicationListItem]
+    total: Optional[int]  # None when include_total=false and no cheap estimate exists
+    page: int
+    page_size: int
+    next_cursor: Optional[str] = None  # Pass as `cursor` to fetch the following page
+    total_exact: bool = True
+    version: Optional[int] = None  # Store version the page was read at; pass as `since` to /changes
+
+
+class ApplicationSearchItem(ApplicationListItem):
+    score: float  # BM25 relevance, higher is better
+
+
+class ApplicationSearchResponse(BaseModel):
+    items: List[ApplicationSearchItem]
     total: int
     page: int
     page_size: int
 
 
+class DayStats(BaseModel):
+    day: date  # created_at date (UTC)
+    total: int
+    by_status: Dict[str, int]
+
+
+class HistogramBucket(BaseModel):
+    lower: float
+    upper: float  # exclusive, except for the last bucket
+    count: int
+
+
+class ApplicationStatsResponse(BaseModel):
+    total: int
+    with_attachments: int
+    attachment_share: float  # with_attachments / total, 0 when there are no applications
+    by_status: Dict[str, int]  # applications without a status are counted under "none"
+    by_day: List[DayStats]
+    ai_suggestion_histogram: List[HistogramBucket]
+    ai_suggestion_missing: int
+
+
+class BulkOperation(BaseModel):
+    op: Literal["update", "delete"]
+    id: str
+    status: Optional[str] = None
+    ai_suggestion: Optional[float] = Field(None, ge=0, le=1)
+    ai_comments: Optional[Dict[str, Any]] = None
+    expected_version: Optional[int] = None  # like If-Match: the operation is skipped as "conflict" if the version differs
+
+
+class BulkRequest(BaseModel):
+    operations: List[BulkOperation] = Field(..., min_length=1, max_length=1000)
+
+
+class BulkResult(BaseModel):
+    id: str
+    result: Literal["updated", "deleted", "not_found", "conflict"]
+    version: Optional[int] = None  # new version after "updated", current version on "conflict"
+
+
+class BulkResponse(BaseModel):
+    results: List[BulkResult]  # one per operation, in request order
+
+
+class AnalyticsGroup(BaseModel):
+    key: Optional[Union[bool, str]]  # None groups the applications without a value
+    count: int
+    value: Optional[float]  # the metric (equal to count for metric=count); None if no row has a value
+
+
+class AnalyticsResponse(BaseModel):
+    group_by: str
+    metric: str
+    value: Optional[str]
+    version: int  # store version the numbers are computed from
+    rows: int
+    groups: List[AnalyticsGroup]  # largest groups first
+
+
+class ApplicationImport(ApplicationBase):
+    """One NDJSON line of an import; lines of `GET /api/applications/export` are accepted as they are."""
+    id: Optional[str] = None  # kept if given, so applications keep their ids across environments
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    ai_suggestion: Optional[float] = Field(None, ge=0, le=1)
+    ai_comments: Optional[Dict[str, Any]] = None
+    attachments: Optional[List[Dict[str, Any]]] = None  # {title, mime_type, data(base64)}, as exported with attachments=data
+
+
+class ImportLineError(BaseModel):
+    line: int  # 1-based line number in the uploaded NDJSON
+    error: str
+
+
+class ApplicationImportResponse(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportLineError]  # first IMPORT_MAX_ERRORS failures; `failed` counts all of them
+
+
 # Attachment models
 class AttachmentCreate(BaseModel):
     title: str
@@ -166,6 +262,27 @@ class AttachmentListResponse(BaseModel):
     attachments: List[AttachmentMetadata]
 
 
+class UploadSessionCreate(BaseModel):
+    title: str
+    mime_type: str
+    size_bytes: int
+    chunk_size: Optional[int] = None  # server default (UPLOAD_CHUNK_SIZE) when omitted
+
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    title: str
+    mime_type: str
+    size_bytes: int
+    chunk_size: int
+    total_chunks: int
+    received_chunks: List[int]
+    received_ranges: List[Tuple[int, int]]  # byte offsets [start, end) already stored
+    received_bytes: int
+    created_at: datetime
+    expires_at: datetime
+
+
 # Chat/Form state models
 class FormStateResponse(BaseModel):
     fields: AccidentReportFormData
@@ -1,18 +1,43 @@
-from datetime import datetime
-from typing import Optional
+import logging
+from datetime import date, datetime
+from typing import Literal, Optional
 
-from fastapi import APIRouter, HTTPException, Query, status
-from fastapi.responses import Response
+from fastapi import APIRouter, Header, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
+from app.database.base import VersionConflict
 from app.database.store import store
 from app.models.schemas import (
+    AnalyticsGroup,
+    AnalyticsResponse,
     ApplicationCreate,
+    ApplicationImportResponse,
     ApplicationListItem,
     ApplicationListResponse,
     ApplicationResponse,
+    ApplicationSearchItem,
+    ApplicationSearchResponse,
+    ApplicationStatsResponse,
     ApplicationUpdate,
+    BulkRequest,
+    BulkResponse,
+    BulkResult,
+    DayStats,
+    HistogramBucket,
 )
-from app.utils.validation import validate_attachment, validate_pesel
+from app.services.analytics import aggregate, get_frame, to_arrow_ipc, to_parquet
+from app.services.bundle import bundle_filename, card_description, iter_bundle
+from app.services.changes import change_stream, current_version
+from app.services.ingestion import discard_all, ingest_all
+from app.services.transfer import export_ndjson, import_ndjson
+from app.services.zus_card_generator import create_karta_wypadku_bytes
+from app.utils.conditional import if_match_version, make_etag, none_match
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.response_cache import response_cache
+from app.utils.validation import validate_pesel
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/applications", tags=["applications"])
 
@@ -25,6 +50,37 @@ def format_error_response(message: str, field_errors: Optional[dict] = None) ->
     }
 
 
+def application_response(app: dict, status_code: int = status.HTTP_200_OK) -> Response:
+    """
+    Encoded ApplicationResponse for `app`, with the application version as ETag.
+    The body is built (validated and serialized) once per application version.
+    """
+    body = response_cache.get_or_build(
+        ("application", app["id"]),
+        app["version"],
+        lambda: ApplicationResponse(**app).model_dump_json().encode(),
+    )
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type="application/json",
+        headers={"ETag": make_etag(app["version"])},
+    )
+
+
+def build_summary(app: dict) -> Optional[str]:
+    """Create brief summary from accident details."""
+    summary = None
+    # form_data may be decoded on access; read it once
+    form = app.get("form_data") or {}
+    if form.get("szczegoly"):
+        szczegoly = form["szczegoly"]
+        summary = f"{szczegoly.get('miejsce', '')} - {szczegoly.get('opis_urazow', '')[:50]}"
+        if len(szczegoly.get("opis_urazow", "")) > 50:
+            summary += "..."
+    return summary
+
+
 @router.post("", status_code=status.HTTP_201_CREATED, response_model=ApplicationResponse)
 async def create_application(application: ApplicationCreate):
     """Create a new application with optional attachments."""
@@ -37,68 +93,93 @@ async def create_application(application: ApplicationCreate):
             detail=format_error_response("Validation failed", {"pesel": pesel_error}),
         )
     
-    # Validate attachments if provided (before creating application)
+    # Decode, check and store attachments if provided (before creating application)
+    ingested = []
     if application.attachments:
-        for att_data in application.attachments:
-            att_valid, att_error, size_bytes = validate_attachment(att_data)
-            if not att_valid:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=format_error_response("Attachment validation failed", {"attachment": att_error}),
-                )
+        try:
+            ingested = await run_in_threadpool(ingest_all, application.attachments)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=format_error_response("Attachment validation failed", {"attachment": str(e)}),
+            )
     
     # Create application first
-    app = store.create_application(
-        form_data=application.form_data,
-        status=application.status,
-    )
+    app = await run_in_threadpool(store.create_application, form_data=application.form_data, status=application.status)
     
-    # Now create attachments if provided (with correct app_id)
-    if application.attachments:
-        for att_data in application.attachments:
-            att = store.create_attachment(
-                app_id=app["id"],
-                title=att_data["title"],
-                mime_type=att_data["mime_type"],
-                data_base64=att_data["data"],
-            )
+    # Now attach the stored payloads (with correct app_id)
+    for i, att in enumerate(ingested):
+        try:
+            await run_in_threadpool(store.create_attachment_from_blob, app["id"], att.title, att.mime_type, att.writer)
+        except BaseException:
+            discard_all(ingested[i + 1:])
+            raise
     
     # Refresh app to get updated attachment_ids
-    app = store.get_application(app["id"])
+    app = await run_in_threadpool(store.get_application, app["id"])
     
-    return ApplicationResponse(**app)
+    return application_response(app, status.HTTP_201_CREATED)
 
 
 @router.get("", response_model=ApplicationListResponse)
-async def list_applications(
+def list_applications(
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(10, ge=1, le=100, description="Items per page"),
     pesel: Optional[str] = Query(None, description="Filter by PESEL"),
     date_from: Optional[datetime] = Query(None, description="Filter from date"),
     date_to: Optional[datetime] = Query(None, description="Filter to date"),
-    status: Optional[str] = Query(None, description="Filter by status"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Filter by status"),
+    accident_date_from: Optional[date] = Query(None, description="Filter by accident date (from)"),
+    accident_date_to: Optional[date] = Query(None, description="Filter by accident date (to)"),
+    ai_suggestion_min: Optional[float] = Query(None, ge=0, le=1, description="Minimum AI suggestion"),
+    ai_suggestion_max: Optional[float] = Query(None, ge=0, le=1, description="Maximum AI suggestion"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor (next_cursor of the previous page); replaces page"),
+    include_total: bool = Query(True, description="Count all matches exactly; false returns an estimate"),
 ):
-    """List applications with pagination and filters."""
+    """
+    List applications with pagination and filters.
+    Supports offset pages (`page`) and keyset pagination (`cursor` / `next_cursor`),
+    which stays O(page_size) at any depth and is stable while new applications arrive.
+    """
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=format_error_response("Validation failed", {"cursor": str(e)}),
+            )
+        page = 1
+    
+    # Read the version before querying: the cached page is then never older than its key
+    version = store.version
+    cache_key = (
+        "list", page, page_size, pesel, date_from, date_to, status_filter, accident_date_from,
+        accident_date_to, ai_suggestion_min, ai_suggestion_max, cursor, include_total,
+    )
+    body = response_cache.get(cache_key, version)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
+    
     items, total = store.list_applications(
         page=page,
         page_size=page_size,
         pesel=pesel,
         date_from=date_from,
         date_to=date_to,
-        status=status,
+        status=status_filter,
+        accident_date_from=accident_date_from,
+        accident_date_to=accident_date_to,
+        ai_suggestion_min=ai_suggestion_min,
+        ai_suggestion_max=ai_suggestion_max,
+        after=after,
+        exact_total=include_total,
     )
     
     # Convert to list items with summary
     list_items = []
     for item in items:
-        # Create brief summary from accident details
-        summary = None
-        if item.get("form_data", {}).get("szczegoly"):
-            szczegoly = item["form_data"]["szczegoly"]
-            summary = f"{szczegoly.get('miejsce', '')} - {szczegoly.get('opis_urazow', '')[:50]}"
-            if len(szczegoly.get("opis_urazow", "")) > 50:
-                summary += "..."
-        
         list_items.append(
             ApplicationListItem(
                 id=item["id"],
@@ -106,22 +187,285 @@ async def list_applications(
                 created_at=item["created_at"],
                 status=item.get("status"),
                 ai_suggestion=item.get("ai_suggestion"),
-                summary=summary,
+                summary=build_summary(item),
                 attachment_count=len(item.get("attachment_ids", [])),
             )
         )
     
-    return ApplicationListResponse(
+    # A full page may be followed by more items
+    next_cursor = None
+    if len(items) == page_size:
+        next_cursor = encode_cursor(items[-1]["created_at"], items[-1]["id"])
+    
+    body = ApplicationListResponse(
         items=list_items,
         total=total,
         page=page,
         page_size=page_size,
+        next_cursor=next_cursor,
+        total_exact=include_total,
+        version=version,
+    ).model_dump_json().encode()
+    response_cache.put(cache_key, version, body)
+    
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/search", response_model=ApplicationSearchResponse)
+def search_applications(
+    q: str = Query(..., min_length=1, max_length=500, description="Words from the accident description"),
+    page: int = Query(1, ge=1, description="Page number"),
+    page_size: int = Query(10, ge=1, le=100, description="Items per page"),
+):
+    """
+    Full-text search over the accident circumstances, injuries, place and machine description.
+    Case and Polish diacritics are ignored and common word endings are stripped, so "zlamanie reki"
+    also finds "Złamania ręki". All words must match; results are ranked by relevance.
+    """
+    version = store.version
+    cache_key = ("search", q, page, page_size)
+    body = response_cache.get(cache_key, version)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
+    
+    hits, total = store.search_applications(q, page=page, page_size=page_size)
+    
+    body = ApplicationSearchResponse(
+        items=[
+            ApplicationSearchItem(
+                id=item["id"],
+                pesel=item["pesel"],
+                created_at=item["created_at"],
+                status=item.get("status"),
+                ai_suggestion=item.get("ai_suggestion"),
+                summary=build_summary(item),
+                attachment_count=len(item.get("attachment_ids", [])),
+                score=score,
+            )
+            for item, score in hits
+        ],
+        total=total,
+        page=page,
+        page_size=page_size,
+    ).model_dump_json().encode()
+    response_cache.put(cache_key, version, body)
+    
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/stats", response_model=ApplicationStatsResponse)
+def get_stats(
+    date_from: Optional[date] = Query(None, description="First day of the by_day series"),
+    date_to: Optional[date] = Query(None, description="Last day of the by_day series"),
+):
+    """
+    Dashboard numbers: applications per status and per day, share with attachments
+    and the ai_suggestion distribution. Served from counters the store keeps current
+    on every change, so the cost does not depend on the number of applications.
+    """
+    version = store.version
+    cache_key = ("stats", date_from, date_to)
+    body = response_cache.get(cache_key, version)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
+    
+    stats = store.get_stats()
+    by_day = [
+        DayStats(day=day, total=sum(per_status.values()), by_status=per_status)
+        for day, per_status in stats["by_day"].items()
+        if (date_from is None or day >= date_from.isoformat()) and (date_to is None or day <= date_to.isoformat())
+    ]
+    buckets = len(stats["ai_suggestion_histogram"])
+    histogram = [
+        HistogramBucket(lower=i / buckets, upper=(i + 1) / buckets, count=count)
+        for i, count in enumerate(stats["ai_suggestion_histogram"])
+    ]
+    
+    body = ApplicationStatsResponse(
+        total=stats["total"],
+        with_attachments=stats["with_attachments"],
+        attachment_share=stats["with_attachments"] / stats["total"] if stats["total"] else 0.0,
+        by_status=stats["by_status"],
+        by_day=by_day,
+        ai_suggestion_histogram=histogram,
+        ai_suggestion_missing=stats["ai_suggestion_missing"],
+    ).model_dump_json().encode()
+    response_cache.put(cache_key, version, body)
+    
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/export")
+async def export_applications(
+    attachments: Literal["none", "metadata", "data"] = Query(
+        "none", description="Include attachment metadata, or metadata with base64 payloads"
+    ),
+):
+    """
+    Export all applications as NDJSON (one ApplicationResponse object per line), newest first.
+    The response is streamed while the store is read in batches, so memory use stays constant
+    however many applications there are. The lines can be sent to `POST /import` as they are.
+    """
+    return StreamingResponse(
+        export_ndjson(attachments),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="applications.ndjson"'},
+    )
+
+
+@router.get("/export/columnar")
+async def export_applications_columnar(
+    file_format: Literal["parquet", "arrow"] = Query("parquet", alias="format", description="Parquet file or Arrow IPC file"),
+):
+    """
+    Export all applications as a columnar dataset for analytics: one column per flattened
+    form field (`poszkodowany.pesel`, `szczegoly.miejsce`, ..., `swiadkowie_count`) plus
+    id, version, timestamps, status, ai_suggestion and attachment_count, newest first.
+    """
+    frame = await run_in_threadpool(get_frame)
+    if file_format == "parquet":
+        body = await run_in_threadpool(to_parquet, frame)
+        media_type, filename = "application/vnd.apache.parquet", "applications.parquet"
+    else:
+        body = await run_in_threadpool(to_arrow_ipc, frame)
+        media_type, filename = "application/vnd.apache.arrow.file", "applications.arrow"
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/analytics", response_model=AnalyticsResponse)
+async def get_analytics(
+    group_by: str = Query(..., description="Text or yes/no column of the columnar export, e.g. adres_zamieszkania.miejscowosc"),
+    metric: Literal["count", "sum", "mean", "min", "max"] = Query("count", description="Aggregate per group"),
+    value: Optional[str] = Query(None, description="Numeric column for sum/mean/min/max, e.g. ai_suggestion"),
+):
+    """
+    Group-by over the columnar view of the applications, e.g. cases per
+    `adres_zamieszkania.miejscowosc` or mean `ai_suggestion` per `status`.
+    Computed with NumPy over dictionary-encoded columns; the view follows the
+    store with a delay of at most ANALYTICS_REFRESH_SECONDS.
+    """
+    frame = await run_in_threadpool(get_frame)
+    try:
+        groups = aggregate(frame, group_by, metric, value)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=format_error_response(str(e)),
+        )
+    
+    return AnalyticsResponse(
+        group_by=group_by,
+        metric=metric,
+        value=value,
+        version=frame.version,
+        rows=len(frame),
+        groups=[AnalyticsGroup(**group) for group in groups],
+    )
+
+
+@router.post("/import", response_model=ApplicationImportResponse)
+async def import_applications(request: Request):
+    """
+    Import applications from an NDJSON body (one object per line, see `ApplicationImport`).
+    Lines are validated one by one and created in batches; invalid lines and ids that already
+    exist are reported with their line number and do not stop the import.
+    """
+    result = await import_ndjson(request.stream())
+    return ApplicationImportResponse(**result)
+
+
+@router.post("/bulk", response_model=BulkResponse)
+async def bulk_applications(request: BulkRequest):
+    """
+    Apply up to 1000 status / ai_suggestion / ai_comments updates and deletions in one request.
+    The store applies them in order under a single lock acquisition (one transaction in SQLite).
+    Every operation succeeds or fails on its own; `expected_version` makes it conditional,
+    like If-Match on PATCH.
+    """
+    results = await run_in_threadpool(store.apply_bulk, [operation.model_dump() for operation in request.operations])
+    
+    for result in results:
+        if result["result"] == "deleted":
+            response_cache.invalidate(("application", result["id"]))
+    
+    return BulkResponse(results=[BulkResult(**result) for result in results])
+
+
+@router.get("/changes")
+async def application_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Store version to stream the changes after"),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Live feed (server-sent events) of created, updated and deleted applications.
+    Each `change` event is {"version", "op", "id", "status"}; a `reset` event means
+    the changes could not be replayed and the list should be reloaded. Streams from
+    the browser's Last-Event-ID, else from `since` (the version a list was loaded
+    at), else from now.
+    """
+    if last_event_id is not None:
+        try:
+            version = int(last_event_id)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=format_error_response("Last-Event-ID must be a store version"),
+            )
+    elif since is not None:
+        version = since
+    else:
+        version = await run_in_threadpool(current_version)
+    
+    return StreamingResponse(
+        change_stream(version, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/{app_id}/bundle.zip")
+async def get_application_bundle(app_id: str):
+    """
+    Download the whole case as one ZIP: application.json, the accident card (DOCX) and
+    all attachments under attachments/. The archive is streamed as it is assembled, a blob
+    chunk at a time, so server memory stays constant however large the case is.
+    """
+    app = await run_in_threadpool(store.get_application, app_id)
+    if not app:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=format_error_response(f"Application with id '{app_id}' not found"),
+        )
+    
+    # Generated before the response starts, so a failure can still be reported
+    try:
+        card = await run_in_threadpool(create_karta_wypadku_bytes, card_description(app["form_data"]))
+    except Exception as e:
+        logger.exception(f"Error generating accident card: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=format_error_response("Failed to generate accident card"),
+        )
+    
+    attachments = await run_in_threadpool(store.get_application_attachments, app_id)
+    return StreamingResponse(
+        iter_bundle(app, attachments, card),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{bundle_filename(app)}"'},
     )
 
 
 @router.get("/{app_id}", response_model=ApplicationResponse)
-async def get_application(app_id: str):
-    """Get a single application by ID."""
+def get_application(app_id: str, if_none_match: Optional[str] = Header(None)):
+    """
+    Get a single application by ID.
+    Pass the ETag of a previous response in If-None-Match to get an empty 304 while it is unchanged.
+    """
     app = store.get_application(app_id)
     if not app:
         raise HTTPException(
@@ -129,12 +473,28 @@ async def get_application(app_id: str):
             detail=format_error_response(f"Application with id '{app_id}' not found"),
         )
     
-    return ApplicationResponse(**app)
+    etag = make_etag(app["version"])
+    if not none_match(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    return application_response(app)
 
 
 @router.patch("/{app_id}", response_model=ApplicationResponse)
-async def update_application(app_id: str, update: ApplicationUpdate):
-    """Update an application."""
+def update_application(app_id: str, update: ApplicationUpdate, if_match: Optional[str] = Header(None)):
+    """
+    Update an application.
+    With If-Match (the ETag from GET) the update is only applied if nobody changed
+    the application in the meantime; otherwise 412 is returned.
+    """
+    try:
+        expected_version = if_match_version(if_match)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=format_error_response("Validation failed", {"If-Match": str(e)}),
+        )
+    
     # Validate PESEL if form_data is being updated
     if update.form_data:
         pesel = update.form_data.poszkodowany.pesel
@@ -145,13 +505,21 @@ async def update_application(app_id: str, update: ApplicationUpdate):
                 detail=format_error_response("Validation failed", {"pesel": pesel_error}),
             )
     
-    app = store.update_application(
-        app_id=app_id,
-        form_data=update.form_data,
-        ai_suggestion=update.ai_suggestion,
-        ai_comments=update.ai_comments,
-        status=update.status,
-    )
+    try:
+        app = store.update_application(
+            app_id=app_id,
+            form_data=update.form_data,
+            ai_suggestion=update.ai_suggestion,
+            ai_comments=update.ai_comments,
+            status=update.status,
+            expected_version=expected_version,
+        )
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=format_error_response("Application was modified by someone else, reload it and retry"),
+            headers={"ETag": make_etag(e.current_version)},
+        )
     
     if not app:
         raise HTTPException(
@@ -159,11 +527,11 @@ async def update_application(app_id: str, update: ApplicationUpdate):
             detail=format_error_response(f"Application with id '{app_id}' not found"),
         )
     
-    return ApplicationResponse(**app)
+    return application_response(app)
 
 
 @router.delete("/{app_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_application(app_id: str):
+def delete_application(app_id: str):
     """Hard delete an application and all its attachments."""
     deleted = store.delete_application(app_id)
     if not deleted:
@@ -172,5 +540,7 @@ async def delete_application(app_id: str):
             detail=format_error_response(f"Application with id '{app_id}' not found"),
         )
     
+    response_cache.invalidate(("application", app_id))
+    
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -1,11 +1,30 @@
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import Response
+import logging
+from typing import Literal, Optional
 
+from fastapi import APIRouter, Header, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.database.blobs import CODEC_GZIP, CODEC_IDENTITY, BlobTooLarge
 from app.database.store import store
-from app.models.schemas import AttachmentCreate, AttachmentListResponse, AttachmentMetadata
-from app.utils.validation import validate_attachment
+from app.models.schemas import (
+    AttachmentCreate,
+    AttachmentListResponse,
+    AttachmentMetadata,
+    UploadSessionCreate,
+    UploadSessionResponse,
+)
+from app.services import resumable
+from app.services.ingestion import ingest_base64
+from app.services.previews import PREVIEW_SIZES, PreviewUnavailable, preview_service, preview_size
+from app.services.uploads import FILE_FIELD, receive_upload
+from app.utils.conditional import accepts_encoding, content_etag, if_range_matches, none_match, parse_range
 
 router = APIRouter(prefix="/api/applications", tags=["attachments"])
+logger = logging.getLogger(__name__)
+
+# An attachment's content never changes (a new file is a new attachment)
+ATTACHMENT_CACHE_CONTROL = "private, max-age=31536000, immutable"
 
 
 def format_error_response(message: str, field_errors: dict = None) -> dict:
@@ -16,71 +35,248 @@ def format_error_response(message: str, field_errors: dict = None) -> dict:
     }
 
 
+def attachment_metadata(att: dict) -> AttachmentMetadata:
+    return AttachmentMetadata(
+        id=att["id"],
+        title=att["title"],
+        mime_type=att["mime_type"],
+        size_bytes=att["size_bytes"],
+        created_at=att["created_at"],
+    )
+
+
+def attachment_created(app_id: str, att: dict) -> dict:
+    """Response of the upload endpoints: the new attachment and the application's updated list."""
+    attachments = store.get_application_attachments(app_id)
+    return {
+        "attachment": attachment_metadata(att),
+        "attachments": AttachmentListResponse(attachments=[attachment_metadata(a) for a in attachments]),
+    }
+
+
 @router.post("/{app_id}/attachments", status_code=status.HTTP_201_CREATED)
 async def create_attachment(app_id: str, attachment: AttachmentCreate):
     """Add an attachment to an application."""
-    # Validate attachment
-    att_data = {
-        "title": attachment.title,
-        "mime_type": attachment.mime_type,
-        "data": attachment.data,
-    }
-    att_valid, att_error, size_bytes = validate_attachment(att_data)
-    if not att_valid:
+    # Check if application exists before decoding anything
+    app = await run_in_threadpool(store.get_application, app_id)
+    if not app:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=format_error_response(f"Application with id '{app_id}' not found"),
+        )
+    
+    # Decode, check and store the payload in one pass
+    try:
+        ingested = await run_in_threadpool(ingest_base64, attachment.title, attachment.mime_type, attachment.data)
+    except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=format_error_response("Attachment validation failed", {"attachment": att_error}),
+            detail=format_error_response("Attachment validation failed", {"attachment": str(e)}),
         )
     
-    # Check if application exists
-    app = store.get_application(app_id)
-    if not app:
+    # Create attachment
+    att = await run_in_threadpool(
+        store.create_attachment_from_blob, app_id, ingested.title, ingested.mime_type, ingested.writer
+    )
+    
+    if not att:
+        # Deleted while the payload was being decoded
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=format_error_response(f"Application with id '{app_id}' not found"),
         )
     
-    # Create attachment
-    att = store.create_attachment(
-        app_id=app_id,
-        title=attachment.title,
-        mime_type=attachment.mime_type,
-        data_base64=attachment.data,
-    )
+    return await run_in_threadpool(attachment_created, app_id, att)
+
+
+@router.post(
+    "/{app_id}/attachments/upload",
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": [FILE_FIELD],
+                        "properties": {
+                            FILE_FIELD: {"type": "string", "format": "binary"},
+                            "title": {"type": "string"},
+                            "mime_type": {"type": "string"},
+                        },
+                    }
+                }
+            },
+        }
+    },
+)
+async def upload_attachment(app_id: str, request: Request):
+    """
+    Add an attachment sent as multipart/form-data: a `file` part plus optional `title`
+    (defaults to the file name) and `mime_type` (defaults to the part's Content-Type;
+    the stored type is the one the content actually has). The file is streamed to storage as it arrives instead of being buffered as base64.
+    """
+    # Check before reading the body, so an upload to a missing application is refused right away
+    if not await run_in_threadpool(store.get_application, app_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=format_error_response(f"Application with id '{app_id}' not found"),
+        )
+    
+    try:
+        upload = await receive_upload(request)
+    except BlobTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=format_error_response("Attachment validation failed", {"attachment": str(e)}),
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=format_error_response("Attachment validation failed", {"attachment": str(e)}),
+        )
     
+    att = await run_in_threadpool(
+        store.create_attachment_from_blob, app_id, upload.title, upload.mime_type, upload.writer
+    )
     if not att:
+        # Deleted while the file was uploading
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=format_error_response("Failed to create attachment"),
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=format_error_response(f"Application with id '{app_id}' not found"),
         )
     
-    # Return attachment metadata and updated list
-    attachments = store.get_application_attachments(app_id)
-    metadata_list = [
-        AttachmentMetadata(
-            id=att["id"],
-            title=att["title"],
-            mime_type=att["mime_type"],
-            size_bytes=att["size_bytes"],
-            created_at=att["created_at"],
+    return await run_in_threadpool(attachment_created, app_id, att)
+
+
+def upload_not_found(app_id: str, upload_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=format_error_response(f"Upload '{upload_id}' not found in application '{app_id}'"),
+    )
+
+
+def get_upload_session(app_id: str, upload_id: str) -> dict:
+    session = resumable.get_session(app_id, upload_id)
+    if not session:
+        raise upload_not_found(app_id, upload_id)
+    return session
+
+
+@router.post("/{app_id}/uploads", status_code=status.HTTP_201_CREATED, response_model=UploadSessionResponse)
+async def create_upload_session(app_id: str, upload: UploadSessionCreate):
+    """
+    Start a resumable upload: PUT the file's chunks (`chunk_size` bytes each, the last
+    one shorter) to /uploads/{id}/chunks/{index} in any order, check progress with
+    GET /uploads/{id}, then POST /uploads/{id}/complete to create the attachment.
+    """
+    if not await run_in_threadpool(store.get_application, app_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=format_error_response(f"Application with id '{app_id}' not found"),
         )
-        for att in attachments
-    ]
     
-    return {
-        "attachment": AttachmentMetadata(
-            id=att["id"],
-            title=att["title"],
-            mime_type=att["mime_type"],
-            size_bytes=att["size_bytes"],
-            created_at=att["created_at"],
-        ),
-        "attachments": AttachmentListResponse(attachments=metadata_list),
-    }
+    try:
+        session = await run_in_threadpool(
+            resumable.create_session, app_id, upload.title, upload.mime_type, upload.size_bytes, upload.chunk_size
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=format_error_response("Attachment validation failed", {"attachment": str(e)}),
+        )
+    
+    return await run_in_threadpool(resumable.session_status, session)
+
+
+@router.get("/{app_id}/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload_session_status(app_id: str, upload_id: str):
+    """Progress of a resumable upload: which chunks (and byte ranges) have been stored."""
+    session = await run_in_threadpool(get_upload_session, app_id, upload_id)
+    try:
+        return await run_in_threadpool(resumable.session_status, session)
+    except FileNotFoundError:
+        # Completed or aborted meanwhile
+        raise upload_not_found(app_id, upload_id)
+
+
+@router.put(
+    "/{app_id}/uploads/{upload_id}/chunks/{index}",
+    response_model=UploadSessionResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}},
+        }
+    },
+)
+async def put_upload_chunk(app_id: str, upload_id: str, index: int, request: Request):
+    """
+    Store chunk `index` (raw bytes) of a resumable upload. The chunk is streamed to disk;
+    sending a chunk again replaces it, so a failed PUT is simply retried.
+    """
+    session = await run_in_threadpool(get_upload_session, app_id, upload_id)
+    try:
+        await resumable.write_chunk(session, index, request.stream())
+        return await run_in_threadpool(resumable.session_status, session)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=format_error_response("Chunk validation failed", {"chunk": str(e)}),
+        )
+    except FileNotFoundError:
+        # Completed or aborted while the chunk was arriving
+        raise upload_not_found(app_id, upload_id)
+
+
+@router.post("/{app_id}/uploads/{upload_id}/complete", status_code=status.HTTP_201_CREATED)
+async def complete_upload_session(app_id: str, upload_id: str):
+    """Turn a fully received upload into an attachment (409 while chunks are missing)."""
+    session = await run_in_threadpool(get_upload_session, app_id, upload_id)
+    try:
+        ingested = await run_in_threadpool(resumable.complete_session, session)
+    except BlobTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=format_error_response("Attachment validation failed", {"attachment": str(e)}),
+        )
+    except ValueError as e:
+        # Missing chunks keep the session; content of a type that is not allowed ends it
+        still_open = await run_in_threadpool(resumable.get_session, app_id, upload_id) is not None
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT if still_open else status.HTTP_400_BAD_REQUEST,
+            detail=format_error_response("Attachment validation failed", {"attachment": str(e)}),
+        )
+    if ingested is None:
+        # Another request completed or aborted it first
+        raise upload_not_found(app_id, upload_id)
+    
+    try:
+        att = await run_in_threadpool(
+            store.create_attachment_from_blob, app_id, ingested.title, ingested.mime_type, ingested.writer
+        )
+    finally:
+        await run_in_threadpool(resumable.finish_session, upload_id)
+    if not att:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=format_error_response(f"Application with id '{app_id}' not found"),
+        )
+    
+    return await run_in_threadpool(attachment_created, app_id, att)
+
+
+@router.delete("/{app_id}/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload_session(app_id: str, upload_id: str):
+    """Abandon a resumable upload and free its disk space."""
+    await run_in_threadpool(get_upload_session, app_id, upload_id)
+    await run_in_threadpool(resumable.abort_session, upload_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.get("/{app_id}/attachments", response_model=AttachmentListResponse)
-async def list_attachments(app_id: str):
+def list_attachments(app_id: str):
     """List all attachments for an application."""
     # Check if application exists
     app = store.get_application(app_id)
@@ -91,23 +287,11 @@ async def list_attachments(app_id: str):
         )
     
     attachments = store.get_application_attachments(app_id)
-    metadata_list = [
-        AttachmentMetadata(
-            id=att["id"],
-            title=att["title"],
-            mime_type=att["mime_type"],
-            size_bytes=att["size_bytes"],
-            created_at=att["created_at"],
-        )
-        for att in attachments
-    ]
-    
-    return AttachmentListResponse(attachments=metadata_list)
+    return AttachmentListResponse(attachments=[attachment_metadata(att) for att in attachments])
 
 
-@router.get("/{app_id}/attachments/{attachment_id}")
-async def get_attachment(app_id: str, attachment_id: str):
-    """Stream binary attachment with proper headers."""
+def get_application_attachment(app_id: str, attachment_id: str) -> dict:
+    """The attachment's metadata; 404 unless it exists and belongs to the application."""
     # Check if application exists
     app = store.get_application(app_id)
     if not app:
@@ -130,21 +314,132 @@ async def get_attachment(app_id: str, attachment_id: str):
             status_code=status.HTTP_404_NOT_FOUND,
             detail=format_error_response(f"Attachment with id '{attachment_id}' not found"),
         )
+    return att
+
+
+@router.get("/{app_id}/attachments/{attachment_id}")
+async def get_attachment(
+    app_id: str,
+    attachment_id: str,
+    disposition: Literal["attachment", "inline"] = Query(
+        "attachment", description="inline lets the browser's viewer open the file"
+    ),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """
+    Stream binary attachment with proper headers.
+    A single byte range (Range: bytes=start-end) gets 206 with just those bytes, which
+    lets PDF viewers load page by page. Attachments never change, so the content hash
+    is the ETag and clients may cache them for good; If-None-Match gets an empty 304.
+    Attachments stored gzip-compressed go out as they are stored (Content-Encoding: gzip)
+    to clients that accept it, and are decompressed on the fly for the others and for ranges.
+    """
+    att = await run_in_threadpool(get_application_attachment, app_id, attachment_id)
+    size = att["size_bytes"]
+    etag = content_etag(att["sha256"])
+    headers = {"ETag": etag, "Cache-Control": ATTACHMENT_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    passthrough = False
+    if att.get("codec", CODEC_IDENTITY) == CODEC_GZIP:
+        headers["Vary"] = "Accept-Encoding"
+        passthrough = not range_header and accepts_encoding(accept_encoding, CODEC_GZIP)
+        if passthrough:
+            # The gzip-coded representation is a different byte sequence, so it has its own ETag
+            etag = content_etag(f"{att['sha256']}-{CODEC_GZIP}")
+            headers["ETag"] = etag
+    if not none_match(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    headers["Content-Disposition"] = f'{disposition}; filename="{att["title"]}"'
+    if passthrough:
+        headers["Content-Encoding"] = CODEC_GZIP
+        headers["Content-Length"] = str(att["stored_bytes"])
+        return StreamingResponse(store.blobs.iter_stored(att["sha256"]), media_type=att["mime_type"], headers=headers)
+    
+    try:
+        # A stale If-Range turns the request into a plain GET for the whole file
+        byte_range = parse_range(range_header, size) if if_range_matches(if_range, etag) else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail=format_error_response("Requested range not satisfiable", {"range": str(e)}),
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    
+    status_code = status.HTTP_200_OK
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    
+    # Small hot payloads come from the memory tier
+    data = await run_in_threadpool(store.blobs.read_cached, att["sha256"], size)
+    if data is not None:
+        return Response(
+            content=data[start:end + 1], status_code=status_code, media_type=att["mime_type"], headers=headers
+        )
     
-    # Return binary data with proper headers
-    return Response(
-        content=att["data"],
+    # Larger ones are streamed from disk in chunks, reading only the requested range
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        store.blobs.iter_chunks(att["sha256"], start=start, length=end - start + 1),
+        status_code=status_code,
         media_type=att["mime_type"],
-        headers={
-            "Content-Disposition": f'attachment; filename="{att["title"]}"',
-        },
+        headers=headers,
     )
 
 
+@router.get("/{app_id}/attachments/{attachment_id}/preview")
+async def get_attachment_preview(
+    app_id: str,
+    attachment_id: str,
+    size: int = Query(256, ge=16, le=2048, description=f"Longest side in pixels, rounded up to one of {PREVIEW_SIZES}"),
+    image_format: Literal["webp", "jpeg"] = Query("webp", alias="format"),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    A small thumbnail of an image attachment, or of the first page of a PDF, so galleries
+    need not download whole files. Rendered on first use and cached; 415 for other types.
+    """
+    att = await run_in_threadpool(get_application_attachment, app_id, attachment_id)
+    size = preview_size(size)
+    etag = content_etag(f"{att['sha256']}-{size}-{image_format}")
+    headers = {"ETag": etag, "Cache-Control": ATTACHMENT_CACHE_CONTROL}
+    if not none_match(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    try:
+        data = await preview_service.get(att["sha256"], att["mime_type"], size, image_format)
+    except PreviewUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=format_error_response(str(e)),
+        )
+    except ValueError:
+        # The reason (a decoder or PDFium error) is for the log, not the client
+        logger.warning("Preview of attachment %s could not be rendered", attachment_id, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=format_error_response("Cannot render preview"),
+        )
+    except FileNotFoundError:
+        # The attachment was deleted meanwhile (404 from the check), or its file is gone
+        await run_in_threadpool(get_application_attachment, app_id, attachment_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=format_error_response(f"Content of attachment '{attachment_id}' not found"),
+        )
+    
+    return Response(content=data, media_type=f"image/{image_format}", headers=headers)
+
+
 @router.delete("/{app_id}/attachments/{attachment_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_attachment(app_id: str, attachment_id: str):
     """Delete an attachment from an application."""
-    deleted = store.delete_attachment(app_id, attachment_id)
+    deleted = await run_in_threadpool(store.delete_attachment, app_id, attachment_id)
     if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -203,6 +203,7 @@ async def chat_message(request: ChatMessageRequest):
         }
     
     session = sessions[session_id]
+    session["last_updated"] = datetime.now()
     form_data = session["form_data"]
     last_question = session.get("last_question", "")
     
@@ -269,4 +270,5 @@ async def skip_to_acceptance(sessionId: str):
         )
     
     sessions[sessionId]["ready_to_skip"] = True
+    sessions[sessionId]["last_updated"] = datetime.now()
     return {"success": True, "readyToSkip": True}
@@ -1,5 +1,6 @@
 from fastapi import APIRouter
-from app.services.health import get_health_status
+from app.services.health import get_cache_stats, get_health_status, get_storage_stats
+from app.services.retention import retention_sweeper
 
 router = APIRouter(tags=["health"])
 
@@ -7,3 +8,20 @@ router = APIRouter(tags=["health"])
 @router.get("/health")
 async def healthcheck():
     return {"status": get_health_status()}
+
+
+@router.get("/health/caches")
+async def cache_stats():
+    return get_cache_stats()
+
+
+@router.get("/health/storage")
+async def storage_stats():
+    """How well stored attachments compress, per MIME type."""
+    return get_storage_stats()
+
+
+@router.get("/health/retention")
+async def retention_stats():
+    """TTL settings and what the retention sweeper has reclaimed so far."""
+    return retention_sweeper.stats()
@@ -1,4 +1,3 @@
-import base64
 import json
 import logging
 import os
@@ -9,9 +8,10 @@ from fastapi import APIRouter, HTTPException, status, Query
 from fastapi.responses import Response
 from pydantic import BaseModel
 
+from app.database.blobs import BlobTooLarge
+from app.services.ingestion import decode_base64
 from app.services.zus_accident_analyse import zus_accident_analyse
 from app.services.zus_card_generator import create_karta_wypadku, create_karta_wypadku_bytes
-from app.utils.validation import validate_mime_type, validate_attachment_size
 
 router = APIRouter(prefix="/api/zus-accidents", tags=["zus-accidents"])
 
@@ -81,26 +81,17 @@ async def analyse_accident(request: AnalyseRequest):
     mime_types = []
     
     for idx, file_input in enumerate(request.files):
-        # Validate MIME type
-        mime_valid, mime_error = validate_mime_type(file_input.mime_type)
-        if not mime_valid:
-            file_errors[f"files[{idx}].mime_type"] = mime_error
-            continue
-        
-        # Validate size
-        size_valid, size_error, _ = validate_attachment_size(file_input.data)
-        if not size_valid:
-            file_errors[f"files[{idx}].size"] = size_error
-            continue
-        
-        # Decode base64 to bytes
+        # Size check from the base64 length, a single decode, and the real type from the content
         try:
-            file_bytes = base64.b64decode(file_input.data)
-            source_files_bytes.append(file_bytes)
-            mime_types.append(file_input.mime_type)
-        except Exception as e:
-            file_errors[f"files[{idx}].data"] = f"Invalid base64 data: {str(e)}"
+            file_bytes, mime_type = decode_base64(file_input.data, file_input.mime_type)
+        except BlobTooLarge as e:
+            file_errors[f"files[{idx}].size"] = str(e)
+            continue
+        except ValueError as e:
+            file_errors[f"files[{idx}].data"] = str(e)
             continue
+        source_files_bytes.append(file_bytes)
+        mime_types.append(mime_type)
     
     # If there are validation errors, return them
     if file_errors:
@@ -0,0 +1,287 @@
+"""
+Columnar view of the applications for analytics.
+
+The store is read once into an Arrow table with one column per flattened
+`AccidentReportFormData` field (`poszkodowany.pesel`, `szczegoly.miejsce`,
+`swiadkowie_count`, ...) plus the record fields. String columns are
+dictionary-encoded, so a group-by is a `np.bincount` over the integer codes
+instead of a Python loop over records. The table is shared by all requests
+of the worker and refreshed when the store has changed, at most once every
+ANALYTICS_REFRESH_SECONDS; a refresh only decodes the applications that
+changed since the previous table.
+"""
+import io
+import os
+import threading
+import time
+import typing
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pydantic import BaseModel
+
+from app.database.store import store
+from app.models.schemas import AccidentReportFormData
+
+# How stale the analytics table may get while the store keeps changing
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "10"))
+
+_BUILD_BATCH_SIZE = 10_000  # rows converted to Arrow at a time
+_ARROW_TYPES = {str: pa.string(), bool: pa.bool_(), float: pa.float64(), int: pa.int64()}
+
+METRICS = ("count", "sum", "mean", "min", "max")
+
+
+def _form_columns(model: typing.Type[BaseModel], prefix: Tuple[str, ...] = ()) -> List[Tuple[str, Tuple[str, ...], pa.DataType]]:
+    """(column name, path in form_data, type) for every scalar field; lists become `<name>_count`."""
+    columns = []
+    for name, field in model.model_fields.items():
+        path = prefix + (name,)
+        annotation = field.annotation
+        if typing.get_origin(annotation) is typing.Union:  # Optional[X]
+            annotation = next(arg for arg in typing.get_args(annotation) if arg is not type(None))
+        if typing.get_origin(annotation) is list:
+            columns.append((".".join(path) + "_count", path, pa.int32()))
+        elif isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            columns += _form_columns(annotation, path)
+        else:
+            columns.append((".".join(path), path, _ARROW_TYPES[annotation]))
+    return columns
+
+
+_FORM_COLUMNS = _form_columns(AccidentReportFormData)
+
+SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("version", pa.int64()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("updated_at", pa.timestamp("us", tz="UTC")),
+        ("status", pa.string()),
+        ("ai_suggestion", pa.float64()),
+        ("attachment_count", pa.int32()),
+    ]
+    + [(name, arrow_type) for name, _, arrow_type in _FORM_COLUMNS]
+)
+
+
+def _form_value(form: dict, path: Tuple[str, ...]) -> Any:
+    value = form
+    for key in path:
+        if value is None:
+            return None
+        value = value.get(key)
+    return len(value) if isinstance(value, list) else value
+
+
+def _row(app: dict) -> list:
+    form = app["form_data"]
+    return [
+        app["id"],
+        app["version"],
+        app["created_at"],
+        app["updated_at"],
+        app.get("status"),
+        app.get("ai_suggestion"),
+        len(app["attachment_ids"]),
+    ] + [_form_value(form, path) for _, path, _ in _FORM_COLUMNS]
+
+
+def _record_batch(rows: List[list]) -> pa.RecordBatch:
+    # Transpose in C, then let Arrow convert each column in one call
+    columns = zip(*rows)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, SCHEMA)], schema=SCHEMA
+    )
+
+
+def _dictionary_encode(table: pa.Table) -> pa.Table:
+    """Store repeated strings (status, places, names) once; group-bys then work on the integer codes."""
+    table = table.combine_chunks()
+    for i, field in enumerate(table.schema):
+        if field.type == pa.string() and field.name != "id":
+            table = table.set_column(i, field.name, pc.dictionary_encode(table.column(i)))
+    return table
+
+
+class ApplicationFrame:
+    """An Arrow table of all applications as of store `version`, with NumPy views for aggregations."""
+
+    def __init__(self, table: pa.Table, version: int):
+        self.table = table
+        self.version = version
+        self.built_at = time.monotonic()
+        self._codes: Dict[str, Tuple[list, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, previous: Optional["ApplicationFrame"] = None) -> "ApplicationFrame":
+        """
+        Read the store into a new frame. Rows of `previous` whose application is
+        still at the same version are reused, so only changed applications are
+        decoded and flattened again.
+        """
+        # Read the version first: the table is then at least as new as the version it claims
+        version = store.version
+        positions = previous.positions() if previous is not None else {}
+        versions = previous.table.column("version").to_numpy() if previous is not None else None
+
+        kept: List[int] = []  # rows of previous.table to reuse
+        order: List[int] = []  # final row order: >= 0 index into kept, < 0 ~index into the new rows
+        batches = []
+        rows = []
+        fresh = 0
+        for app in store.iter_applications():
+            position = positions.get(app["id"])
+            if position is not None and versions[position] == app["version"]:
+                order.append(len(kept))
+                kept.append(position)
+                continue
+            order.append(~fresh)
+            fresh += 1
+            rows.append(_row(app))
+            if len(rows) == _BUILD_BATCH_SIZE:
+                batches.append(_record_batch(rows))
+                rows = []
+        if rows:
+            batches.append(_record_batch(rows))
+
+        table = _dictionary_encode(pa.Table.from_batches(batches, schema=SCHEMA))
+        if kept:
+            reused = previous.table.take(pa.array(kept, type=pa.int64()))
+            table = pa.concat_tables([reused, table]).unify_dictionaries().combine_chunks()
+            if fresh:
+                # Put the changed rows back into newest-first order
+                order = np.array(order, dtype=np.int64)
+                order[order < 0] = len(kept) + ~order[order < 0]
+                table = table.take(pa.array(order))
+        return cls(table, version)
+
+    def positions(self) -> Dict[str, int]:
+        """Row number of every application id."""
+        return dict(zip(self.table.column("id").to_pylist(), range(self.table.num_rows)))
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def group_codes(self, column: str) -> Tuple[list, np.ndarray]:
+        """
+        Group keys and the key index of every row for a string or boolean column.
+        Missing values form their own group with key None.
+        """
+        with self._lock:
+            if column not in self._codes:
+                self._codes[column] = self._compute_codes(column)
+            return self._codes[column]
+
+    def _compute_codes(self, column: str) -> Tuple[list, np.ndarray]:
+        if column not in self.table.column_names:
+            raise ValueError(f"Unknown column '{column}'")
+        values = self.table.column(column).combine_chunks()
+        if pa.types.is_dictionary(values.type):
+            keys = values.dictionary.to_pylist() + [None]
+            codes = pc.fill_null(values.indices, len(keys) - 1)
+        elif pa.types.is_boolean(values.type):
+            keys = [False, True, None]
+            codes = pc.fill_null(pc.cast(values, pa.int8()), 2)
+        else:
+            raise ValueError(f"Column '{column}' cannot be grouped by, use a text or yes/no column")
+        return keys, codes.to_numpy(zero_copy_only=False).astype(np.intp)
+
+    def numbers(self, column: str) -> np.ndarray:
+        """A numeric column as float64, NaN where the value is missing."""
+        if column not in self.table.column_names:
+            raise ValueError(f"Unknown column '{column}'")
+        values = self.table.column(column)
+        if not (pa.types.is_floating(values.type) or pa.types.is_integer(values.type)):
+            raise ValueError(f"Column '{column}' is not numeric")
+        return pc.cast(values, pa.float64()).to_numpy().astype(np.float64, copy=False)
+
+
+def aggregate(frame: ApplicationFrame, group_by: str, metric: str = "count", value: Optional[str] = None) -> List[dict]:
+    """
+    Group the rows of `frame` by `group_by` and compute `metric` of the `value` column per group
+    (rows without a value are left out of sum, mean, min and max).
+    Returns [{"key", "count", "value"}], largest groups first.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', use one of: {', '.join(METRICS)}")
+    keys, codes = frame.group_codes(group_by)
+    groups = len(keys)
+    counts = np.bincount(codes, minlength=groups)
+
+    results = None
+    if metric != "count":
+        if value is None:
+            raise ValueError(f"Metric '{metric}' needs a value column")
+        values = frame.numbers(value)
+        present = ~np.isnan(values)
+        value_codes, values = codes[present], values[present]
+        if metric in ("sum", "mean"):
+            results = np.bincount(value_codes, weights=values, minlength=groups)
+            if metric == "mean":
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    results = results / np.bincount(value_codes, minlength=groups)
+        else:
+            # Sort by group, then reduce each run of equal codes
+            order = np.argsort(value_codes, kind="stable")
+            sorted_codes = value_codes[order]
+            starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(order) else order
+            reduce = np.minimum if metric == "min" else np.maximum
+            results = np.full(groups, np.nan)
+            if len(order):
+                results[sorted_codes[starts]] = reduce.reduceat(values[order], starts)
+
+    present_groups = np.flatnonzero(counts)
+    present_groups = present_groups[np.argsort(-counts[present_groups], kind="stable")]
+    return [
+        {
+            "key": keys[i],
+            "count": int(counts[i]),
+            "value": float(counts[i]) if results is None else (None if np.isnan(results[i]) else float(results[i])),
+        }
+        for i in present_groups
+    ]
+
+
+def to_arrow_ipc(frame: ApplicationFrame) -> bytes:
+    """The table in the Arrow IPC file format (readable with pyarrow, pandas, polars, DuckDB)."""
+    sink = io.BytesIO()
+    with pa.ipc.new_file(sink, frame.table.schema) as writer:
+        writer.write_table(frame.table)
+    return sink.getvalue()
+
+
+def to_parquet(frame: ApplicationFrame) -> bytes:
+    sink = io.BytesIO()
+    pq.write_table(frame.table, sink, compression="zstd")
+    return sink.getvalue()
+
+
+_frame: Optional[ApplicationFrame] = None
+_frame_lock = threading.Lock()
+
+
+def get_frame() -> ApplicationFrame:
+    """
+    The shared analytics table. Rebuilt when the store changed since it was built,
+    but not more than once per ANALYTICS_REFRESH_SECONDS; concurrent callers wait
+    for a single rebuild.
+    """
+    global _frame
+
+    def fresh(frame: Optional[ApplicationFrame]) -> bool:
+        return frame is not None and (
+            frame.version == store.version or time.monotonic() - frame.built_at < ANALYTICS_REFRESH_SECONDS
+        )
+
+    frame = _frame
+    if fresh(frame):
+        return frame
+    with _frame_lock:
+        if not fresh(_frame):
+            _frame = ApplicationFrame.build(_frame)
+        return _frame
@@ -0,0 +1,104 @@
+"""
+Case bundles: one ZIP with everything about an application, for handing it over.
+
+The archive holds `application.json` (as returned by GET /api/applications/{id}),
+the accident card generated for it, and every attachment under `attachments/`.
+It is streamed as it is assembled (see app/utils/zipstream.py), one blob chunk
+at a time, so memory use does not depend on the size of the case. No member is
+compressed twice: attachments stored gzip-compressed go in as the deflate data
+they already contain, already-compressed formats (JPEG, PNG, PDF, DOCX, ...)
+are stored as they are, and only the rest is deflated on the way.
+"""
+import itertools
+import os
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.database.blobs import CODEC_GZIP
+from app.database.store import store
+from app.models.schemas import ApplicationResponse
+from app.utils.zipstream import ZIP_DEFLATED, ZIP_STORED, ZipStream
+
+ATTACHMENTS_DIR = "attachments"
+
+# Formats that are compressed already: deflating them again costs CPU and saves next to nothing
+_PRECOMPRESSED_MIME_TYPES = {
+    "application/pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "image/jpeg",
+    "image/jpg",
+    "image/png",
+    "image/gif",
+    "image/webp",
+}
+
+
+def bundle_filename(app: dict) -> str:
+    return f"application_{app['id']}.zip"
+
+
+def card_description(form_data: dict) -> str:
+    """Time, place and circumstances of the accident, for section III.2 of the accident card."""
+    details = form_data.get("szczegoly") or {}
+    when = " ".join(part for part in (details.get("data"), details.get("godzina")) if part)
+    lines = [", ".join(part for part in (when, details.get("miejsce")) if part)]
+    lines += [details.get("opis_okolicznosci"), details.get("opis_urazow")]
+    return "\n".join(line for line in lines if line)
+
+
+def _member_name(title: str, attachment_id: str, taken: Dict[str, int]) -> str:
+    """A safe, unique path inside the archive for an attachment titled `title`."""
+    name = title.replace("\\", "/").rsplit("/", 1)[-1].strip().lstrip(".") or attachment_id
+    base, ext = os.path.splitext(name)
+    count = taken.get(name.lower(), 0)
+    taken[name.lower()] = count + 1
+    if count:
+        name = f"{base} ({count + 1}){ext}"
+        taken[name.lower()] = 1
+    return f"{ATTACHMENTS_DIR}/{name}"
+
+
+def _opened(chunks: Iterator[bytes]) -> Optional[Iterator[bytes]]:
+    """`chunks` with the blob file already open, or None if the blob is gone (the attachment was deleted)."""
+    try:
+        first = next(chunks, b"")
+    except FileNotFoundError:
+        return None
+    return itertools.chain([first], chunks)
+
+
+def _attachment_members(archive: ZipStream, attachments: List[dict]) -> Iterator[bytes]:
+    taken: Dict[str, int] = {}
+    for att in attachments:
+        modified = att["created_at"]
+        if att.get("codec") == CODEC_GZIP:
+            try:
+                crc, compressed_size, deflated = store.blobs.open_deflated(att["sha256"])
+            except FileNotFoundError:
+                continue
+            name = _member_name(att["title"], att["id"], taken)
+            yield from archive.add_deflated(name, deflated, crc, compressed_size, att["size_bytes"], modified)
+            continue
+
+        # Straight from the blob files: a bundle should not evict the hot attachments from the cache
+        chunks = _opened(store.blobs.iter_chunks(att["sha256"]))
+        if chunks is None:
+            continue
+        method = ZIP_STORED if att["mime_type"] in _PRECOMPRESSED_MIME_TYPES else ZIP_DEFLATED
+        yield from archive.add(_member_name(att["title"], att["id"], taken), chunks, modified, method)
+
+
+def iter_bundle(app: dict, attachments: List[dict], card: Tuple[bytes, str]) -> Iterator[bytes]:
+    """
+    Yield the ZIP bundle of `app` with its `attachments` and the (document, filename)
+    of its accident card. Attachments deleted while the bundle is streamed are left out.
+    """
+    archive = ZipStream()
+    now = datetime.utcnow()  # like the attachments' timestamps
+    application_json = ApplicationResponse(**app).model_dump_json(indent=2).encode()
+    yield from archive.add("application.json", [application_json], now, ZIP_DEFLATED)
+    card_bytes, card_filename = card
+    yield from archive.add(card_filename, [card_bytes], now, ZIP_STORED)
+    yield from _attachment_members(archive, attachments)
+    yield from archive.finish()
@@ -0,0 +1,74 @@
+"""
+Server-sent event stream of application changes (the officer list's live feed).
+
+Each stream only compares the store version with its own position every
+CHANGES_POLL_MS and reads the new events from the store's change log when
+the version moved, so idle screens cost nothing and busy ones one read per
+batch of changes. Both reads run in worker threads, since the SQLite
+backend answers them with queries. Every event carries its version as the SSE id (on the
+last event of a version, when a version has several), which lets the
+browser resume with Last-Event-ID after a reconnect. When the change log
+no longer reaches back that far, a `reset` event tells the client to reload.
+"""
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Awaitable, Callable, List
+
+from starlette.concurrency import run_in_threadpool
+
+from app.database.store import store
+
+CHANGES_POLL_MS = float(os.getenv("CHANGES_POLL_MS", "250"))
+CHANGES_HEARTBEAT_SECONDS = float(os.getenv("CHANGES_HEARTBEAT_SECONDS", "15"))
+_READ_VERSIONS = 1000  # versions read from the change log at a time
+
+
+def current_version() -> int:
+    """The store version (blocking with SQLite; run it in a worker thread)."""
+    return store.version
+
+
+def format_change_events(events: List[dict]) -> str:
+    """SSE messages for `events`; the id is set once all events of a version have been sent."""
+    messages = []
+    for i, event in enumerate(events):
+        message = f"event: change\ndata: {json.dumps(event, separators=(',', ':'))}\n"
+        if i == len(events) - 1 or events[i + 1]["version"] != event["version"]:
+            message += f"id: {event['version']}\n"
+        messages.append(message + "\n")
+    return "".join(messages)
+
+
+def format_reset(version: int) -> str:
+    return f"event: reset\ndata: {json.dumps({'version': version})}\nid: {version}\n\n"
+
+
+async def change_stream(version: int, is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[str]:
+    """Stream the changes after store version `version` until the client goes away."""
+    yield f"retry: {int(CHANGES_POLL_MS * 4)}\n\n"
+    idle = 0.0
+    while not await is_disconnected():
+        current = await run_in_threadpool(current_version)
+        if current == version:
+            await asyncio.sleep(CHANGES_POLL_MS / 1000)
+            idle += CHANGES_POLL_MS / 1000
+            if idle >= CHANGES_HEARTBEAT_SECONDS:
+                # Keeps proxies from closing a quiet connection
+                yield ": keep-alive\n\n"
+                idle = 0.0
+            continue
+
+        idle = 0.0
+        # Never read past `current`: later versions may still be in flight. A store
+        # behind the client has started over (e.g. a restarted in-memory store).
+        count = min(current - version, _READ_VERSIONS)
+        events = await run_in_threadpool(store.changes_since, version, count) if count > 0 else None
+        if events is None:
+            version = current
+            yield format_reset(version)
+            continue
+        if events:
+            yield format_change_events(events)
+        # Versions without an event (e.g. a no-op bulk request) are passed over as well
+        version += count
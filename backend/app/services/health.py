@@ -1,2 +1,35 @@
+from app.database.store import store
+from app.services.previews import preview_service
+from app.utils.response_cache import response_cache
+
+
 def get_health_status() -> str:
     return "ok"
+
+
+def get_cache_stats() -> dict:
+    """Hit/miss/eviction counters of this worker's caches."""
+    return {
+        "responses": response_cache.stats(),
+        "attachments": store.blobs.cache_stats(),
+        "previews": preview_service.stats(),
+    }
+
+
+def _with_ratio(entry: dict) -> dict:
+    # stored / uploaded: 1.0 means nothing saved
+    ratio = entry["stored_bytes"] / entry["size_bytes"] if entry["size_bytes"] else 1.0
+    return {**entry, "ratio": round(ratio, 3)}
+
+
+def get_storage_stats() -> dict:
+    """Attachment bytes as uploaded and as stored on disk, overall and per MIME type."""
+    by_type = store.attachment_storage_stats()
+    total = {"attachments": 0, "size_bytes": 0, "stored_bytes": 0, "compressed": 0}
+    for entry in by_type.values():
+        for key in total:
+            total[key] += entry[key]
+    return {
+        "total": _with_ratio(total),
+        "by_mime_type": {mime_type: _with_ratio(entry) for mime_type, entry in sorted(by_type.items())},
+    }
@@ -0,0 +1,116 @@
+"""
+Attachment ingestion: one pass from an uploaded payload to the blob store.
+
+Base64 payloads are decoded in slices of INGEST_SLICE_CHARS characters. The
+size is known from the text length before anything is decoded, the first
+slice's leading bytes decide the real type (`resolve_mime_type`), and every
+slice then goes into a BlobWriter, which hashes it while writing it to the
+blob directory. Nothing holds the whole decoded payload or decodes it twice;
+the store commits the writer together with the attachment record.
+"""
+import binascii
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from app.database.blobs import BlobTooLarge, BlobWriter
+from app.database.store import store
+from app.utils.validation import (
+    MAX_ATTACHMENT_SIZE_BYTES,
+    SNIFF_BYTES,
+    base64_decoded_size,
+    compact_base64,
+    resolve_mime_type,
+)
+
+INGEST_SLICE_CHARS = 64 * 1024  # base64 characters decoded at a time (a multiple of 4)
+
+
+@dataclass
+class IngestedAttachment:
+    """A checked payload waiting in `writer` until the store commits it (or it is discarded)."""
+    title: str
+    mime_type: str
+    writer: BlobWriter
+
+    @property
+    def size_bytes(self) -> int:
+        return self.writer.size
+
+
+def _checked_base64(data_base64: str, max_size: int) -> str:
+    data_base64 = compact_base64(data_base64)
+    if len(data_base64) % 4:
+        raise ValueError("Invalid base64 data: length is not a multiple of 4")
+    if base64_decoded_size(data_base64) > max_size:
+        raise BlobTooLarge(max_size)
+    return data_base64
+
+
+def ingest_base64(
+    title: str,
+    mime_type: Optional[str],
+    data_base64: str,
+    max_size: int = MAX_ATTACHMENT_SIZE_BYTES,
+) -> IngestedAttachment:
+    """
+    Decode, check, hash and write one base64 attachment (blocking; run it in a worker thread).
+    Raises ValueError (BlobTooLarge past `max_size`) for an invalid payload.
+    """
+    data_base64 = _checked_base64(data_base64, max_size)
+    writer = store.blobs.writer(max_size)
+    real_type = None
+    try:
+        for start in range(0, len(data_base64), INGEST_SLICE_CHARS):
+            chunk = binascii.a2b_base64(data_base64[start:start + INGEST_SLICE_CHARS], strict_mode=True)
+            if real_type is None:
+                real_type = resolve_mime_type(chunk[:SNIFF_BYTES], mime_type)
+            writer.write(chunk)
+        if real_type is None:
+            real_type = resolve_mime_type(b"", mime_type)  # raises: nothing was sent
+    except binascii.Error as e:
+        writer.discard()
+        raise ValueError(f"Invalid base64 data: {e}") from e
+    except BaseException:
+        writer.discard()
+        raise
+    return IngestedAttachment(title=title, mime_type=real_type, writer=writer)
+
+
+def ingest_all(attachments: List[dict], max_size: int = MAX_ATTACHMENT_SIZE_BYTES) -> List[IngestedAttachment]:
+    """
+    Ingest several {"title", "mime_type", "data"} attachments, all or nothing: if one
+    is invalid the others are discarded and its ValueError is raised.
+    """
+    ingested: List[IngestedAttachment] = []
+    try:
+        for att in attachments:
+            for field in ("title", "mime_type", "data"):
+                if field not in att:
+                    raise ValueError(f"Missing required field: {field}")
+            ingested.append(ingest_base64(att["title"], att["mime_type"], att["data"], max_size))
+    except BaseException:
+        discard_all(ingested)
+        raise
+    return ingested
+
+
+def discard_all(ingested: List[IngestedAttachment]) -> None:
+    for att in ingested:
+        att.writer.discard()
+
+
+def decode_base64(
+    data_base64: str,
+    mime_type: Optional[str],
+    max_size: int = MAX_ATTACHMENT_SIZE_BYTES,
+) -> Tuple[bytes, str]:
+    """
+    For payloads only used in memory (e.g. sent on for analysis): check the size
+    before decoding, decode once and sniff the real type. Returns (data, mime type).
+    """
+    data_base64 = _checked_base64(data_base64, max_size)
+    try:
+        data = binascii.a2b_base64(data_base64, strict_mode=True)
+    except binascii.Error as e:
+        raise ValueError(f"Invalid base64 data: {e}") from e
+    return data, resolve_mime_type(data[:SNIFF_BYTES], mime_type)
@@ -0,0 +1,83 @@
+"""
+Thumbnail rendering for attachment previews.
+
+Runs inside the preview worker processes (see app/services/previews.py), so
+it imports nothing from the app but Pillow and pypdfium2, and works on the
+blob file's path: only the small encoded thumbnail travels back. Blobs stored
+gzip-compressed are decompressed here as they are read.
+"""
+import gzip
+import io
+
+import pypdfium2
+from PIL import Image, ImageOps
+
+# Refuse images that would decompress to more than this (Pillow raises DecompressionBombError)
+Image.MAX_IMAGE_PIXELS = 64 * 1024 * 1024
+
+IMAGE_MIME_TYPES = {"image/jpeg", "image/jpg", "image/png", "image/gif", "image/webp", "image/bmp", "image/tiff"}
+PDF_MIME_TYPE = "application/pdf"
+
+
+def _open_image(path: str, compressed: bool, size: int) -> Image.Image:
+    if compressed:
+        with gzip.open(path) as f:
+            return _thumbnail(Image.open(f), size)
+    return _thumbnail(Image.open(path), size)
+
+
+def _thumbnail(image: Image.Image, size: int) -> Image.Image:
+    # JPEGs are decoded at a reduced scale straight away (DCT scaling), not at full size
+    image.draft("RGB", (size, size))
+    # Multi-frame files (GIF, TIFF) show their first frame; photos are turned upright
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((size, size), Image.Resampling.LANCZOS)
+    return image
+
+
+def _render_pdf_page(path: str, compressed: bool, size: int) -> Image.Image:
+    if compressed:
+        # PDFium needs random access, which a gzip stream cannot give
+        with gzip.open(path) as f:
+            pdf = pypdfium2.PdfDocument(f.read())
+    else:
+        pdf = pypdfium2.PdfDocument(path)
+    try:
+        page = pdf[0]
+        width, height = page.get_size()  # in points (1/72 in)
+        bitmap = page.render(scale=size / max(width, height, 1))
+        image = bitmap.to_pil()
+        page.close()
+        return image
+    finally:
+        pdf.close()
+
+
+def render_preview(path: str, codec: str, mime_type: str, size: int, image_format: str) -> bytes:
+    """
+    Encode a preview of the file at `path` (stored with `codec`, "identity" or "gzip") that
+    fits in `size` x `size` pixels: the image itself, or the first page of a PDF.
+    `image_format` is "webp" or "jpeg".
+    """
+    compressed = codec == "gzip"
+    if mime_type == PDF_MIME_TYPE:
+        image = _render_pdf_page(path, compressed, size)
+    else:
+        image = _open_image(path, compressed, size)
+
+    if image_format == "jpeg" or image.mode not in ("RGB", "RGBA"):
+        if image.mode in ("RGBA", "LA", "P"):
+            # JPEG has no alpha: flatten transparent areas onto white
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+
+    out = io.BytesIO()
+    if image_format == "jpeg":
+        image.save(out, "JPEG", quality=80, optimize=True)
+    else:
+        image.save(out, "WEBP", quality=80, method=4)
+    return out.getvalue()
@@ -0,0 +1,115 @@
+"""
+Attachment previews: downscaled thumbnails of images and first-page rasters of PDFs.
+
+Previews are rendered lazily, on the first request, in a pool of
+PREVIEW_WORKERS processes (decoding is CPU-bound, and PDFium is not
+thread-safe). Requested sizes are rounded up to one of PREVIEW_SIZES, and
+the results are kept in a byte-bounded LRU keyed by content hash, size and
+format, so every attachment sharing a payload shares its previews, and
+concurrent requests for the same preview wait for a single render.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.database.blobs import BlobCache
+from app.database.store import store
+from app.services.preview_render import IMAGE_MIME_TYPES, PDF_MIME_TYPE, render_preview
+
+PREVIEW_SIZES = (128, 256, 512, 1024)
+PREVIEW_WORKERS = int(os.getenv("PREVIEW_WORKERS", "2"))
+PREVIEW_CACHE_MB = float(os.getenv("PREVIEW_CACHE_MB", "32"))
+
+_PREVIEW_MAX_BYTES = 1024 * 1024  # a single preview larger than this is served but not cached
+
+
+class PreviewUnavailable(ValueError):
+    """There is no preview for this kind of attachment (e.g. Word and Excel files)."""
+
+
+def _cache_key(key: Tuple[str, int, str]) -> str:
+    return ":".join(str(part) for part in key)
+
+
+def preview_size(requested: int) -> int:
+    """The smallest supported size at least `requested` (the largest one beyond that)."""
+    return next((size for size in PREVIEW_SIZES if size >= requested), PREVIEW_SIZES[-1])
+
+
+class PreviewService:
+    def __init__(self):
+        self._cache = BlobCache(int(PREVIEW_CACHE_MB * 1024 * 1024), _PREVIEW_MAX_BYTES)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[Tuple[str, int, str], asyncio.Future] = {}  # renders in progress
+        self.renders = 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned, not forked: the server process has threads and open store handles
+            self._executor = ProcessPoolExecutor(
+                max_workers=PREVIEW_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def get(self, sha256: str, mime_type: str, size: int, image_format: str) -> bytes:
+        """
+        The encoded preview of a payload, rendering it on a miss.
+        Raises PreviewUnavailable for types without previews, ValueError for files
+        that cannot be rendered and FileNotFoundError for a missing payload.
+        """
+        if mime_type != PDF_MIME_TYPE and mime_type not in IMAGE_MIME_TYPES:
+            raise PreviewUnavailable(f"No preview available for '{mime_type}'")
+        key = (sha256, size, image_format)
+        data = self._cache.get(_cache_key(key))
+        if data is not None:
+            return data
+
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._render(key, mime_type))
+            self._pending[key] = task
+            task.add_done_callback(lambda done: self._render_done(key, done))
+        # A client that goes away does not cancel the render the others are waiting for
+        return await asyncio.shield(task)
+
+    async def _render(self, key: Tuple[str, int, str], mime_type: str) -> bytes:
+        sha256, size, image_format = key
+        try:
+            path, codec = await run_in_threadpool(store.blobs.locate, sha256)
+            data = await asyncio.wrap_future(
+                self._pool().submit(render_preview, path, codec, mime_type, size, image_format)
+            )
+        except FileNotFoundError:
+            raise
+        except BrokenProcessPool as e:
+            # A worker died (e.g. PDFium crashed on a damaged file); start a fresh pool next time
+            self.close()
+            raise ValueError("Preview could not be rendered") from e
+        except Exception as e:
+            # Broken or hostile files: truncated images, decompression bombs, damaged PDFs
+            raise ValueError(f"Preview could not be rendered: {e}") from e
+        self.renders += 1
+        self._cache.put(_cache_key(key), data)
+        return data
+
+    def _render_done(self, key: Tuple[str, int, str], task: asyncio.Future) -> None:
+        self._pending.pop(key, None)
+        if not task.cancelled():
+            # Marks a failure as handled even if every waiting client has gone away
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._cache.stats(), "renders": self.renders, "rendering": len(self._pending)}
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+preview_service = PreviewService()
@@ -0,0 +1,294 @@
+"""
+Resumable chunked attachment uploads.
+
+A client creates an upload session with the file's size, PUTs its numbered
+chunks in any order (re-sending any that failed), asks which ones arrived,
+and completes the session into a normal attachment. Everything lives on disk
+under the blob store's upload directory, so sessions survive restarts and are
+shared by every worker using the same blob directory (the SQLite backend, or
+the memory backend with STORE_DATA_DIR; without it each process has a
+temporary blob directory of its own and its sessions go with it):
+
+    <upload_id>/meta.json   title, type, size, chunk size, application id
+    <upload_id>/data        the file, preallocated; chunk N is written at N * chunk_size
+    <upload_id>/received/N  written once chunk N is complete and flushed
+
+Chunks are streamed from the request straight to their offset in `data`, so
+completing a session only hashes the assembled file in one read pass and
+moves it into the blob store; it is never copied or held in memory.
+Chunk writes hold a shared `flock` on meta.json while they touch the
+file, and completion takes it exclusively to rename the directory to
+`<upload_id>.completing` before hashing: a chunk still arriving then finds
+its session gone and is refused instead of changing hashed data.
+Sessions idle for longer than UPLOAD_SESSION_TTL_HOURS are removed by the
+retention sweeper.
+"""
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+from starlette.concurrency import run_in_threadpool
+
+from app.database.blobs import BlobWriter
+from app.database.store import store
+from app.services.ingestion import IngestedAttachment
+from app.utils.validation import MAX_ATTACHMENT_SIZE_BYTES, resolve_mime_type, validate_mime_type
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_MIN_CHUNK_SIZE = 64 * 1024
+UPLOAD_MAX_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_SESSION_TTL_HOURS = float(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+
+_META_FILE = "meta.json"
+_DATA_FILE = "data"
+_RECEIVED_DIR = "received"
+_COMPLETING_SUFFIX = ".completing"  # a session taken by `complete`; no longer visible
+# How long past the idle limit a completion may take before its leftovers count as crashed
+_COMPLETING_GRACE = timedelta(hours=1)
+
+
+def _session_dir(upload_id: str) -> str:
+    return os.path.join(store.blobs.upload_directory(), upload_id)
+
+
+@contextmanager
+def _locked(fd: int, exclusive: bool = False) -> Iterator[None]:
+    """Hold an `flock` on the session's meta.json (opened as `fd`): shared for chunk writes."""
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    try:
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def _check_open(directory: str) -> None:
+    """Raises FileNotFoundError once the session was taken by `complete` or aborted."""
+    if not os.path.isdir(directory):
+        raise FileNotFoundError(directory)
+
+
+def total_chunks(session: dict) -> int:
+    return -(-session["size_bytes"] // session["chunk_size"])
+
+
+def chunk_length(session: dict, index: int) -> int:
+    """Expected length of chunk `index` (only the last one may be shorter)."""
+    start = index * session["chunk_size"]
+    return min(session["chunk_size"], session["size_bytes"] - start)
+
+
+def create_session(app_id: str, title: str, mime_type: str, size_bytes: int, chunk_size: Optional[int]) -> dict:
+    """Start an upload session. Raises ValueError for an invalid file description."""
+    mime_valid, mime_error = validate_mime_type(mime_type)
+    if not mime_valid:
+        raise ValueError(mime_error)
+    if size_bytes <= 0:
+        raise ValueError("Attachment is empty")
+    if size_bytes > MAX_ATTACHMENT_SIZE_BYTES:
+        raise ValueError(
+            f"Attachment size ({size_bytes} bytes) exceeds maximum allowed size ({MAX_ATTACHMENT_SIZE_BYTES} bytes)"
+        )
+    chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+    if not UPLOAD_MIN_CHUNK_SIZE <= chunk_size <= UPLOAD_MAX_CHUNK_SIZE:
+        raise ValueError(f"chunk_size must be between {UPLOAD_MIN_CHUNK_SIZE} and {UPLOAD_MAX_CHUNK_SIZE} bytes")
+
+    session = {
+        "id": str(uuid.uuid4()),
+        "app_id": app_id,
+        "title": title,
+        "mime_type": mime_type,
+        "size_bytes": size_bytes,
+        "chunk_size": chunk_size,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    directory = _session_dir(session["id"])
+    os.makedirs(os.path.join(directory, _RECEIVED_DIR))
+    with open(os.path.join(directory, _DATA_FILE), "wb") as f:
+        # Sparse until the chunks arrive
+        f.truncate(size_bytes)
+    with open(os.path.join(directory, _META_FILE), "w") as f:
+        json.dump(session, f)
+    return session
+
+
+def get_session(app_id: str, upload_id: str) -> Optional[dict]:
+    """The session `upload_id` of application `app_id`, or None."""
+    try:
+        uuid.UUID(upload_id)
+        with open(os.path.join(_session_dir(upload_id), _META_FILE)) as f:
+            session = json.load(f)
+    except (ValueError, FileNotFoundError):
+        return None
+    return session if session["app_id"] == app_id else None
+
+
+def received_chunks(session: dict) -> List[int]:
+    try:
+        return sorted(int(name) for name in os.listdir(os.path.join(_session_dir(session["id"]), _RECEIVED_DIR)))
+    except FileNotFoundError:
+        return []
+
+
+def session_status(session: dict) -> dict:
+    """The session with the chunks received so far, also as merged byte ranges [start, end)."""
+    received = received_chunks(session)
+    ranges: List[Tuple[int, int]] = []
+    for index in received:
+        start = index * session["chunk_size"]
+        end = start + chunk_length(session, index)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    last_active = os.path.getmtime(os.path.join(_session_dir(session["id"]), _META_FILE))
+    return {
+        **session,
+        "total_chunks": total_chunks(session),
+        "received_chunks": received,
+        "received_ranges": ranges,
+        "received_bytes": sum(end - start for start, end in ranges),
+        "expires_at": datetime.utcfromtimestamp(last_active) + timedelta(hours=UPLOAD_SESSION_TTL_HOURS),
+    }
+
+
+async def write_chunk(session: dict, index: int, body: AsyncIterator[bytes]) -> None:
+    """
+    Stream one chunk from `body` to its place in the file. Raises ValueError for an
+    index out of range or a body that is not exactly the chunk's length; the chunk
+    then simply counts as missing and can be sent again.
+    """
+    if not 0 <= index < total_chunks(session):
+        raise ValueError(f"Chunk index must be between 0 and {total_chunks(session) - 1}")
+    directory = _session_dir(session["id"])
+    expected = chunk_length(session, index)
+    offset = index * session["chunk_size"]
+    written = 0
+    lock_fd, data_fd = await run_in_threadpool(_open_session_files, directory)
+    try:
+        async for piece in body:
+            if written + len(piece) > expected:
+                raise ValueError(f"Chunk {index} must be {expected} bytes")
+            await run_in_threadpool(_write_piece, directory, lock_fd, data_fd, piece, offset + written)
+            written += len(piece)
+        if written != expected:
+            raise ValueError(f"Chunk {index} must be {expected} bytes, received {written}")
+        await run_in_threadpool(_mark_received, directory, lock_fd, data_fd, index)
+    finally:
+        os.close(data_fd)
+        os.close(lock_fd)
+
+
+def _open_session_files(directory: str) -> Tuple[int, int]:
+    """(meta.json opened for locking, data opened for writing)."""
+    lock_fd = os.open(os.path.join(directory, _META_FILE), os.O_RDONLY)
+    try:
+        return lock_fd, os.open(os.path.join(directory, _DATA_FILE), os.O_WRONLY)
+    except BaseException:
+        os.close(lock_fd)
+        raise
+
+
+def _write_piece(directory: str, lock_fd: int, data_fd: int, piece: bytes, offset: int) -> None:
+    with _locked(lock_fd):
+        _check_open(directory)
+        os.pwrite(data_fd, piece, offset)
+
+
+def _mark_received(directory: str, lock_fd: int, data_fd: int, index: int) -> None:
+    with _locked(lock_fd):
+        _check_open(directory)
+        # Only a chunk that is on disk may be reported as received
+        os.fsync(data_fd)
+        open(os.path.join(directory, _RECEIVED_DIR, str(index)), "w").close()
+        os.utime(os.path.join(directory, _META_FILE))
+
+
+def complete_session(session: dict) -> Optional[IngestedAttachment]:
+    """
+    Turn a fully received session into an attachment payload ready for the store
+    (blocking; run it in a worker thread). None if another request completed or
+    aborted it first. Raises ValueError while chunks are missing, or if the content
+    is not of an allowed type (the session is dropped then).
+    """
+    directory = _session_dir(session["id"])
+    taken = directory + _COMPLETING_SUFFIX
+    try:
+        lock_fd = os.open(os.path.join(directory, _META_FILE), os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    try:
+        # Waits for chunk writes in progress; any later one finds the directory renamed
+        with _locked(lock_fd, exclusive=True):
+            missing = total_chunks(session) - len(received_chunks(session))
+            if missing:
+                raise ValueError(f"{missing} chunk(s) not received yet")
+            try:
+                os.rename(directory, taken)
+            except FileNotFoundError:
+                return None
+    finally:
+        os.close(lock_fd)
+    try:
+        # From now on the mtime says when the completion started; see `expire_sessions`
+        os.utime(os.path.join(taken, _META_FILE))
+        writer = BlobWriter.adopt(os.path.join(taken, _DATA_FILE), MAX_ATTACHMENT_SIZE_BYTES)
+        mime_type = resolve_mime_type(writer.head, session["mime_type"])
+    except BaseException:
+        shutil.rmtree(taken, ignore_errors=True)
+        raise
+    # The data file leaves the session directory when the store commits it; see `finish_session`
+    return IngestedAttachment(title=session["title"], mime_type=mime_type, writer=writer)
+
+
+def finish_session(upload_id: str) -> None:
+    """Remove what is left of a completed session once the store has taken (or refused) its file."""
+    shutil.rmtree(_session_dir(upload_id) + _COMPLETING_SUFFIX, ignore_errors=True)
+
+
+def abort_session(upload_id: str) -> bool:
+    directory = _session_dir(upload_id)
+    if not os.path.isdir(directory):
+        return False
+    shutil.rmtree(directory, ignore_errors=True)
+    return True
+
+
+def expire_sessions(max_idle: timedelta) -> int:
+    """
+    Remove sessions without activity for longer than `max_idle`. Returns the number removed.
+    Sessions being completed are left alone unless they have been at it for `_COMPLETING_GRACE`
+    longer than that, which only a crashed completion does.
+    """
+    cutoff = time.time() - max_idle.total_seconds()
+    root = store.blobs.upload_directory()
+    removed = 0
+    for name in os.listdir(root):
+        directory = os.path.join(root, name)
+        try:
+            try:
+                last_active = os.path.getmtime(os.path.join(directory, _META_FILE))
+            except FileNotFoundError:
+                # Half-created, or left behind by a completion that crashed
+                last_active = os.path.getmtime(directory)
+        except FileNotFoundError:
+            # Completed or aborted meanwhile
+            continue
+        if name.endswith(_COMPLETING_SUFFIX):
+            last_active += _COMPLETING_GRACE.total_seconds()
+        if last_active < cutoff:
+            shutil.rmtree(directory, ignore_errors=True)
+            removed += 1
+    return removed
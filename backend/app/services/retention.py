@@ -0,0 +1,205 @@
+"""
+Background retention sweeper.
+
+Every RETENTION_SWEEP_INTERVAL_SECONDS it drops chat and voice sessions that
+have been inactive for longer than SESSION_TTL_MINUTES, resumable uploads
+idle for longer than UPLOAD_SESSION_TTL_HOURS, and deletes attachments and
+applications older than ATTACHMENT_RETENTION_DAYS / APPLICATION_RETENTION_DAYS
+(0 keeps them forever, the default).
+
+Store deletions run in a worker thread in slices of at most
+RETENTION_SLICE_SIZE items (and RETENTION_SLICE_BUDGET_MS of work), with a
+RETENTION_SLICE_PAUSE_MS pause between slices, so the store lock is only
+ever held for one short slice and requests get in between.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.database.store import store
+from app.services.resumable import UPLOAD_SESSION_TTL_HOURS, expire_sessions
+from app.utils.response_cache import response_cache
+
+SESSION_TTL_MINUTES = float(os.getenv("SESSION_TTL_MINUTES", "120"))
+APPLICATION_RETENTION_DAYS = float(os.getenv("APPLICATION_RETENTION_DAYS", "0"))
+ATTACHMENT_RETENTION_DAYS = float(os.getenv("ATTACHMENT_RETENTION_DAYS", "0"))
+RETENTION_SWEEP_INTERVAL_SECONDS = float(os.getenv("RETENTION_SWEEP_INTERVAL_SECONDS", "300"))
+RETENTION_SLICE_SIZE = int(os.getenv("RETENTION_SLICE_SIZE", "100"))
+RETENTION_SLICE_BUDGET_MS = float(os.getenv("RETENTION_SLICE_BUDGET_MS", "20"))
+RETENTION_SLICE_PAUSE_MS = float(os.getenv("RETENTION_SLICE_PAUSE_MS", "20"))
+
+_ATTACHMENT_SCAN_LIMIT = 10_000  # expired attachments looked up per store scan
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionSweeper:
+    """Applies the TTLs above to the store and to the registered session dicts."""
+
+    def __init__(self):
+        # name -> (sessions, predicate telling whether a session is still in use)
+        self._sessions: Dict[str, Tuple[Dict[str, dict], Optional[Callable[[str], bool]]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.reclaimed_total: Dict[str, int] = {"applications": 0, "attachments": 0, "upload_sessions": 0}
+        self.last_run: Optional[dict] = None
+
+    def track_sessions(
+        self,
+        name: str,
+        sessions: Dict[str, dict],
+        in_use: Optional[Callable[[str], bool]] = None,
+    ) -> None:
+        """
+        Expire entries of `sessions` (which carry `created_at` and optionally `last_updated`)
+        after SESSION_TTL_MINUTES of inactivity, unless `in_use(session_id)` says otherwise.
+        """
+        self._sessions[name] = (sessions, in_use)
+        self.reclaimed_total.setdefault(name, 0)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(RETENTION_SWEEP_INTERVAL_SECONDS)
+            try:
+                await self.sweep()
+            except Exception:
+                # A failed sweep is retried on the next interval; it must not kill the task
+                logger.exception("Retention sweep failed")
+
+    async def sweep(self) -> dict:
+        """Run one full sweep. Returns the number of items reclaimed per kind."""
+        started_at = datetime.now()
+        started = time.perf_counter()
+        reclaimed: Dict[str, int] = {}
+
+        for name, (sessions, in_use) in self._sessions.items():
+            reclaimed[name] = await self._sweep_sessions(sessions, in_use)
+        reclaimed["upload_sessions"] = await self._sweep_upload_sessions()
+        reclaimed["attachments"] = await self._sweep_attachments()
+        reclaimed["applications"] = await self._sweep_applications()
+
+        for name, count in reclaimed.items():
+            self.reclaimed_total[name] += count
+        self.runs += 1
+        self.last_run = {
+            "started_at": started_at,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "reclaimed": reclaimed,
+        }
+        if any(reclaimed.values()):
+            logger.info("Retention sweep reclaimed %s", ", ".join(f"{count} {name}" for name, count in reclaimed.items()))
+        return reclaimed
+
+    async def _sweep_sessions(self, sessions: Dict[str, dict], in_use: Optional[Callable[[str], bool]]) -> int:
+        if SESSION_TTL_MINUTES <= 0:
+            return 0
+        cutoff = datetime.now() - timedelta(minutes=SESSION_TTL_MINUTES)
+        expired = [
+            session_id
+            for session_id, session in list(sessions.items())
+            if (session.get("last_updated") or session.get("created_at") or cutoff) < cutoff
+            and not (in_use is not None and in_use(session_id))
+        ]
+        for i, session_id in enumerate(expired, 1):
+            sessions.pop(session_id, None)
+            if i % RETENTION_SLICE_SIZE == 0:
+                await asyncio.sleep(0)
+        return len(expired)
+
+    async def _sweep_upload_sessions(self) -> int:
+        if UPLOAD_SESSION_TTL_HOURS <= 0:
+            return 0
+        return await run_in_threadpool(expire_sessions, timedelta(hours=UPLOAD_SESSION_TTL_HOURS))
+
+    async def _sweep_attachments(self) -> int:
+        if ATTACHMENT_RETENTION_DAYS <= 0:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(days=ATTACHMENT_RETENTION_DAYS)
+        reclaimed = 0
+        while True:
+            expired = await run_in_threadpool(store.expired_attachments, cutoff, _ATTACHMENT_SCAN_LIMIT)
+            remaining = expired
+            scan_deleted = 0
+            while remaining:
+                processed, deleted = await run_in_threadpool(_delete_attachments, remaining[:RETENTION_SLICE_SIZE])
+                scan_deleted += deleted
+                remaining = remaining[processed:]
+                await asyncio.sleep(RETENTION_SLICE_PAUSE_MS / 1000)
+            reclaimed += scan_deleted
+            # A partial scan was the last one; a scan where nothing could be deleted would repeat itself
+            if len(expired) < _ATTACHMENT_SCAN_LIMIT or not scan_deleted:
+                return reclaimed
+
+    async def _sweep_applications(self) -> int:
+        if APPLICATION_RETENTION_DAYS <= 0:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(days=APPLICATION_RETENTION_DAYS)
+        reclaimed = 0
+        while True:
+            deleted = await run_in_threadpool(_delete_applications, cutoff)
+            reclaimed += len(deleted)
+            for app_id in deleted:
+                response_cache.invalidate(("application", app_id))
+            if not deleted:
+                return reclaimed
+            await asyncio.sleep(RETENTION_SLICE_PAUSE_MS / 1000)
+
+    def stats(self) -> dict:
+        return {
+            "session_ttl_minutes": SESSION_TTL_MINUTES,
+            "upload_session_ttl_hours": UPLOAD_SESSION_TTL_HOURS,
+            "application_retention_days": APPLICATION_RETENTION_DAYS,
+            "attachment_retention_days": ATTACHMENT_RETENTION_DAYS,
+            "interval_seconds": RETENTION_SWEEP_INTERVAL_SECONDS,
+            "runs": self.runs,
+            "reclaimed_total": dict(self.reclaimed_total),
+            "last_run": self.last_run,
+        }
+
+
+def _delete_attachments(items: List[Tuple[str, str]]) -> Tuple[int, int]:
+    """
+    Delete attachments until the slice budget is used up. Runs in a worker thread.
+    Returns (items processed, attachments deleted).
+    """
+    deadline = time.perf_counter() + RETENTION_SLICE_BUDGET_MS / 1000
+    deleted = 0
+    processed = 0
+    for app_id, att_id in items:
+        if store.delete_attachment(app_id, att_id):
+            deleted += 1
+        processed += 1
+        if time.perf_counter() >= deadline:
+            break
+    return processed, deleted
+
+
+def _delete_applications(created_before: datetime) -> List[str]:
+    """Delete one slice of the expired applications (one store call). Runs in a worker thread."""
+    expired, _ = store.list_applications(date_to=created_before, page_size=RETENTION_SLICE_SIZE, exact_total=False)
+    if not expired:
+        return []
+    results = store.apply_bulk([{"op": "delete", "id": app["id"]} for app in expired])
+    return [result["id"] for result in results if result["result"] == "deleted"]
+
+
+retention_sweeper = RetentionSweeper()
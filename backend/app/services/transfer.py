@@ -0,0 +1,164 @@
+"""
+NDJSON export and import of applications (one JSON object per line).
+
+The export walks the store with the keyset cursor and yields the encoded
+lines in chunks, so its memory use does not depend on the number of
+applications. The import reads the request body line by line and hands
+valid lines to `create_applications` in batches, reporting failures per line.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import AsyncIterator, Iterator, List, Tuple
+
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from app.database.store import store
+from app.models.schemas import ApplicationImport, ImportLineError
+from app.services.ingestion import ingest_all
+from app.utils.validation import validate_attachment, validate_pesel
+
+EXPORT_BATCH_SIZE = 500  # applications read from the store at a time
+EXPORT_CHUNK_BYTES = 64 * 1024  # encoded lines are sent in chunks of about this size
+IMPORT_BATCH_SIZE = 500  # applications created per store call (one lock acquisition / transaction)
+IMPORT_MAX_ERRORS = 1000  # line errors returned in the response; `failed` still counts all
+
+_ATTACHMENT_FIELDS = ("id", "title", "mime_type", "size_bytes", "created_at")
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def export_line(app: dict, attachments: str = "none") -> bytes:
+    """
+    One exported application: the fields of ApplicationResponse, plus `attachments`
+    (metadata, with base64 `data` when `attachments` is "data") unless it is "none".
+    """
+    record = dict(app)
+    if attachments != "none":
+        exported = []
+        for att in store.get_application_attachments(app["id"]):
+            item = {field: att[field] for field in _ATTACHMENT_FIELDS}
+            if attachments == "data":
+                # Straight from the blob files: an export should not evict the hot attachments from the cache
+                item["data"] = base64.b64encode(store.blobs.read(att["sha256"])).decode()
+            exported.append(item)
+        record["attachments"] = exported
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode() + b"\n"
+
+
+def export_ndjson(attachments: str = "none") -> Iterator[bytes]:
+    """Yield all applications, newest first, as NDJSON chunks."""
+    chunk: List[bytes] = []
+    size = 0
+    for app in store.iter_applications(EXPORT_BATCH_SIZE):
+        line = export_line(app, attachments)
+        chunk.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield b"".join(chunk)
+
+
+async def iter_lines(body: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """Split a streamed body into (1-based line number, line) pairs, skipping blank lines."""
+    number = 0
+    pending = bytearray()  # start of a line spanning several chunks (lines with attachments get long)
+    async for data in body:
+        *complete, rest = data.split(b"\n")
+        for part in complete:
+            pending += part
+            number += 1
+            if pending.strip():
+                yield number, bytes(pending)
+            pending = bytearray()
+        pending += rest
+    if pending.strip():
+        yield number + 1, bytes(pending)
+
+
+def parse_import_line(line: bytes) -> ApplicationImport:
+    """Validate one import line. Raises ValueError with a readable message."""
+    try:
+        item = ApplicationImport.model_validate_json(line)
+    except ValidationError as e:
+        raise ValueError("; ".join(
+            f"{'.'.join(str(part) for part in err['loc']) or 'line'}: {err['msg']}" for err in e.errors()
+        )) from e
+
+    pesel_valid, pesel_error = validate_pesel(item.form_data.poszkodowany.pesel)
+    if not pesel_valid:
+        raise ValueError(f"pesel: {pesel_error}")
+    for att in item.attachments or []:
+        att_valid, att_error, _ = validate_attachment(att)
+        if not att_valid:
+            raise ValueError(f"attachment '{att.get('title', '')}': {att_error}")
+    return item
+
+
+def _import_batch(batch: List[Tuple[int, ApplicationImport]]) -> List[ImportLineError]:
+    """Create one batch of applications (and their attachments). Runs in a worker thread."""
+    created = store.create_applications([
+        {
+            "id": item.id,
+            "created_at": item.created_at,
+            "updated_at": item.updated_at,
+            "form_data": item.form_data,
+            "status": item.status,
+            "ai_suggestion": item.ai_suggestion,
+            "ai_comments": item.ai_comments,
+        }
+        for _, item in batch
+    ])
+
+    errors = []
+    for (number, item), app in zip(batch, created):
+        if app is None:
+            errors.append(ImportLineError(line=number, error=f"Application with id '{item.id}' already exists"))
+            continue
+        # Checked by parse_import_line; decoded, sniffed and written to the blob store in one pass
+        for att in ingest_all(item.attachments or []):
+            store.create_attachment_from_blob(app["id"], att.title, att.mime_type, att.writer)
+    return errors
+
+
+async def import_ndjson(body: AsyncIterator[bytes]) -> dict:
+    """
+    Import applications from an NDJSON body.
+    Returns {"imported", "failed", "errors": [ImportLineError]}.
+    """
+    imported = failed = 0
+    errors: List[ImportLineError] = []
+    batch: List[Tuple[int, ApplicationImport]] = []
+
+    def report(line_errors: List[ImportLineError]) -> None:
+        nonlocal failed
+        failed += len(line_errors)
+        errors.extend(line_errors[: IMPORT_MAX_ERRORS - len(errors)])
+
+    async def flush() -> None:
+        nonlocal imported
+        # Store calls block (locks, journal, SQLite), keep them off the event loop
+        line_errors = await run_in_threadpool(_import_batch, batch)
+        imported += len(batch) - len(line_errors)
+        report(line_errors)
+        batch.clear()
+
+    async for number, line in iter_lines(body):
+        try:
+            batch.append((number, parse_import_line(line)))
+        except ValueError as e:
+            report([ImportLineError(line=number, error=str(e))])
+            continue
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    return {"imported": imported, "failed": failed, "errors": errors}
@@ -0,0 +1,149 @@
+"""
+Streaming multipart/form-data attachment uploads.
+
+The request body is fed chunk by chunk into python-multipart's push parser.
+The `file` part goes straight into a BlobWriter, which hashes and counts it
+while writing it to disk, so an upload only ever holds one network chunk in
+memory, and one over MAX_ATTACHMENT_SIZE_BYTES is cut off as soon as it gets
+there instead of after it has been received (and base64-decoded) in full.
+The type is taken from the file's first bytes, like for base64 attachments
+(see app/services/ingestion.py).
+"""
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from app.database.blobs import BlobTooLarge, BlobWriter
+from app.database.store import store
+from app.services.ingestion import IngestedAttachment
+from app.utils.validation import MAX_ATTACHMENT_SIZE_BYTES, SNIFF_BYTES, detect_mime_types, resolve_mime_type
+
+FILE_FIELD = "file"
+_MAX_FIELD_BYTES = 1024  # `title` and `mime_type` are short
+_FORM_OVERHEAD_BYTES = 16 * 1024  # boundaries and part headers on top of the file
+
+
+class _FormReceiver:
+    """python-multipart callbacks collecting the small fields and streaming the file part."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.fields: Dict[str, str] = {}
+        self.writer: Optional[BlobWriter] = None
+        self.filename: Optional[str] = None
+        self.file_type: Optional[str] = None
+        self.file_chunks: List[bytes] = []  # file data of the current network chunk
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._name: Optional[str] = None
+        self._in_file = False
+        self._value = bytearray()
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._in_file = False
+        self._value = bytearray()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        self._in_file = self._name == FILE_FIELD and filename is not None
+        if not self._in_file:
+            return
+        if self.writer is not None:
+            raise ValueError(f"Only one '{FILE_FIELD}' part is allowed")
+        self.filename = filename.decode("utf-8", "replace")
+        content_type = self._headers.get(b"content-type")
+        self.file_type = content_type.decode("latin-1").strip() if content_type else None
+        self.writer = store.blobs.writer(self.max_size)
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            # Copied: `data` may be the parser's own look-behind buffer, which it reuses
+            self.file_chunks.append(data[start:end])
+            return
+        self._value += data[start:end]
+        if len(self._value) > _MAX_FIELD_BYTES:
+            raise ValueError(f"Form field '{self._name}' is too long")
+
+    def on_part_end(self) -> None:
+        if not self._in_file:
+            self.fields[self._name] = self._value.decode("utf-8", "replace")
+
+    def write_file_chunks(self) -> None:
+        """Write the file data collected from the last network chunk. Runs in a worker thread."""
+        for chunk in self.file_chunks:
+            self.writer.write(chunk)
+        self.file_chunks = []
+
+
+async def receive_upload(request: Request, max_size: int = MAX_ATTACHMENT_SIZE_BYTES) -> IngestedAttachment:
+    """
+    Stream a multipart/form-data body with a `file` part and optional `title`
+    (defaults to the file name) and `mime_type` (defaults to the part's Content-Type;
+    either way the real type is taken from the content, see `resolve_mime_type`).
+    Raises BlobTooLarge past `max_size` and ValueError for any other invalid upload.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise ValueError("Expected a multipart/form-data body")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + _FORM_OVERHEAD_BYTES:
+        # Refuse without reading a single byte of it
+        raise BlobTooLarge(max_size)
+
+    receiver = _FormReceiver(max_size)
+    parser = MultipartParser(options[b"boundary"], receiver.callbacks())
+    sniffed = False
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if receiver.file_chunks:
+                # Hashing and file writes stay off the event loop
+                await run_in_threadpool(receiver.write_file_chunks)
+                if not sniffed and len(receiver.writer.head) >= SNIFF_BYTES:
+                    # A file of no allowed type is refused before the rest of it is received
+                    sniffed = True
+                    if not detect_mime_types(receiver.writer.head):
+                        resolve_mime_type(receiver.writer.head, None)  # raises
+        parser.finalize()
+
+        if receiver.writer is None:
+            raise ValueError(f"Missing file part '{FILE_FIELD}'")
+        title = receiver.fields.get("title") or receiver.filename
+        if not title:
+            raise ValueError("Missing title")
+        mime_type = resolve_mime_type(
+            receiver.writer.head, receiver.fields.get("mime_type") or receiver.file_type
+        )
+    except BaseException:
+        if receiver.writer is not None:
+            receiver.writer.discard()
+        raise
+
+    return IngestedAttachment(title=title, mime_type=mime_type, writer=receiver.writer)
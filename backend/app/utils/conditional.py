@@ -0,0 +1,110 @@
+from typing import List, Optional, Tuple
+
+
+def make_etag(version: int) -> str:
+    """Strong ETag for a resource at `version`."""
+    return f'"{version}"'
+
+
+def content_etag(sha256: str) -> str:
+    """Strong ETag for an immutable payload: its content hash."""
+    return f'"{sha256}"'
+
+
+def parse_etags(header: Optional[str]) -> List[str]:
+    """Split an If-Match / If-None-Match header into its entity tags ("*" stays as is)."""
+    if not header:
+        return []
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def none_match(header: Optional[str], etag: str) -> bool:
+    """
+    Evaluate If-None-Match for a GET: True when the client's copy is stale and
+    the full response must be sent. Uses the weak comparison (RFC 9110 13.1.2).
+    """
+    tags = parse_etags(header)
+    if not tags:
+        return True
+    if "*" in tags:
+        return False
+    return etag not in [tag.removeprefix("W/") for tag in tags]
+
+
+def if_match_version(header: Optional[str]) -> Optional[int]:
+    """
+    Version required by an If-Match header, None when there is no precondition
+    (no header or "*"). Weak or foreign tags can never match strongly, so they
+    map to -1, which no stored version has.
+    Raises ValueError if the header lists several versions.
+    """
+    tags = parse_etags(header)
+    if not tags or "*" in tags:
+        return None
+    if len(tags) > 1:
+        raise ValueError("If-Match must contain a single ETag")
+    tag = tags[0]
+    if tag.startswith('"') and tag.endswith('"') and tag[1:-1].isdigit():
+        return int(tag[1:-1])
+    return -1
+
+
+def if_range_matches(header: Optional[str], etag: str) -> bool:
+    """
+    Evaluate If-Range: a Range header only applies if the client's partial copy is
+    still current. Needs a strong match (RFC 9110 13.1.5); dates are never trusted.
+    """
+    return header is None or header.strip() == etag
+
+
+def accepts_encoding(header: Optional[str], coding: str) -> bool:
+    """
+    Whether an Accept-Encoding header allows `coding` (e.g. "gzip"): listed, or
+    covered by "*", with a non-zero quality (RFC 9110 12.5.3).
+    """
+    if not header:
+        return False
+    qualities = {}
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    quality = qualities.get(coding, qualities.get("*", 0.0))
+    return quality > 0
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    The (start, end) byte positions (end inclusive) requested by a Range header for a
+    payload of `size` bytes. None means "send everything": no header, another unit,
+    a malformed header, or several ranges (which the server may ignore, RFC 9110 14.2).
+    Raises ValueError if the range lies entirely past the end (416).
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    # Each side empty or ASCII digits ("²".isdigit() holds too), not both empty
+    if not sep or not (first or last) or not (first + last).isascii() or not (first + last).isdigit():
+        return None
+    if not first:
+        # Suffix range: the last `last` bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(f"Range starts past the end ({size} bytes)")
+    return start, min(int(last), size - 1) if last else size - 1
@@ -0,0 +1,22 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(created_at: datetime, app_id: str) -> str:
+    """Encode the (created_at, id) keyset position of the last item on a page as an opaque token."""
+    raw = f"{created_at.isoformat()}|{app_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Decode a token produced by `encode_cursor`.
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, app_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), app_id
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
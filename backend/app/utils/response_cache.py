@@ -0,0 +1,83 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+# Upper bound for cached response bodies; 0 disables the cache
+RESPONSE_CACHE_MAX_MB = int(os.getenv("RESPONSE_CACHE_MAX_MB", "64"))
+
+
+class ResponseCache:
+    """
+    LRU cache of encoded JSON response bodies, bounded by their total size.
+
+    Every entry remembers the version of the data it was built from: the
+    application version for a detail view, the store version for a list page.
+    A lookup with any other version is a miss, so store mutations invalidate
+    entries just by moving the version on, also across worker processes
+    sharing one SQLite store. A newer body replaces the old one under the same
+    key, so each key holds at most one version.
+    """
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[int, bytes]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: int) -> Optional[bytes]:
+        """Cached body for `key` if it was built from `version`, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, version: int, body: bytes) -> None:
+        """Store `body`, unless it does not fit or a newer version is already cached."""
+        if len(body) > self._max_bytes:
+            return
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None:
+                if old[0] > version:
+                    return
+                self._size -= len(old[1])
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            self._size += len(body)
+            while self._size > self._max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get_or_build(self, key: Hashable, version: int, build: Callable[[], bytes]) -> bytes:
+        body = self.get(key, version)
+        if body is None:
+            body = build()
+            self.put(key, version, body)
+        return body
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop an entry whose data is gone (e.g. a deleted application)."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= len(entry[1])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size, "hits": self.hits, "misses": self.misses}
+
+
+# Global cache for the applications API
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_MB * 1024 * 1024)
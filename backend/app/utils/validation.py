@@ -1,6 +1,9 @@
-import base64
+import binascii
+import logging
 import re
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 # Allowed MIME types for attachments
 ALLOWED_MIME_TYPES = [
@@ -22,6 +25,32 @@ ALLOWED_MIME_TYPES = [
 
 MAX_ATTACHMENT_SIZE_BYTES = 10 * 1024 * 1024  # 10 MB
 
+# Leading bytes ((offset, magic) pairs) of the allowed types. OLE2 (.doc/.xls) and ZIP
+# (.docx/.xlsx) containers look alike for several types; the declared type picks among those.
+_SIGNATURES: List[Tuple[Tuple[Tuple[int, bytes], ...], Tuple[str, ...]]] = [
+    (((0, b"%PDF-"),), ("application/pdf",)),
+    (((0, b"\x89PNG\r\n\x1a\n"),), ("image/png",)),
+    (((0, b"\xff\xd8\xff"),), ("image/jpeg", "image/jpg")),
+    (((0, b"GIF87a"),), ("image/gif",)),
+    (((0, b"GIF89a"),), ("image/gif",)),
+    (((0, b"RIFF"), (8, b"WEBP")), ("image/webp",)),
+    (((0, b"II*\x00"),), ("image/tiff",)),
+    (((0, b"MM\x00*"),), ("image/tiff",)),
+    (((0, b"BM"),), ("image/bmp",)),
+    (((0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"),), ("application/msword", "application/vnd.ms-excel")),
+    (
+        ((0, b"PK\x03\x04"),),
+        (
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        ),
+    ),
+]
+
+SNIFF_BYTES = 16  # enough for every signature above
+_SNIFF_BASE64_CHARS = 24  # base64 characters holding the first SNIFF_BYTES bytes
+_BASE64 = re.compile(r"[A-Za-z0-9+/]*={0,2}")  # compact base64, padding only at the end
+
 
 def validate_pesel(pesel: str) -> Tuple[bool, Optional[str]]:
     """
@@ -54,27 +83,71 @@ def validate_mime_type(mime_type: str) -> Tuple[bool, Optional[str]]:
     return True, None
 
 
+def detect_mime_types(head: bytes) -> Tuple[str, ...]:
+    """Allowed MIME types matching the first bytes of a payload (empty if none does)."""
+    for checks, mime_types in _SIGNATURES:
+        if all(head[offset:offset + len(magic)] == magic for offset, magic in checks):
+            return mime_types
+    return ()
+
+
+def resolve_mime_type(head: bytes, declared: Optional[str]) -> str:
+    """
+    The real type of a payload from its first bytes. The declared type is kept when the
+    content matches it, and replaced when the content is unambiguously another allowed type.
+    Raises ValueError for a declared type that is not allowed, empty payloads and content
+    of no (or no single) allowed type.
+    """
+    if declared is not None:
+        mime_valid, mime_error = validate_mime_type(declared)
+        if not mime_valid:
+            raise ValueError(mime_error)
+    if not head:
+        raise ValueError("Attachment is empty")
+    candidates = detect_mime_types(head)
+    if not candidates:
+        raise ValueError(f"File content is none of the allowed types: {', '.join(ALLOWED_MIME_TYPES)}")
+    if declared in candidates:
+        return declared
+    if len(candidates) == 1 or candidates == ("image/jpeg", "image/jpg"):
+        if declared is not None:
+            logger.info("Declared MIME type '%s' replaced by '%s' found in the content", declared, candidates[0])
+        return candidates[0]
+    raise ValueError(f"File content does not match MIME type '{declared}' (expected one of: {', '.join(candidates)})")
+
+
+def compact_base64(data_base64: str) -> str:
+    """Base64 text without the line breaks some encoders insert."""
+    if "\n" in data_base64 or "\r" in data_base64 or " " in data_base64:
+        return "".join(data_base64.split())
+    return data_base64
+
+
+def base64_decoded_size(data_base64: str) -> int:
+    """Size of the decoded payload of compact base64 text, without decoding it."""
+    return len(data_base64) // 4 * 3 - data_base64[-2:].count("=")
+
+
 def validate_attachment_size(data_base64: str) -> Tuple[bool, Optional[str], Optional[int]]:
     """
-    Validate attachment size from base64 data.
+    Validate attachment size from base64 data, computed from its length (nothing is decoded).
     Returns (is_valid, error_message, size_bytes)
     """
-    try:
-        # Decode base64 to get actual size
-        data_bytes = base64.b64decode(data_base64)
-        size_bytes = len(data_bytes)
-        
-        if size_bytes > MAX_ATTACHMENT_SIZE_BYTES:
-            return False, f"Attachment size ({size_bytes} bytes) exceeds maximum allowed size ({MAX_ATTACHMENT_SIZE_BYTES} bytes)", None
-        
-        return True, None, size_bytes
-    except Exception as e:
-        return False, f"Invalid base64 data: {str(e)}", None
+    data_base64 = compact_base64(data_base64)
+    if len(data_base64) % 4:
+        return False, "Invalid base64 data: length is not a multiple of 4", None
+    
+    size_bytes = base64_decoded_size(data_base64)
+    if size_bytes > MAX_ATTACHMENT_SIZE_BYTES:
+        return False, f"Attachment size ({size_bytes} bytes) exceeds maximum allowed size ({MAX_ATTACHMENT_SIZE_BYTES} bytes)", None
+    
+    return True, None, size_bytes
 
 
 def validate_attachment(data: dict) -> Tuple[bool, Optional[str], Optional[int]]:
     """
-    Validate an attachment payload.
+    Validate an attachment payload: fields, size, base64 alphabet and the real type
+    (only the first few bytes are decoded).
     Returns (is_valid, error_message, size_bytes)
     """
     required_fields = ["title", "mime_type", "data"]
@@ -82,15 +155,23 @@ def validate_attachment(data: dict) -> Tuple[bool, Optional[str], Optional[int]]
         if field not in data:
             return False, f"Missing required field: {field}", None
     
-    # Validate MIME type
-    mime_valid, mime_error = validate_mime_type(data["mime_type"])
-    if not mime_valid:
-        return False, mime_error, None
-    
     # Validate size
     size_valid, size_error, size_bytes = validate_attachment_size(data["data"])
     if not size_valid:
         return False, size_error, None
     
+    # Everything `a2b_base64(strict_mode=True)` would refuse, without decoding it
+    if not _BASE64.fullmatch(compact_base64(data["data"])):
+        return False, "Invalid base64 data: only A-Z, a-z, 0-9, '+' and '/' are allowed, with '=' padding at the end", None
+
+    # Validate the real type
+    try:
+        head = binascii.a2b_base64(compact_base64(data["data"][:_SNIFF_BASE64_CHARS * 2])[:_SNIFF_BASE64_CHARS])
+        resolve_mime_type(head, data["mime_type"])
+    except binascii.Error as e:
+        return False, f"Invalid base64 data: {e}", None
+    except ValueError as e:
+        return False, str(e), None
+    
     return True, None, size_bytes
 
@@ -0,0 +1,156 @@
+"""
+ZIP archives written front to back, for streaming them as a response.
+
+Every member is emitted as it is read, so an archive is never held in memory
+or spooled to disk: members whose CRC and sizes are only known at their end
+carry them in a data descriptor after the data (general purpose flag bit 3),
+and the central directory, collected as the members go by, closes the archive.
+Members may be stored, deflated here, or handed over already deflated (e.g.
+the body of a gzip file). ZIP64 end records are added once the archive needs
+them (more than 65535 members, or offsets beyond 4 GiB).
+"""
+import struct
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Iterator, List
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_DATA_DESCRIPTOR = struct.Struct("<IIII")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_ZIP64_OFFSET_EXTRA = struct.Struct("<HHQ")
+_ZIP64_END = struct.Struct("<IQHHIIQQQQ")
+_ZIP64_LOCATOR = struct.Struct("<IIQI")
+_END = struct.Struct("<IHHHHIIH")
+
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_VERSION = 20  # 2.0: deflate, data descriptors
+_VERSION_ZIP64 = 45
+_MADE_BY_UNIX = 3 << 8
+_FILE_ATTRIBUTES = 0o100644 << 16  # regular file, rw-r--r--
+_MAX_32 = 0xFFFFFFFF
+_MAX_16 = 0xFFFF
+
+
+def _dos_time(value: datetime):
+    """(time, date) in MS-DOS format, which cannot go back before 1980."""
+    if value.year < 1980:
+        value = datetime(1980, 1, 1)
+    return (
+        value.hour << 11 | value.minute << 5 | value.second // 2,
+        (value.year - 1980) << 9 | value.month << 5 | value.day,
+    )
+
+
+@dataclass
+class _Entry:
+    name: bytes
+    flags: int
+    method: int
+    modified: datetime
+    crc: int
+    compressed_size: int
+    size: int
+    offset: int
+
+
+class ZipStream:
+    """
+    Builds one archive: yield from `add` / `add_deflated` for each member, then from `finish`.
+    The generators must be consumed in that order, each to its end.
+    """
+
+    def __init__(self):
+        self._entries: List[_Entry] = []
+        self._offset = 0
+
+    def _emit(self, data: bytes) -> bytes:
+        self._offset += len(data)
+        return data
+
+    def _local_header(self, entry: _Entry) -> bytes:
+        time, date = _dos_time(entry.modified)
+        header = _LOCAL_HEADER.pack(
+            0x04034B50, _VERSION, entry.flags, entry.method, time, date,
+            entry.crc, entry.compressed_size, entry.size, len(entry.name), 0,
+        )
+        return header + entry.name
+
+    def add(self, name: str, chunks: Iterable[bytes], modified: datetime, method: int = ZIP_STORED) -> Iterator[bytes]:
+        """A member read from `chunks`: stored as it is, or deflated (`method`) on the way."""
+        entry = _Entry(
+            name.encode(), _FLAG_DATA_DESCRIPTOR | _FLAG_UTF8, method, modified, 0, 0, 0, self._offset
+        )
+        yield self._emit(self._local_header(entry))
+
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15) if method == ZIP_DEFLATED else None
+        for chunk in chunks:
+            entry.crc = zlib.crc32(chunk, entry.crc)
+            entry.size += len(chunk)
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                entry.compressed_size += len(chunk)
+                yield self._emit(chunk)
+        if compressor is not None:
+            tail = compressor.flush()
+            entry.compressed_size += len(tail)
+            yield self._emit(tail)
+        if entry.compressed_size > _MAX_32 or entry.size > _MAX_32:
+            raise ValueError(f"ZIP member '{name}' is larger than 4 GiB")
+
+        yield self._emit(_DATA_DESCRIPTOR.pack(0x08074B50, entry.crc, entry.compressed_size, entry.size))
+        self._entries.append(entry)
+
+    def add_deflated(
+        self,
+        name: str,
+        deflated: Iterable[bytes],
+        crc: int,
+        compressed_size: int,
+        size: int,
+        modified: datetime,
+    ) -> Iterator[bytes]:
+        """A member whose raw deflate data, CRC-32 and sizes are known already; copied as it is."""
+        if compressed_size > _MAX_32 or size > _MAX_32:
+            raise ValueError(f"ZIP member '{name}' is larger than 4 GiB")
+        entry = _Entry(name.encode(), _FLAG_UTF8, ZIP_DEFLATED, modified, crc, compressed_size, size, self._offset)
+        yield self._emit(self._local_header(entry))
+        written = 0
+        for chunk in deflated:
+            written += len(chunk)
+            yield self._emit(chunk)
+        if written != compressed_size:
+            # The header has gone out with the wrong size; the archive is broken
+            raise ValueError(f"ZIP member '{name}' has {written} bytes of data, expected {compressed_size}")
+        self._entries.append(entry)
+
+    def finish(self) -> Iterator[bytes]:
+        """The central directory and end records."""
+        start = self._offset
+        for entry in self._entries:
+            time, date = _dos_time(entry.modified)
+            zip64 = entry.offset > _MAX_32
+            extra = _ZIP64_OFFSET_EXTRA.pack(0x0001, 8, entry.offset) if zip64 else b""
+            header = _CENTRAL_HEADER.pack(
+                0x02014B50, _MADE_BY_UNIX | _VERSION_ZIP64, _VERSION_ZIP64 if zip64 else _VERSION,
+                entry.flags, entry.method, time, date, entry.crc, entry.compressed_size, entry.size,
+                len(entry.name), len(extra), 0, 0, 0, _FILE_ATTRIBUTES, _MAX_32 if zip64 else entry.offset,
+            )
+            yield self._emit(header + entry.name + extra)
+
+        size = self._offset - start
+        count = len(self._entries)
+        if count > _MAX_16 or start > _MAX_32 or size > _MAX_32:
+            end64 = self._offset
+            yield self._emit(_ZIP64_END.pack(
+                0x06064B50, _ZIP64_END.size - 12, _MADE_BY_UNIX | _VERSION_ZIP64, _VERSION_ZIP64,
+                0, 0, count, count, size, start,
+            ))
+            yield self._emit(_ZIP64_LOCATOR.pack(0x07064B50, 0, end64, 1))
+            count, size, start = min(count, _MAX_16), min(size, _MAX_32), min(start, _MAX_32)
+        yield self._emit(_END.pack(0x06054B50, 0, 0, count, count, size, start, 0))
@@ -0,0 +1,116 @@
+"""
+Memory held per stored application.
+
+Builds the same filled-in applications as plain dict records (the previous
+representation: `form_data` as a nested dict, status as a fresh string) and
+as `ApplicationRecord`, and reports the traced bytes per application. The
+last row is a whole InMemoryStore, indexes and counters included.
+
+Run from the backend directory:
+    python -m benchmarks.record_size [--applications 20000]
+"""
+import argparse
+import random
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.database.records import ApplicationRecord, FrozenRecord
+from app.database.store import InMemoryStore
+from app.models.schemas import AccidentReportFormData
+from app.services.form_state import get_initial_form_data
+
+PLACES = ["hala produkcyjna nr 2", "magazyn wysokiego składowania", "plac budowy przy ul. Polnej", "biuro, II piętro"]
+INJURIES = ["złamanie kości przedramienia", "stłuczenie kolana", "rana cięta dłoni", "skręcenie stawu skokowego"]
+CIRCUMSTANCES = [
+    "Podczas przenoszenia palety poślizgnąłem się na mokrej posadzce i upadłem na lewą rękę.",
+    "W trakcie cięcia blachy na gilotynie materiał przesunął się i zranił mi dłoń.",
+    "Schodząc z rusztowania źle postawiłem nogę na szczeblu drabiny i spadłem z wysokości około metra.",
+    "Przy rozładunku towaru z samochodu dostawczego karton spadł mi na kolano.",
+]
+
+
+def filled_form(rng: random.Random) -> AccidentReportFormData:
+    form = get_initial_form_data()
+    person = form.poszkodowany
+    person.pesel = f"{rng.randrange(10**10, 10**11)}"
+    person.imie, person.nazwisko = rng.choice(["Jan", "Anna", "Piotr"]), rng.choice(["Kowalski", "Nowak", "Wiśniewska"])
+    person.dokument_typ, person.dokument_seria, person.dokument_numer = "dowód osobisty", "ABC", f"{rng.randrange(10**6)}"
+    person.data_urodzenia, person.miejsce_urodzenia, person.telefon = "1985-04-12", "Kraków", "600100200"
+    address = form.adres_zamieszkania
+    address.ulica, address.nr_domu, address.kod_pocztowy, address.miejscowosc = "Długa", "12", "31-147", "Kraków"
+    details = form.szczegoly
+    details.data = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    details.godzina, details.godzina_rozpoczecia_pracy, details.godzina_zakonczenia_pracy = "10:30", "07:00", "15:00"
+    details.miejsce = rng.choice(PLACES)
+    details.opis_urazow = ", ".join(rng.sample(INJURIES, 2))
+    details.opis_okolicznosci = " ".join(rng.sample(CIRCUMSTANCES, 3))
+    return form
+
+
+def dict_record(form: AccidentReportFormData, created_at: datetime, version: int) -> FrozenRecord:
+    return FrozenRecord(
+        id=str(uuid.uuid4()),
+        version=version,
+        created_at=created_at,
+        updated_at=created_at,
+        pesel=form.poszkodowany.pesel,
+        form_data=form.model_dump(),
+        ai_suggestion=None,
+        ai_comments=None,
+        status="".join(["ne", "w"]),  # as decoded from a request body, not shared
+        attachment_ids=[],
+    )
+
+
+def compact_record(form: AccidentReportFormData, created_at: datetime, version: int) -> ApplicationRecord:
+    return ApplicationRecord(
+        id=str(uuid.uuid4()),
+        version=version,
+        created_at=created_at,
+        updated_at=created_at,
+        pesel=form.poszkodowany.pesel,
+        form_data=form.model_dump(),
+        status="".join(["ne", "w"]),
+    )
+
+
+def traced_bytes(build) -> tuple[int, object]:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--applications", type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    forms = [filled_form(rng) for _ in range(args.applications)]
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    stamps = [start + timedelta(minutes=i) for i in range(args.applications)]
+
+    print(f"{args.applications} applications")
+    print(f"{'representation':<16}{'bytes/app':>12}{'total MB':>10}")
+    for name, build_record in (("dict", dict_record), ("compact", compact_record)):
+        size, records = traced_bytes(lambda: [build_record(f, t, i) for i, (f, t) in enumerate(zip(forms, stamps))])
+        print(f"{name:<16}{size / args.applications:>12.0f}{size / 2**20:>10.1f}")
+        del records
+
+    def build_store() -> InMemoryStore:
+        store = InMemoryStore()
+        for form in forms:
+            store.create_application(form, status="new")
+        return store
+
+    size, store = traced_bytes(build_store)
+    print(f"{'store (all)':<16}{size / args.applications:>12.0f}{size / 2**20:>10.1f}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
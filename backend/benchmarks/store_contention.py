@@ -0,0 +1,124 @@
+"""
+Read throughput and latency of InMemoryStore under mixed load.
+
+Reader threads hit the detail view (`get_application`) and the officer list
+(`list_applications`, partly with a status filter that has to scan), while a
+writer keeps updating applications and uploading attachments. The same
+workload runs against the store as it is and against the previous design:
+one global mutex around every call, upload decoding and hashing included.
+
+Run from the backend directory:
+    python -m benchmarks.store_contention [--applications 20000] [--seconds 3]
+"""
+import argparse
+import base64
+import os
+import random
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+
+from app.database.store import InMemoryStore
+from app.models.schemas import AccidentReportFormData
+from app.services.form_state import get_initial_form_data
+
+
+class ExclusiveLock:
+    """Readers and writers all serialize on one (reentrant) mutex."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def read(self):
+        with self._lock:
+            yield
+
+    write = read
+
+
+class GlobalLockStore(InMemoryStore):
+    """Baseline reproducing the previous design."""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = ExclusiveLock()
+
+    def create_attachment(self, *args, **kwargs):
+        with self._lock.write():
+            return super().create_attachment(*args, **kwargs)
+
+
+def build_store(applications: int, exclusive: bool) -> tuple[InMemoryStore, list]:
+    store = GlobalLockStore() if exclusive else InMemoryStore()
+    form: AccidentReportFormData = get_initial_form_data()
+    ids = [
+        store.create_application(form, status="closed" if i % 20 == 0 else "new")["id"]
+        for i in range(applications)
+    ]
+    return store, ids
+
+
+def reader(store: InMemoryStore, ids: list, stop: threading.Event, latencies: list) -> None:
+    rng = random.Random()
+    while not stop.is_set():
+        start = time.perf_counter()
+        roll = rng.random()
+        if roll < 0.8:
+            store.get_application(rng.choice(ids))
+        elif roll < 0.95:
+            store.list_applications(page=rng.randint(1, 100), page_size=20)
+        else:
+            store.list_applications(page=1, page_size=20, status="closed", ai_suggestion_max=0.5)
+        latencies.append(time.perf_counter() - start)
+
+
+def writer(store: InMemoryStore, ids: list, stop: threading.Event, payload: str) -> None:
+    rng = random.Random()
+    while not stop.is_set():
+        store.update_application(rng.choice(ids), status=rng.choice(["new", "review"]), ai_suggestion=rng.random())
+        store.create_attachment(rng.choice(ids), "scan.pdf", "application/pdf", payload)
+
+
+def run(store: InMemoryStore, ids: list, readers: int, seconds: float, payload: str) -> tuple[float, float]:
+    stop = threading.Event()
+    latencies = [[] for _ in range(readers)]
+    threads = [threading.Thread(target=reader, args=(store, ids, stop, latencies[i])) for i in range(readers)]
+    threads.append(threading.Thread(target=writer, args=(store, ids, stop, payload)))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    samples = sorted(sample for per_thread in latencies for sample in per_thread)
+    p99 = samples[int(len(samples) * 0.99)] if samples else 0.0
+    return len(samples) / seconds, p99
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--applications", type=int, default=20_000)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--payload-mb", type=float, default=2.0)
+    args = parser.parse_args()
+
+    payload = base64.b64encode(os.urandom(int(args.payload_mb * 1024 * 1024))).decode()
+    print(f"{args.applications} applications, {args.payload_mb} MB uploads, {args.seconds}s per run")
+    print(f"{'lock':<12}{'readers':>8}{'reads/s':>12}{'p99 ms':>10}")
+    for exclusive in (True, False):
+        store, ids = build_store(args.applications, exclusive)
+        results = []
+        for readers in (1, 2, 4, 8):
+            throughput, p99 = run(store, ids, readers, args.seconds, payload)
+            results.append(throughput)
+            name = "global" if exclusive else "read-write"
+            print(f"{name:<12}{readers:>8}{throughput:>12.0f}{p99 * 1000:>10.2f}")
+        store.close()
+        print(f"{'':<12}{'median':>8}{statistics.median(results):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
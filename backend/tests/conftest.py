@@ -0,0 +1,103 @@
+import copy
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database.blobs import BlobStore
+from app.database.persistence import StoreJournal
+from app.database.sqlite_store import SQLiteStore
+from app.database.store import InMemoryStore
+from app.main import app
+from app.models.schemas import AccidentReportFormData
+
+FORM = {
+    "poszkodowany": {
+        "pesel": "44051401359",
+        "dokument_typ": "dowod",
+        "dokument_seria": "ABC",
+        "dokument_numer": "123456",
+        "imie": "Jan",
+        "nazwisko": "Kowalski",
+        "data_urodzenia": "1944-05-14",
+        "miejsce_urodzenia": "Łódź",
+        "telefon": "123456789",
+    },
+    "adres_zamieszkania": {
+        "ulica": "Długa",
+        "nr_domu": "1",
+        "nr_lokalu": "",
+        "kod_pocztowy": "00-001",
+        "miejscowosc": "Warszawa",
+        "panstwo": "Polska",
+    },
+    "mieszka_za_granica": False,
+    "inny_adres_korespondencyjny": False,
+    "adres_dzialalnosci": {
+        "ulica": "Krótka",
+        "nr_domu": "2",
+        "nr_lokalu": "",
+        "kod_pocztowy": "00-002",
+        "miejscowosc": "Kraków",
+    },
+    "zglaszajacy_inny": False,
+    "szczegoly": {
+        "data": "2025-03-01",
+        "godzina": "10:00",
+        "miejsce": "Hala produkcyjna",
+        "godzina_rozpoczecia_pracy": "08:00",
+        "godzina_zakonczenia_pracy": "16:00",
+        "opis_urazow": "Złamanie ręki przy upadku z drabiny",
+        "opis_okolicznosci": "Poszkodowany spadł z drabiny podczas wymiany żarówek w hali.",
+        "pierwsza_pomoc": True,
+        "postepowanie_prowadzone": False,
+        "obsluga_maszyn": False,
+        "atest_deklaracja": False,
+        "ewidencja_srodkow_trwalych": False,
+    },
+    "swiadkowie": [],
+}
+
+PDF = b"%PDF-1.4\n" + b"hello pdf " * 1000
+
+
+def make_form(**details) -> dict:
+    """The sample form, with `details` overriding fields of its `szczegoly` section."""
+    form = copy.deepcopy(FORM)
+    form["szczegoly"].update(details)
+    return form
+
+
+def open_memory_store(directory: str, snapshot_every: int = 50_000) -> InMemoryStore:
+    journal = StoreJournal(directory, snapshot_every=snapshot_every)
+    backend = InMemoryStore(journal, BlobStore(f"{directory}/blobs"))
+    backend.open()
+    return backend
+
+
+@pytest.fixture
+def form_data() -> AccidentReportFormData:
+    return AccidentReportFormData(**FORM)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    """Each store backend, persistent and empty."""
+    if request.param == "memory":
+        store = open_memory_store(str(tmp_path / "data"))
+    else:
+        store = SQLiteStore(str(tmp_path / "store.db"), BlobStore(str(tmp_path / "blobs")))
+        store.open()
+    yield store
+    store.close()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The API on the process-wide store, started once: tests share its data."""
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def app_id(client) -> str:
+    return client.post("/api/applications", json={"form_data": FORM, "status": "new"}).json()["id"]
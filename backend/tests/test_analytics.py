@@ -0,0 +1,105 @@
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.models.schemas import AccidentReportFormData
+from app.services import analytics
+from app.services.analytics import ApplicationFrame, aggregate, to_arrow_ipc, to_parquet
+from conftest import make_form
+
+# (status, ai_suggestion, place, first aid given)
+CASES = [
+    ("new", 0.2, "Hala", True),
+    ("new", 0.6, "Hala", False),
+    ("new", None, "Magazyn", True),
+    ("closed", 0.9, "Hala", True),
+    ("closed", 0.1, "Biuro", False),
+    (None, 0.5, "Magazyn", True),
+]
+
+
+@pytest.fixture
+def frame_store(backend, form_data, monkeypatch):
+    """The backend filled with CASES, as the store analytics reads."""
+    monkeypatch.setattr(analytics, "store", backend)
+    for status, suggestion, place, first_aid in CASES:
+        form = AccidentReportFormData(**make_form(miejsce=place, pierwsza_pomoc=first_aid))
+        backend.create_application(form, status=status, ai_suggestion=suggestion)
+    return backend
+
+
+def _groups(frame, group_by, metric="count", value=None):
+    return {group["key"]: (group["count"], group["value"]) for group in aggregate(frame, group_by, metric, value)}
+
+
+def test_count_per_group_largest_first(frame_store):
+    frame = ApplicationFrame.build()
+    assert len(frame) == len(CASES) and frame.version == frame_store.version
+    groups = aggregate(frame, "szczegoly.miejsce")
+    assert [(group["key"], group["count"]) for group in groups] == [("Hala", 3), ("Magazyn", 2), ("Biuro", 1)]
+    assert _groups(frame, "status") == {"new": (3, 3.0), "closed": (2, 2.0), None: (1, 1.0)}
+    assert _groups(frame, "szczegoly.pierwsza_pomoc") == {True: (4, 4.0), False: (2, 2.0)}
+
+
+@pytest.mark.parametrize(
+    "metric, expected",
+    [
+        ("sum", {"new": 0.8, "closed": 1.0, None: 0.5}),
+        ("mean", {"new": 0.4, "closed": 0.5, None: 0.5}),
+        ("min", {"new": 0.2, "closed": 0.1, None: 0.5}),
+        ("max", {"new": 0.6, "closed": 0.9, None: 0.5}),
+    ],
+)
+def test_metrics_leave_out_missing_values(frame_store, metric, expected):
+    groups = _groups(ApplicationFrame.build(), "status", metric, "ai_suggestion")
+    assert {key: value for key, (_, value) in groups.items()} == pytest.approx(expected)
+    assert groups["new"][0] == 3
+
+
+def test_group_without_values_has_no_metric(frame_store):
+    frame_store.create_application(AccidentReportFormData(**make_form(miejsce="Dach")))
+    groups = _groups(ApplicationFrame.build(), "szczegoly.miejsce", "mean", "ai_suggestion")
+    assert groups["Magazyn"] == (2, 0.5)
+    assert groups["Dach"] == (1, None)
+
+
+def test_rebuild_reuses_unchanged_rows_and_matches_a_full_build(frame_store, form_data):
+    previous = ApplicationFrame.build()
+    apps = list(frame_store.iter_applications())
+    frame_store.update_application(apps[1]["id"], status="rejected", ai_suggestion=0.75)
+    frame_store.delete_application(apps[3]["id"])
+    frame_store.create_application(form_data, status="new")
+
+    rebuilt = ApplicationFrame.build(previous)
+    full = ApplicationFrame.build()
+    assert rebuilt.table.column("id").to_pylist() == [app["id"] for app in frame_store.iter_applications()]
+    assert rebuilt.table.to_pylist() == full.table.to_pylist()
+    assert _groups(rebuilt, "status") == _groups(full, "status")
+    assert _groups(rebuilt, "status", "mean", "ai_suggestion")["rejected"] == (1, 0.75)
+
+
+@pytest.mark.parametrize(
+    "group_by, metric, value",
+    [("nope", "count", None), ("ai_suggestion", "count", None), ("status", "mean", None), ("status", "mean", "status"), ("status", "median", "ai_suggestion")],
+)
+def test_invalid_aggregations(frame_store, group_by, metric, value):
+    with pytest.raises(ValueError):
+        aggregate(ApplicationFrame.build(), group_by, metric, value)
+
+
+def test_files_read_back_with_pyarrow(frame_store):
+    frame = ApplicationFrame.build()
+    ids = frame.table.column("id").to_pylist()
+    assert pq.read_table(io.BytesIO(to_parquet(frame))).column("id").to_pylist() == ids
+    with pa.ipc.open_file(io.BytesIO(to_arrow_ipc(frame))) as reader:
+        assert reader.read_all().column("szczegoly.miejsce").to_pylist() == frame.table.column("szczegoly.miejsce").to_pylist()
+
+
+def test_analytics_endpoint(client):
+    response = client.get("/api/applications/analytics", params={"group_by": "status", "metric": "mean", "value": "ai_suggestion"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["group_by"] == "status" and body["rows"] == sum(group["count"] for group in body["groups"])
+    assert client.get("/api/applications/analytics", params={"group_by": "nope"}).status_code == 400
@@ -0,0 +1,75 @@
+import gzip
+import os
+import zlib
+
+import pytest
+
+from app.database.blobs import CODEC_GZIP, CODEC_IDENTITY, BlobStore
+
+TEXT = b"".join(b"line %d of a very repetitive scanned form\n" % i for i in range(20_000))
+RANDOM = os.urandom(300_000)
+
+
+@pytest.fixture
+def blobs(tmp_path):
+    return BlobStore(str(tmp_path))
+
+
+def _put(blobs: BlobStore, data: bytes, streamed: bool) -> str:
+    if not streamed:
+        sha256 = BlobStore.digest(data)
+        blobs.put(data, sha256)
+        return sha256
+    writer = blobs.writer()
+    for start in range(0, len(data), 10_000):
+        writer.write(data[start:start + 10_000])
+    return blobs.commit(writer)
+
+
+def test_identical_payloads_are_stored_once(blobs, tmp_path):
+    sha256 = _put(blobs, TEXT, streamed=False)
+    assert _put(blobs, TEXT, streamed=True) == sha256
+    assert sum(len(files) for _, _, files in os.walk(tmp_path)) == 1
+    blobs.delete(sha256)
+    assert not blobs.exists(sha256)
+    with pytest.raises(FileNotFoundError):
+        blobs.read(sha256)
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+@pytest.mark.parametrize("data, codec", [(TEXT, CODEC_GZIP), (RANDOM, CODEC_IDENTITY)])
+def test_payload_is_compressed_only_when_it_pays_off(blobs, data, codec, streamed):
+    sha256 = _put(blobs, data, streamed)
+    assert sha256 == BlobStore.digest(data)
+    stored_codec, stored_bytes = blobs.stored_info(sha256)
+    assert stored_codec == codec
+    assert (stored_bytes < len(data) // 2) if codec == CODEC_GZIP else stored_bytes == len(data)
+    assert blobs.read(sha256) == data
+    assert b"".join(blobs.iter_chunks(sha256)) == data
+
+
+def test_stored_gzip_is_a_valid_content_encoding(blobs):
+    sha256 = _put(blobs, TEXT, streamed=True)
+    assert gzip.decompress(b"".join(blobs.iter_stored(sha256))) == TEXT
+
+
+@pytest.mark.parametrize("data", [TEXT, RANDOM])
+@pytest.mark.parametrize("start, length", [(0, 1), (0, None), (1000, 5000), (65_535, 70_000), (250_000, None)])
+def test_ranges_of_either_codec(blobs, data, start, length):
+    sha256 = _put(blobs, data, streamed=False)
+    expected = data[start:] if length is None else data[start:start + length]
+    chunks = list(blobs.iter_chunks(sha256, chunk_size=4096, start=start, length=length))
+    assert b"".join(chunks) == expected
+    assert all(len(chunk) <= 4096 for chunk in chunks)
+
+
+def test_deflate_data_of_a_compressed_payload(blobs):
+    sha256 = _put(blobs, TEXT, streamed=True)
+    crc, size, chunks = blobs.open_deflated(sha256, chunk_size=1000)
+    deflated = b"".join(chunks)
+    assert len(deflated) == size
+    assert zlib.decompress(deflated, -15) == TEXT
+    assert crc == zlib.crc32(TEXT)
+
+    with pytest.raises(ValueError):
+        blobs.open_deflated(_put(blobs, RANDOM, streamed=False))
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import threading
+from typing import List
+
+import pytest
+
+from app.database import sqlite_store
+from app.database.changes import ChangeLog
+from app.services import changes
+from app.services.changes import change_stream, format_change_events
+
+
+@pytest.fixture
+def feed_store(backend, monkeypatch):
+    """`backend` as the store the change feed reads, polled every 10 ms."""
+    monkeypatch.setattr(changes, "store", backend)
+    monkeypatch.setattr(changes, "CHANGES_POLL_MS", 10)
+    return backend
+
+
+def _limit_change_log(backend, size: int, monkeypatch) -> None:
+    """Keep only the last `size` versions of history (before anything is written)."""
+    if isinstance(backend, sqlite_store.SQLiteStore):
+        monkeypatch.setattr(sqlite_store, "STORE_CHANGE_LOG_SIZE", size)
+    else:
+        backend._changes = ChangeLog(size)
+
+
+def _read(version: int, messages: int) -> List[str]:
+    """The first `messages` SSE messages of a stream from `version`, after the retry hint."""
+    async def collect():
+        stream = change_stream(version, lambda: asyncio.sleep(0, result=False))
+        received = []
+        try:
+            async for chunk in stream:
+                received += [message for message in chunk.split("\n\n") if message]
+                if len(received) > messages:
+                    break
+        finally:
+            await stream.aclose()
+        return received
+
+    received = asyncio.run(asyncio.wait_for(collect(), timeout=5))
+    assert received[0].startswith("retry: ")
+    return received[1:]
+
+
+def _parse(message: str) -> dict:
+    fields = dict(line.split(": ", 1) for line in message.split("\n"))
+    return {"event": fields["event"], "data": json.loads(fields["data"]), "id": fields.get("id")}
+
+
+def test_id_is_sent_with_the_last_event_of_a_version():
+    text = format_change_events([
+        {"version": 4, "op": "update", "id": "a", "status": "new"},
+        {"version": 5, "op": "delete", "id": "b"},
+        {"version": 5, "op": "delete", "id": "c"},
+    ])
+    assert [_parse(message)["id"] for message in text.strip().split("\n\n")] == ["4", None, "5"]
+
+
+def test_changes_since_reads_a_window_of_versions(backend, form_data):
+    app = backend.create_application(form_data, status="new")
+    backend.update_application(app["id"], status="closed")
+    backend.delete_application(app["id"])
+
+    assert backend.changes_since(0) == [
+        {"version": 1, "op": "create", "id": app["id"], "status": "new"},
+        {"version": 2, "op": "update", "id": app["id"], "status": "closed"},
+        {"version": 3, "op": "delete", "id": app["id"]},
+    ]
+    assert [event["version"] for event in backend.changes_since(1, limit=1)] == [2]
+    assert backend.changes_since(3) == []
+    assert backend.changes_since(4) is None
+
+
+def test_history_is_trimmed_to_the_change_log_size(backend, form_data, monkeypatch):
+    _limit_change_log(backend, 3, monkeypatch)
+    for _ in range(6):
+        backend.create_application(form_data)
+    assert backend.changes_since(2) is None
+    assert [event["version"] for event in backend.changes_since(3)] == [4, 5, 6]
+
+
+def test_stream_resumes_after_the_given_version(feed_store, form_data):
+    first = feed_store.create_application(form_data, status="new")
+    second = feed_store.create_application(form_data)
+    feed_store.update_application(first["id"], status="closed")
+
+    events = [_parse(message) for message in _read(first["version"], 2)]
+    assert [(event["event"], event["id"]) for event in events] == [("change", str(second["version"])), ("change", str(second["version"] + 1))]
+    assert events[1]["data"] == {"version": second["version"] + 1, "op": "update", "id": first["id"], "status": "closed"}
+
+
+def test_stream_picks_up_changes_made_while_it_waits(feed_store, form_data):
+    async def scenario():
+        stream = change_stream(feed_store.version, lambda: asyncio.sleep(0, result=False))
+        await stream.__anext__()  # retry hint
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.05)
+        assert not pending.done()
+        app = feed_store.create_application(form_data)
+        message = await asyncio.wait_for(pending, timeout=5)
+        await stream.aclose()
+        return app, message
+
+    app, message = asyncio.run(scenario())
+    assert _parse(message.strip())["data"]["id"] == app["id"]
+
+
+def test_stream_resets_when_history_no_longer_reaches_back(feed_store, form_data, monkeypatch):
+    _limit_change_log(feed_store, 2, monkeypatch)
+    for _ in range(5):
+        feed_store.create_application(form_data)
+
+    reset, = (_parse(message) for message in _read(1, 1))
+    assert reset == {"event": "reset", "data": {"version": 5}, "id": "5"}
+
+
+def test_stream_resets_when_the_store_is_behind_the_client(feed_store, form_data):
+    feed_store.create_application(form_data)
+    reset, = (_parse(message) for message in _read(40, 1))
+    assert reset == {"event": "reset", "data": {"version": 1}, "id": "1"}
+
+
+def test_stream_reads_the_store_off_the_event_loop(feed_store, form_data, monkeypatch):
+    class Recording:
+        """`feed_store`, noting the threads reading its version and change log."""
+        threads = set()
+
+        @property
+        def version(self):
+            self.threads.add(threading.get_ident())
+            return feed_store.version
+
+        def changes_since(self, *args):
+            self.threads.add(threading.get_ident())
+            return feed_store.changes_since(*args)
+
+    monkeypatch.setattr(changes, "store", Recording())
+    feed_store.create_application(form_data)
+    _read(0, 1)
+    assert Recording.threads and threading.get_ident() not in Recording.threads
@@ -0,0 +1,62 @@
+import pytest
+
+from app.utils.conditional import accepts_encoding, if_range_matches, parse_range
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=900-5000", (900, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=-5000", (0, 999)),
+        (" Bytes = 5-5", (5, 5)),
+        # Served in full: other units, several ranges, nonsense
+        ("items=0-5", None),
+        ("bytes=0-5,10-20", None),
+        ("bytes=abc", None),
+        ("bytes=5-1", None),
+        ("bytes=-", None),
+        ("bytes=1-x", None),
+        ("bytes=a-5", None),
+        ("bytes=-x", None),
+        ("bytes=1 -5", None),
+        ("bytes=\u00b2-5", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=2000-3000", "bytes=-0"])
+def test_unsatisfiable_range(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_if_range_needs_a_strong_match():
+    assert if_range_matches(None, '"abc"')
+    assert if_range_matches(' "abc" ', '"abc"')
+    assert not if_range_matches('W/"abc"', '"abc"')
+    assert not if_range_matches("Wed, 21 Oct 2015 07:28:00 GMT", '"abc"')
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, False),
+        ("", False),
+        ("gzip", True),
+        ("deflate, GZIP;q=0.5", True),
+        ("gzip;q=0", False),
+        ("br, *", True),
+        ("*;q=0", False),
+        ("*, gzip;q=0", False),
+        ("gzip;q=oops", False),
+        ("identity", False),
+    ],
+)
+def test_accepts_encoding(header, expected):
+    assert accepts_encoding(header, "gzip") == expected
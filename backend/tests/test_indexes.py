@@ -0,0 +1,116 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.database.indexes import ApplicationFilters, ApplicationIndexes, parse_accident_date
+from app.models.schemas import AccidentReportFormData
+from conftest import make_form
+
+PESELS = ["44051401359", "02070803628", "90090515836"]
+
+
+def _form(pesel: str, accident_date: str) -> AccidentReportFormData:
+    form = make_form(data=accident_date)
+    form["poszkodowany"]["pesel"] = pesel
+    return AccidentReportFormData(**form)
+
+
+@pytest.fixture
+def applications(backend):
+    """Twelve applications spread over pesel, status, accident date and ai_suggestion, oldest first."""
+    apps = []
+    for i in range(12):
+        app = backend.create_application(
+            _form(PESELS[i % 3], f"2025-01-{i + 1:02d}"),
+            status="new" if i % 4 else "closed",
+            ai_suggestion=None if i % 5 == 0 else i / 12,
+        )
+        apps.append(app)
+    return apps
+
+
+def _expected(apps, predicate):
+    return [app["id"] for app in reversed(apps) if predicate(app)]
+
+
+@pytest.mark.parametrize(
+    "filters, predicate",
+    [
+        ({"pesel": PESELS[1]}, lambda app: app["pesel"] == PESELS[1]),
+        ({"status": "closed"}, lambda app: app["status"] == "closed"),
+        (
+            {"accident_date_from": date(2025, 1, 3), "accident_date_to": date(2025, 1, 7)},
+            lambda app: "2025-01-03" <= app["form_data"]["szczegoly"]["data"] <= "2025-01-07",
+        ),
+        (
+            {"ai_suggestion_min": 0.25, "ai_suggestion_max": 0.5},
+            lambda app: app["ai_suggestion"] is not None and 0.25 <= app["ai_suggestion"] <= 0.5,
+        ),
+        (
+            {"pesel": PESELS[0], "status": "new", "accident_date_from": date(2025, 1, 2)},
+            lambda app: app["pesel"] == PESELS[0] and app["status"] == "new"
+            and app["form_data"]["szczegoly"]["data"] >= "2025-01-02",
+        ),
+        ({"status": "rejected"}, lambda app: False),
+    ],
+)
+def test_filters_match_a_full_scan(backend, applications, filters, predicate):
+    expected = _expected(applications, predicate)
+    items, total = backend.list_applications(page_size=100, **filters)
+    assert [app["id"] for app in items] == expected
+    assert total == len(expected)
+
+    first, _ = backend.list_applications(page=1, page_size=2, **filters)
+    second, _ = backend.list_applications(page=2, page_size=2, **filters)
+    assert [app["id"] for app in first + second] == expected[:4]
+
+
+def test_created_at_bounds_are_inclusive(backend, applications):
+    lo, hi = applications[3]["created_at"], applications[8]["created_at"]
+    items, total = backend.list_applications(page_size=100, date_from=lo, date_to=hi)
+    assert [app["id"] for app in items] == _expected(applications[3:9], lambda app: True)
+    assert total == 6
+
+
+def test_updates_move_applications_between_index_entries(backend, applications):
+    app = applications[0]
+    backend.update_application(app["id"], status="new", ai_suggestion=0.99, form_data=_form(PESELS[2], "2030-06-01"))
+
+    assert app["id"] not in [item["id"] for item in backend.list_applications(page_size=100, status="closed")[0]]
+    assert app["id"] in [item["id"] for item in backend.list_applications(page_size=100, pesel=PESELS[2])[0]]
+    items, _ = backend.list_applications(page_size=100, ai_suggestion_min=0.95)
+    assert [item["id"] for item in items] == [app["id"]]
+    items, _ = backend.list_applications(page_size=100, accident_date_from=date(2030, 1, 1))
+    assert [item["id"] for item in items] == [app["id"]]
+
+
+def test_planner_drives_the_scan_from_the_most_selective_index():
+    indexes = ApplicationIndexes()
+    start = datetime(2025, 1, 1)
+    for i in range(100):
+        indexes.add({
+            "id": f"app-{i:03d}",
+            "created_at": start + timedelta(hours=i),
+            "pesel": "44051401359" if i == 7 else PESELS[1],
+            "status": "closed" if i % 10 == 0 else "new",
+            "ai_suggestion": i / 100,
+            "form_data": make_form(data=f"2025-02-{i % 28 + 1:02d}"),
+        })
+
+    assert indexes.plan(ApplicationFilters()) == ("created_at", 100)
+    assert indexes.plan(ApplicationFilters(pesel="44051401359", status="new")) == ("pesel", 1)
+    assert indexes.plan(ApplicationFilters(status="closed", ai_suggestion_min=0.5)) == ("status", 10)
+    assert indexes.plan(ApplicationFilters(status="new", ai_suggestion_min=0.95)) == ("ai_suggestion", 5)
+    name, estimate = indexes.plan(ApplicationFilters(
+        status="new", accident_date_from=date(2025, 2, 1), accident_date_to=date(2025, 2, 1),
+    ))
+    assert (name, estimate) == ("accident_date", 4)
+    assert indexes.plan(ApplicationFilters(date_from=start + timedelta(hours=98))) == ("created_at", 2)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("2025-03-01", date(2025, 3, 1)), ("01.03.2025", date(2025, 3, 1)), (" 1/3/2025 ", date(2025, 3, 1)), ("wczoraj", None), ("", None)],
+)
+def test_accident_dates_in_the_formats_the_agents_send(value, expected):
+    assert parse_accident_date(value) == expected
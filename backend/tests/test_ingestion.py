@@ -0,0 +1,96 @@
+import base64
+
+import pytest
+
+from app.services.ingestion import decode_base64, ingest_all, ingest_base64
+from app.utils.validation import resolve_mime_type, validate_attachment
+from conftest import PDF
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 100
+DOCX = b"PK\x03\x04" + b"\x00" * 100
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+XLSX_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _encoded(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+@pytest.mark.parametrize(
+    "data, declared, expected",
+    [
+        (PDF, "application/pdf", "application/pdf"),
+        (PDF, "image/png", "application/pdf"),
+        (PDF, None, "application/pdf"),
+        (PNG, "image/jpeg", "image/png"),
+        (JPEG, "image/jpg", "image/jpg"),
+        (JPEG, "image/png", "image/jpeg"),
+        (DOCX, XLSX_TYPE, XLSX_TYPE),
+        (DOCX, DOCX_TYPE, DOCX_TYPE),
+    ],
+    ids=["pdf", "pdf-declared-png", "pdf-undeclared", "png-declared-jpeg", "jpg", "jpeg-declared-png", "xlsx", "docx"],
+)
+def test_type_is_taken_from_the_content(data, declared, expected):
+    assert resolve_mime_type(data[:16], declared) == expected
+
+
+@pytest.mark.parametrize(
+    "data, declared, error",
+    [
+        (PDF, "application/x-msdownload", "is not allowed"),
+        (PDF, "application/octet-stream", "is not allowed"),
+        (b"MZ\x90\x00" + b"\x00" * 100, "application/pdf", "none of the allowed types"),
+        (b"", "application/pdf", "empty"),
+        (DOCX, "image/png", "does not match"),
+    ],
+    ids=["declared-exe", "declared-octet-stream", "exe", "empty", "ambiguous-zip"],
+)
+def test_refused_types(data, declared, error):
+    with pytest.raises(ValueError, match=error):
+        resolve_mime_type(data[:16], declared)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        _encoded(PDF)[:4000] + "!!!!" + _encoded(PDF)[4004:],
+        _encoded(PDF)[:4000] + "AA==" + _encoded(PDF)[4004:],
+        _encoded(PDF) + "====",
+    ],
+    ids=["bad-characters", "padding-inside", "excess-padding"],
+)
+def test_invalid_base64_past_the_first_bytes_is_refused(client, data):
+    valid, error, _ = validate_attachment({"title": "scan.pdf", "mime_type": "application/pdf", "data": data})
+    assert not valid and error.startswith("Invalid base64 data")
+    with pytest.raises(ValueError, match="Invalid base64 data"):
+        ingest_base64("scan.pdf", "application/pdf", data)
+    with pytest.raises(ValueError, match="Invalid base64 data"):
+        decode_base64(data, "application/pdf")
+
+
+def test_base64_with_line_breaks_is_accepted(client):
+    data = base64.encodebytes(PDF).decode()
+    assert "\n" in data
+    assert validate_attachment({"title": "scan.pdf", "mime_type": "application/pdf", "data": data}) == (True, None, len(PDF))
+    assert decode_base64(data, None) == (PDF, "application/pdf")
+
+
+def test_ingested_attachment_has_the_real_type(client):
+    ingested = ingest_all([
+        {"title": "scan.pdf", "mime_type": "image/png", "data": _encoded(PDF)},
+        {"title": "photo.png", "mime_type": "image/png", "data": _encoded(PNG)},
+    ])
+    try:
+        assert [(att.mime_type, att.size_bytes) for att in ingested] == [("application/pdf", len(PDF)), ("image/png", len(PNG))]
+    finally:
+        for att in ingested:
+            att.writer.discard()
+
+
+def test_attachment_endpoint_stores_the_real_type(client, app_id):
+    url = f"/api/applications/{app_id}/attachments"
+    response = client.post(url, json={"title": "scan", "mime_type": "image/jpeg", "data": _encoded(PDF)})
+    assert response.status_code == 201, response.text
+    assert response.json()["attachment"]["mime_type"] == "application/pdf"
+    assert client.post(url, json={"title": "x", "mime_type": "text/plain", "data": _encoded(PDF)}).status_code == 400
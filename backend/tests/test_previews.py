@@ -0,0 +1,69 @@
+import base64
+import io
+import os
+
+from PIL import Image
+
+from app.database.store import store
+from app.services.previews import preview_size
+from conftest import PDF
+
+
+def _png(width: int, height: int, color=(200, 30, 30)) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(out, "PNG")
+    return out.getvalue()
+
+
+def _attach(client, app_id, title: str, mime_type: str, data: bytes) -> str:
+    response = client.post(
+        f"/api/applications/{app_id}/attachments",
+        json={"title": title, "mime_type": mime_type, "data": base64.b64encode(data).decode()},
+    )
+    assert response.status_code == 201, response.text
+    return response.json()["attachment"]["id"]
+
+
+def test_sizes_round_up_to_the_supported_ones():
+    assert [preview_size(size) for size in (16, 128, 129, 512, 2048)] == [128, 128, 256, 512, 1024]
+
+
+def test_image_preview_fits_the_size(client, app_id):
+    attachment_id = _attach(client, app_id, "photo.png", "image/png", _png(800, 400))
+    url = f"/api/applications/{app_id}/attachments/{attachment_id}/preview"
+
+    response = client.get(url, params={"size": 200, "format": "jpeg"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    assert Image.open(io.BytesIO(response.content)).size == (256, 128)
+    assert client.get(url, params={"size": 200, "format": "jpeg"}, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+def test_types_without_previews_are_refused(client, app_id):
+    attachment_id = _attach(client, app_id, "a.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", b"PK\x03\x04" + b"\x00" * 100)
+    response = client.get(f"/api/applications/{app_id}/attachments/{attachment_id}/preview")
+    assert response.status_code == 415
+
+
+def test_broken_files_get_a_fixed_message(client, app_id):
+    # A PDF signature with no document behind it, and a PNG cut short
+    for title, mime_type, data in [("scan.pdf", "application/pdf", PDF), ("cut.png", "image/png", _png(300, 300)[:60])]:
+        attachment_id = _attach(client, app_id, title, mime_type, data)
+        response = client.get(f"/api/applications/{app_id}/attachments/{attachment_id}/preview")
+        assert response.status_code == 422
+        assert response.json()["detail"]["message"] == "Cannot render preview"
+
+
+def test_missing_attachment_or_content_is_not_found(client, app_id):
+    assert client.get(f"/api/applications/{app_id}/attachments/missing/preview").status_code == 404
+
+    data = _png(64, 64, color=(1, 2, 3))
+    attachment_id = _attach(client, app_id, "gone.png", "image/png", data)
+    path, _ = store.blobs.locate(store.get_attachment(attachment_id)["sha256"])
+    # Put back afterwards: the other tests share the store
+    os.rename(path, path + ".away")
+    try:
+        response = client.get(f"/api/applications/{app_id}/attachments/{attachment_id}/preview")
+    finally:
+        os.rename(path + ".away", path)
+    assert response.status_code == 404
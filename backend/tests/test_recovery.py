@@ -0,0 +1,144 @@
+"""Restarting after a crash: the in-memory store's WAL and snapshots, SQLite's blob files."""
+import base64
+import os
+import time
+
+import pytest
+
+from app.database.blobs import BlobStore
+from app.database.persistence import StoreJournal
+from app.database.sqlite_store import SQLiteStore
+from conftest import PDF, open_memory_store
+
+
+def crash(store) -> None:
+    """Stop using a journaled store without closing it: no final snapshot, lock released."""
+    store._journal._file.flush()
+    store._journal._lock_file.close()
+
+
+def test_wal_replay_restores_every_mutation(tmp_path, form_data):
+    directory = str(tmp_path / "data")
+    store = open_memory_store(directory)
+    ids = [store.create_application(form_data, status="new")["id"] for _ in range(5)]
+    store.update_application(ids[0], status="closed", ai_suggestion=0.5)
+    attachment = store.create_attachment(ids[1], "scan.pdf", "application/pdf", base64.b64encode(PDF).decode())
+    store.delete_application(ids[2])
+    version = store.version
+    crash(store)
+
+    store = open_memory_store(directory)
+    try:
+        assert store.version == version
+        assert store.get_application(ids[0])["status"] == "closed"
+        assert store.get_application(ids[2]) is None
+        assert store.get_application_attachments(ids[1])[0]["id"] == attachment["id"]
+        assert store.blobs.read(attachment["sha256"]) == PDF
+        assert store.get_stats()["total"] == 4
+    finally:
+        store.close()
+
+
+def test_restart_after_snapshots_and_wal_tail(tmp_path, form_data):
+    directory = str(tmp_path / "data")
+    store = open_memory_store(directory, snapshot_every=3)
+    ids = [store.create_application(form_data)["id"] for _ in range(10)]
+    # Let the background snapshot finish; the update after it stays in the WAL tail only
+    store._journal._snapshot_thread.join()
+    store.update_application(ids[9], status="closed")
+    crash(store)
+    assert os.path.exists(os.path.join(directory, "snapshot.bin"))
+
+    store = open_memory_store(directory)
+    try:
+        assert store.get_stats()["total"] == 10
+        assert store.get_application(ids[9])["status"] == "closed"
+    finally:
+        store.close()
+
+
+class _SlowToPickle:
+    """State that takes a while to snapshot, so a second snapshot can overtake it."""
+
+    def __init__(self, records: int):
+        self.records = records
+
+    def __reduce__(self):
+        time.sleep(0.3)
+        return dict, ({"records": self.records},)
+
+
+def test_older_snapshot_never_replaces_a_newer_one(tmp_path):
+    journal = StoreJournal(str(tmp_path), snapshot_every=1000)
+    journal.recover()
+    journal.start()
+    for i in range(5):
+        journal.append("op", i)
+    journal.snapshot(_SlowToPickle(5), background=True)
+    for i in range(5):
+        journal.append("op", i)
+    journal.snapshot({"records": 10}, background=False)
+    journal.close()
+
+    journal = StoreJournal(str(tmp_path))
+    state, records = journal.recover()
+    assert state == {"records": 10}
+    assert list(records) == []
+
+
+def test_failed_transaction_keeps_the_blob_files(tmp_path, form_data, monkeypatch):
+    store = SQLiteStore(str(tmp_path / "store.db"), BlobStore(str(tmp_path / "blobs")))
+    store.open()
+    try:
+        app_id = store.create_application(form_data)["id"]
+        attachment = store.create_attachment(app_id, "scan.pdf", "application/pdf", base64.b64encode(PDF).decode())
+
+        def fail(*args, **kwargs):
+            raise RuntimeError("disk full")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(store, "_log_change", fail)
+            with pytest.raises(RuntimeError):
+                store.delete_attachment(app_id, attachment["id"])
+
+        assert store.get_application_attachments(app_id)[0]["id"] == attachment["id"]
+        assert store.blobs.read(attachment["sha256"]) == PDF
+        assert store.delete_attachment(app_id, attachment["id"])
+        assert not store.blobs.exists(attachment["sha256"])
+    finally:
+        store.close()
+
+
+def test_failed_cleanup_after_commit_is_logged_and_swept_on_open(tmp_path, form_data, monkeypatch, caplog):
+    def open_store():
+        store = SQLiteStore(str(tmp_path / "store.db"), BlobStore(str(tmp_path / "blobs")))
+        store.open()
+        return store
+
+    store = open_store()
+    try:
+        app_id = store.create_application(form_data)["id"]
+        attachment = store.create_attachment(app_id, "scan.pdf", "application/pdf", base64.b64encode(PDF).decode())
+
+        def fail(sha256):
+            raise PermissionError(sha256)
+
+        with monkeypatch.context() as patch:
+            patch.setattr(store.blobs, "delete", fail)
+            assert store.delete_attachment(app_id, attachment["id"])
+        assert "Failed to delete 1 unused blob file(s)" in caplog.text
+        assert store.get_application_attachments(app_id) == []
+        assert store.blobs.exists(attachment["sha256"])
+        # The connection is usable for the next write
+        assert store.update_application(app_id, status="closed")["status"] == "closed"
+        in_flight = tmp_path / "blobs" / "upload-in-progress.tmp"
+        in_flight.write_bytes(b"...")
+    finally:
+        store.close()
+
+    store = open_store()
+    try:
+        assert not store.blobs.exists(attachment["sha256"])
+        assert in_flight.exists()
+    finally:
+        store.close()
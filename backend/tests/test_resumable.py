@@ -0,0 +1,111 @@
+import asyncio
+import hashlib
+import os
+import time
+from datetime import timedelta
+
+import pytest
+from starlette.concurrency import run_in_threadpool
+
+from app.database.store import store
+from app.services import resumable
+
+CHUNK = 64 * 1024
+DATA = b"%PDF-1.7\n" + os.urandom(5 * CHUNK + 1234)
+
+
+def _start(client, app_id: str, data: bytes = DATA) -> str:
+    response = client.post(
+        f"/api/applications/{app_id}/uploads",
+        json={"title": "scan.pdf", "mime_type": "application/pdf", "size_bytes": len(data), "chunk_size": CHUNK},
+    )
+    assert response.status_code == 201, response.text
+    return f"/api/applications/{app_id}/uploads/{response.json()['id']}"
+
+
+def _chunk(index: int) -> bytes:
+    return DATA[index * CHUNK:(index + 1) * CHUNK]
+
+
+def test_chunks_in_any_order_complete_into_an_attachment(client, app_id):
+    session = _start(client, app_id)
+    for index in (5, 0, 3):
+        assert client.put(f"{session}/chunks/{index}", content=_chunk(index)).status_code == 200
+    status = client.get(session).json()
+    assert status["total_chunks"] == 6
+    assert status["received_ranges"] == [[0, CHUNK], [3 * CHUNK, 4 * CHUNK], [5 * CHUNK, len(DATA)]]
+    assert client.post(f"{session}/complete").status_code == 409
+
+    for index in (1, 2, 4, 0):
+        assert client.put(f"{session}/chunks/{index}", content=_chunk(index)).status_code == 200
+    response = client.post(f"{session}/complete")
+    assert response.status_code == 201, response.text
+    attachment = response.json()["attachment"]
+    assert attachment["size_bytes"] == len(DATA)
+    assert client.get(f"/api/applications/{app_id}/attachments/{attachment['id']}").content == DATA
+    assert client.get(session).status_code == 404
+    upload_id = session.rsplit("/", 1)[-1]
+    assert not any(name.startswith(upload_id) for name in os.listdir(store.blobs.upload_directory()))
+
+
+def test_chunk_of_the_wrong_size_counts_as_missing(client, app_id):
+    session = _start(client, app_id)
+    assert client.put(f"{session}/chunks/0", content=b"x" * 10).status_code == 400
+    assert client.put(f"{session}/chunks/6", content=b"x").status_code == 400
+    assert client.get(session).json()["received_chunks"] == []
+    assert client.delete(session).status_code == 204
+
+
+def test_chunk_for_an_aborted_session(client, app_id):
+    session = _start(client, app_id)
+    assert client.delete(session).status_code == 204
+    assert client.put(f"{session}/chunks/0", content=_chunk(0)).status_code == 404
+
+
+def test_chunk_arriving_during_completion_is_refused(client, app_id):
+    url = _start(client, app_id)
+    for index in range(6):
+        client.put(f"{url}/chunks/{index}", content=_chunk(index))
+    upload_id = url.rsplit("/", 1)[-1]
+    session = resumable.get_session(app_id, upload_id)
+
+    async def scenario():
+        completed = asyncio.Event()
+
+        async def resent_chunk():
+            yield _chunk(0)[:1000]
+            await completed.wait()
+            yield b"\0" * (CHUNK - 1000)  # would corrupt the file if written after it was hashed
+
+        write = asyncio.ensure_future(resumable.write_chunk(session, 0, resent_chunk()))
+        await asyncio.sleep(0.05)
+        ingested = await run_in_threadpool(resumable.complete_session, session)
+        completed.set()
+        with pytest.raises(FileNotFoundError):
+            await write
+        return ingested
+
+    ingested = asyncio.run(scenario())
+    try:
+        path = os.path.join(store.blobs.upload_directory(), upload_id + resumable._COMPLETING_SUFFIX, "data")
+        with open(path, "rb") as f:
+            assert hashlib.sha256(f.read()).hexdigest() == ingested.writer.sha256 == hashlib.sha256(DATA).hexdigest()
+    finally:
+        ingested.writer.discard()
+        resumable.finish_session(upload_id)
+
+
+def test_idle_sessions_expire_but_completing_ones_get_a_grace_period(client, app_id):
+    root = store.blobs.upload_directory()
+    idle = _start(client, app_id).rsplit("/", 1)[-1]
+    completing = _start(client, app_id).rsplit("/", 1)[-1]
+    os.rename(os.path.join(root, completing), os.path.join(root, completing + resumable._COMPLETING_SUFFIX))
+    two_hours_ago = time.time() - 2 * 3600
+    for name in (idle, completing + resumable._COMPLETING_SUFFIX):
+        os.utime(os.path.join(root, name, "meta.json"), (two_hours_ago, two_hours_ago))
+
+    assert resumable.expire_sessions(timedelta(hours=3)) == 0
+    assert resumable.expire_sessions(timedelta(minutes=90)) == 1
+    assert os.listdir(root) == [completing + resumable._COMPLETING_SUFFIX]
+    assert resumable.expire_sessions(timedelta(minutes=30)) == 1
+    assert os.listdir(root) == []
@@ -0,0 +1,82 @@
+import asyncio
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import retention
+from app.services.retention import RetentionSweeper
+from conftest import PDF
+
+
+@pytest.fixture
+def sweeper(backend, monkeypatch):
+    """A sweeper over `backend` with small slices and nothing enabled yet."""
+    monkeypatch.setattr(retention, "store", backend)
+    for name, value in {
+        "SESSION_TTL_MINUTES": 0,
+        "UPLOAD_SESSION_TTL_HOURS": 0,
+        "APPLICATION_RETENTION_DAYS": 0,
+        "ATTACHMENT_RETENTION_DAYS": 0,
+        "RETENTION_SLICE_SIZE": 2,
+        "RETENTION_SLICE_PAUSE_MS": 0,
+    }.items():
+        monkeypatch.setattr(retention, name, value)
+    return RetentionSweeper()
+
+
+def _sweep(sweeper) -> dict:
+    return asyncio.run(sweeper.sweep())
+
+
+def test_nothing_is_reclaimed_by_default(sweeper, backend, form_data):
+    backend.create_applications([{"form_data": form_data, "created_at": datetime(2000, 1, 1)}])
+    assert _sweep(sweeper) == {"upload_sessions": 0, "attachments": 0, "applications": 0}
+    assert backend.get_stats()["total"] == 1
+
+
+def test_old_applications_are_deleted_in_slices(sweeper, backend, form_data, monkeypatch):
+    monkeypatch.setattr(retention, "APPLICATION_RETENTION_DAYS", 30)
+    old = datetime.utcnow() - timedelta(days=31)
+    created = backend.create_applications(
+        [{"form_data": form_data, "created_at": old - timedelta(minutes=i)} for i in range(5)]
+        + [{"form_data": form_data, "created_at": datetime.utcnow() - timedelta(days=29)}]
+    )
+    slices = []
+    apply_bulk = backend.apply_bulk
+    monkeypatch.setattr(backend, "apply_bulk", lambda operations: slices.append(len(operations)) or apply_bulk(operations))
+
+    assert _sweep(sweeper)["applications"] == 5
+    assert slices == [2, 2, 1]
+    assert [app["id"] for app in backend.iter_applications()] == [created[5]["id"]]
+    assert sweeper.stats()["reclaimed_total"]["applications"] == 5
+
+
+def test_old_attachments_are_deleted_and_applications_kept(sweeper, backend, form_data, monkeypatch):
+    encoded = base64.b64encode(PDF).decode()
+    app_ids = [backend.create_application(form_data)["id"] for _ in range(3)]
+    for app_id in app_ids:
+        backend.create_attachment(app_id, "scan.pdf", "application/pdf", encoded)
+    # Every attachment created so far is past a retention period that ends now
+    monkeypatch.setattr(retention, "ATTACHMENT_RETENTION_DAYS", 1e-9)
+
+    assert _sweep(sweeper)["attachments"] == 3
+    stats = backend.get_stats()
+    assert (stats["total"], stats["with_attachments"]) == (3, 0)
+    assert all(backend.get_application_attachments(app_id) == [] for app_id in app_ids)
+    assert _sweep(sweeper)["attachments"] == 0
+
+
+def test_idle_sessions_expire_unless_in_use(sweeper, monkeypatch):
+    monkeypatch.setattr(retention, "SESSION_TTL_MINUTES", 60)
+    long_ago = datetime.now() - timedelta(hours=2)
+    sessions = {
+        "idle": {"created_at": long_ago},
+        "active": {"created_at": long_ago, "last_updated": datetime.now()},
+        "listened": {"created_at": long_ago},
+    }
+    sweeper.track_sessions("voice_sessions", sessions, in_use=lambda session_id: session_id == "listened")
+
+    assert _sweep(sweeper)["voice_sessions"] == 1
+    assert sorted(sessions) == ["active", "listened"]
+    assert sweeper.last_run["reclaimed"]["voice_sessions"] == 1
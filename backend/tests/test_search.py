@@ -0,0 +1,75 @@
+import pytest
+
+from app.database.search import InvertedIndex, analyze, fold, stem
+from app.models.schemas import AccidentReportFormData
+from conftest import make_form
+
+
+def test_fold_strips_polish_and_other_diacritics():
+    assert fold("Łódź, ŻURAW, źdźbło") == "lodz, zuraw, zdzblo"
+    assert fold("Café Müller") == "cafe muller"
+
+
+@pytest.mark.parametrize("word", ["drabina", "drabiny", "drabinie", "drabinami", "drabinach"])
+def test_inflected_forms_share_a_stem(word):
+    assert stem(word) == "drabin"
+
+
+def test_analyze_drops_stopwords_and_keeps_short_stems():
+    assert analyze("Upadek z DRABINY podczas pracy na hali") == ["upadek", "drabin", "podczas", "prac", "hal"]
+    assert stem("oko") == "oko"
+
+
+def test_all_query_terms_must_match_and_ranking_follows_bm25():
+    index = InvertedIndex()
+    index.add("ladder", "upadek z drabiny, drabina byla sliska, drabina stala krzywo")
+    index.add("ladder-once", "upadek z drabiny w magazynie podczas inwentaryzacji towaru na regalach")
+    index.add("forklift", "wozek widlowy potracil pracownika w magazynie")
+
+    hits, total = index.search("drabina", 0, 10)
+    assert total == 2
+    assert [doc_id for doc_id, _ in hits] == ["ladder", "ladder-once"]
+    assert hits[0][1] > hits[1][1] > 0
+
+    hits, total = index.search("Magazyn DRABINY", 0, 10)
+    assert [doc_id for doc_id, _ in hits] == ["ladder-once"] and total == 1
+    assert index.search("dźwig", 0, 10) == ([], 0)
+    assert index.search("i na z", 0, 10) == ([], 0)
+
+    index.remove("ladder")
+    assert [doc_id for doc_id, _ in index.search("drabina", 0, 10)[0]] == ["ladder-once"]
+
+
+def _create(backend, circumstances: str, injuries: str = "Stłuczenie") -> str:
+    form = make_form(opis_okolicznosci=circumstances, opis_urazow=injuries, miejsce="Zakład")
+    return backend.create_application(AccidentReportFormData(**form))["id"]
+
+
+def test_search_is_the_same_on_both_backends(backend):
+    twice = _create(backend, "Pracownik spadł z drabiny. Drabina była śliska, drabina nie miała stopek.")
+    once = _create(backend, "Upadek z drabiny w magazynie podczas przenoszenia kartonów z towarem na regały")
+    _create(backend, "Wózek widłowy potrącił pracownika w magazynie", injuries="Złamanie nogi")
+
+    hits, total = backend.search_applications("DRABINA")
+    assert total == 2
+    assert [app["id"] for app, _ in hits] == [twice, once]
+    assert hits[0][1] > hits[1][1]
+
+    hits, total = backend.search_applications("magazynie wozek")
+    assert total == 1
+    assert backend.search_applications("zlamanie")[1] == 1
+    assert backend.search_applications("dźwig") == ([], 0)
+
+    page, total = backend.search_applications("magazyn", page=2, page_size=1)
+    assert total == 2 and len(page) == 1
+
+
+def test_search_follows_updates_and_deletions(backend):
+    app_id = _create(backend, "Poparzenie gorącą wodą w kuchni")
+    form = make_form(opis_okolicznosci="Skaleczenie nożem przy krojeniu", opis_urazow="Rana dłoni")
+    backend.update_application(app_id, form_data=AccidentReportFormData(**form))
+
+    assert backend.search_applications("kuchni") == ([], 0)
+    assert [app["id"] for app, _ in backend.search_applications("nożem")[0]] == [app_id]
+    backend.delete_application(app_id)
+    assert backend.search_applications("nożem") == ([], 0)
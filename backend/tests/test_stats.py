@@ -0,0 +1,78 @@
+import base64
+from collections import Counter
+
+import pytest
+
+from app.database.blobs import BlobStore
+from app.database.sqlite_store import SQLiteStore
+from app.database.stats import AI_SUGGESTION_BUCKETS, NO_STATUS, ai_suggestion_bucket
+from conftest import PDF, open_memory_store
+
+
+def _recount(backend) -> dict:
+    """The dashboard counters computed the slow way, from every application."""
+    apps = list(backend.iter_applications())
+    by_day = {}
+    histogram = [0] * AI_SUGGESTION_BUCKETS
+    for app in apps:
+        day = by_day.setdefault(app["created_at"].date().isoformat(), Counter())
+        day[app["status"] or NO_STATUS] += 1
+        if app["ai_suggestion"] is not None:
+            histogram[ai_suggestion_bucket(app["ai_suggestion"])] += 1
+    return {
+        "total": len(apps),
+        "with_attachments": sum(1 for app in apps if app["attachment_ids"]),
+        "by_status": dict(Counter(app["status"] or NO_STATUS for app in apps)),
+        "by_day": {day: dict(counts) for day, counts in sorted(by_day.items())},
+        "ai_suggestion_histogram": histogram,
+        "ai_suggestion_missing": sum(1 for app in apps if app["ai_suggestion"] is None),
+    }
+
+
+def _mutate(backend, form_data) -> None:
+    encoded = base64.b64encode(PDF).decode()
+    ids = [
+        backend.create_application(form_data, status=status, ai_suggestion=suggestion)["id"]
+        for status, suggestion in [("new", 0.05), ("new", None), (None, 0.95), ("closed", 1.0), ("new", 0.5)]
+    ]
+    backend.update_application(ids[0], status="closed", ai_suggestion=0.42)
+    backend.update_application(ids[2], status="new")
+    attachment = backend.create_attachment(ids[1], "a.pdf", "application/pdf", encoded)
+    backend.create_attachment(ids[3], "b.pdf", "application/pdf", encoded)
+    backend.delete_attachment(ids[1], attachment["id"])
+    backend.delete_application(ids[4])
+    backend.apply_bulk([{"op": "update", "id": ids[1], "ai_suggestion": 0.15}, {"op": "delete", "id": ids[3]}])
+    backend.create_application(form_data)
+
+
+def test_counters_follow_every_mutation(backend, form_data):
+    assert backend.get_stats()["total"] == 0
+    _mutate(backend, form_data)
+    stats = backend.get_stats()
+    assert stats == _recount(backend)
+    assert stats["by_status"] == {"closed": 1, "new": 2, NO_STATUS: 1}
+    assert stats["with_attachments"] == 0
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_counters_after_a_restart(tmp_path, form_data, kind):
+    if kind == "memory":
+        backend = open_memory_store(str(tmp_path))
+        _mutate(backend, form_data)
+        expected = backend.get_stats()
+        # Crash: the WAL is replayed on the next start, not a snapshot
+        backend._journal._file.flush()
+        backend._journal._lock_file.close()
+        backend = open_memory_store(str(tmp_path))
+    else:
+        backend = SQLiteStore(str(tmp_path / "store.db"), BlobStore(str(tmp_path / "blobs")))
+        backend.open()
+        _mutate(backend, form_data)
+        expected = backend.get_stats()
+        backend.close()
+        backend = SQLiteStore(str(tmp_path / "store.db"), BlobStore(str(tmp_path / "blobs")))
+        backend.open()
+    try:
+        assert backend.get_stats() == expected == _recount(backend)
+    finally:
+        backend.close()
@@ -0,0 +1,147 @@
+"""What every StoreBackend must do alike; each test runs against both backends."""
+import base64
+from datetime import timedelta, timezone
+
+import pytest
+
+from app.database.base import VersionConflict
+from conftest import PDF
+
+
+def test_created_application_can_be_read_listed_and_deleted(backend, form_data):
+    app = backend.create_application(form_data, status="new", ai_suggestion=0.25)
+    assert app["form_data"]["poszkodowany"]["pesel"] == form_data.poszkodowany.pesel
+    assert backend.get_application(app["id"]) == app
+
+    items, total = backend.list_applications()
+    assert [item["id"] for item in items] == [app["id"]]
+    assert total == 1
+
+    assert backend.delete_application(app["id"])
+    assert backend.get_application(app["id"]) is None
+    assert not backend.delete_application(app["id"])
+    assert backend.list_applications() == ([], 0)
+
+
+def test_list_is_newest_first_and_paginated(backend, form_data):
+    ids = [backend.create_application(form_data)["id"] for _ in range(5)]
+    first, total = backend.list_applications(page=1, page_size=2)
+    second, _ = backend.list_applications(page=2, page_size=2)
+    third, _ = backend.list_applications(page=3, page_size=2)
+    assert total == 5
+    assert [app["id"] for app in first + second + third] == ids[::-1]
+
+
+def test_bulk_create_keeps_existing_ids(backend, form_data):
+    existing = backend.create_application(form_data)
+    created = backend.create_applications([
+        {"form_data": form_data, "status": "new"},
+        {"form_data": form_data, "id": existing["id"]},
+    ])
+    assert created[0]["status"] == "new" and created[1] is None
+    assert backend.get_application(existing["id"]) == existing
+
+
+def test_bulk_create_takes_one_version_per_created_application(backend, form_data):
+    existing = backend.create_application(form_data)
+    created = backend.create_applications([
+        {"form_data": form_data},
+        {"form_data": form_data, "id": existing["id"]},
+        {"form_data": form_data, "status": "new"},
+    ])
+    version = existing["version"]
+    assert [created[0]["version"], created[2]["version"]] == [version + 1, version + 2] == [
+        backend.get_application(created[i]["id"])["version"] for i in (0, 2)
+    ]
+    assert [(change["version"], change["id"]) for change in backend.changes_since(version)] == [
+        (version + 1, created[0]["id"]),
+        (version + 2, created[2]["id"]),
+    ]
+    assert backend.version == version + 2
+
+
+def test_shared_blob_outlives_one_of_its_attachments(backend, form_data):
+    encoded = base64.b64encode(PDF).decode()
+    first, second = (backend.create_application(form_data)["id"] for _ in range(2))
+    kept = backend.create_attachment(first, "a.pdf", "application/pdf", encoded)
+    dropped = backend.create_attachment(second, "b.pdf", "application/pdf", encoded)
+    assert kept["sha256"] == dropped["sha256"]
+
+    assert backend.delete_attachment(second, dropped["id"])
+    assert backend.blobs.read(kept["sha256"]) == PDF
+    assert backend.delete_application(first)
+    assert not backend.blobs.exists(kept["sha256"])
+
+
+@pytest.mark.parametrize("offset_hours", [0, 2])
+def test_cursor_with_utc_offset_matches_naive_cursor(backend, form_data, offset_hours):
+    for _ in range(5):
+        backend.create_application(form_data)
+    items, _ = backend.list_applications(page_size=2)
+    created_at, app_id = items[-1]["created_at"], items[-1]["id"]
+    offset = timezone(timedelta(hours=offset_hours))
+    aware = (created_at.replace(tzinfo=timezone.utc).astimezone(offset), app_id)
+
+    expected, _ = backend.list_applications(page_size=10, after=(created_at, app_id))
+    page, _ = backend.list_applications(page_size=10, after=aware)
+    assert [app["id"] for app in page] == [app["id"] for app in expected]
+    assert len(page) == 3
+
+
+def test_update_takes_a_version(backend, form_data):
+    app = backend.create_application(form_data, status="new")
+    updated = backend.update_application(app["id"], status="closed", expected_version=app["version"])
+    assert updated["status"] == "closed"
+    assert updated["version"] == app["version"] + 1 == backend.version
+
+
+def test_update_of_missing_application_takes_no_version(backend, form_data):
+    backend.create_application(form_data)
+    version = backend.version
+    assert backend.update_application("missing", status="closed") is None
+    assert backend.version == version
+    assert backend.changes_since(version) == []
+
+
+def test_conflicting_update_takes_no_version(backend, form_data):
+    app = backend.create_application(form_data)
+    with pytest.raises(VersionConflict) as conflict:
+        backend.update_application(app["id"], status="closed", expected_version=app["version"] - 1)
+    assert conflict.value.current_version == app["version"]
+    assert backend.version == app["version"]
+
+
+def test_bulk_takes_one_version_per_applied_operation(backend, form_data):
+    first, second, third = (backend.create_application(form_data) for _ in range(3))
+    version = backend.version
+    results = backend.apply_bulk([
+        {"op": "update", "id": first["id"], "status": "closed"},
+        {"op": "update", "id": "missing", "status": "closed"},
+        {"op": "update", "id": second["id"], "status": "closed", "expected_version": second["version"] - 1},
+        {"op": "delete", "id": third["id"]},
+        {"op": "update", "id": second["id"], "ai_suggestion": 0.5},
+    ])
+
+    assert [result["result"] for result in results] == ["updated", "not_found", "conflict", "deleted", "updated"]
+    assert results[2]["version"] == second["version"]
+    assert [change["version"] for change in backend.changes_since(version)] == [version + 1, version + 2, version + 3]
+    assert results[0]["version"] == version + 1 and results[4]["version"] == version + 3
+    assert backend.version == version + 3
+
+
+def test_bulk_without_applied_operations_takes_no_version(backend, form_data):
+    app = backend.create_application(form_data)
+    results = backend.apply_bulk([
+        {"op": "delete", "id": "missing"},
+        {"op": "update", "id": app["id"], "status": "closed", "expected_version": app["version"] + 1},
+    ])
+    assert [result["result"] for result in results] == ["not_found", "conflict"]
+    assert backend.version == app["version"]
+
+
+def test_attachment_to_missing_application_takes_no_version(backend, form_data):
+    backend.create_application(form_data)
+    version = backend.version
+    encoded = base64.b64encode(PDF).decode()
+    assert backend.create_attachment("missing", "scan.pdf", "application/pdf", encoded) is None
+    assert backend.version == version
@@ -0,0 +1,93 @@
+import asyncio
+import base64
+import json
+
+from app.services.transfer import iter_lines
+from conftest import FORM, PDF
+
+
+def _lines(chunks):
+    async def body():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [item async for item in iter_lines(body())]
+
+    return asyncio.run(collect())
+
+
+def test_lines_split_across_chunks_are_joined():
+    assert _lines([b'{"a":', b'1}\n\n{"b"', b":2}\n", b'{"c":3}']) == [(1, b'{"a":1}'), (3, b'{"b":2}'), (4, b'{"c":3}')]
+    assert _lines([b"  \n", b"\n"]) == []
+
+
+def _export(client) -> dict:
+    response = client.get("/api/applications/export", params={"attachments": "data"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return {record["id"]: record for record in map(json.loads, response.text.splitlines())}
+
+
+def test_export_then_import_restores_applications_and_attachments(client):
+    first = client.post("/api/applications", json={"form_data": FORM, "status": "closed"}).json()
+    second = client.post("/api/applications", json={"form_data": FORM}).json()
+    client.post(
+        f"/api/applications/{first['id']}/attachments",
+        json={"title": "scan.pdf", "mime_type": "application/pdf", "data": base64.b64encode(PDF).decode()},
+    )
+    exported = _export(client)
+    lines = [json.dumps(exported[app["id"]]) for app in (first, second)]
+    assert base64.b64decode(exported[first["id"]]["attachments"][0]["data"]) == PDF
+
+    for app in (first, second):
+        assert client.delete(f"/api/applications/{app['id']}").status_code == 204
+    response = client.post("/api/applications/import", content="\n".join(lines) + "\n")
+    assert response.json() == {"imported": 2, "failed": 0, "errors": []}
+
+    restored = client.get(f"/api/applications/{first['id']}").json()
+    assert restored["status"] == "closed"
+    assert restored["created_at"] == first["created_at"]
+    assert restored["form_data"] == first["form_data"]
+    attachments = client.get(f"/api/applications/{first['id']}/attachments").json()["attachments"]
+    assert [att["title"] for att in attachments] == ["scan.pdf"]
+    assert client.get(f"/api/applications/{first['id']}/attachments/{attachments[0]['id']}").content == PDF
+
+
+def test_import_reports_bad_lines_and_carries_on(client, app_id):
+    bad_pesel = json.loads(json.dumps(FORM))
+    bad_pesel["poszkodowany"]["pesel"] = "12345678901"
+    body = "\n".join([
+        json.dumps({"form_data": FORM, "status": "new"}),
+        "{not json",
+        "",
+        json.dumps({"form_data": bad_pesel}),
+        json.dumps({"form_data": FORM, "id": app_id}),
+        json.dumps({"form_data": FORM, "ai_suggestion": 2}),
+        json.dumps({"form_data": FORM, "attachments": [{"title": "x.exe", "mime_type": "application/x-msdownload", "data": "TVo="}]}),
+        json.dumps({"form_data": FORM}),
+    ])
+    result = client.post("/api/applications/import", content=body).json()
+
+    assert result["imported"] == 2
+    assert result["failed"] == 5
+    assert [error["line"] for error in result["errors"]] == [2, 4, 6, 7, 5]
+    errors = {error["line"]: error["error"] for error in result["errors"]}
+    assert errors[4].startswith("pesel:")
+    assert errors[5] == f"Application with id '{app_id}' already exists"
+    assert errors[6].startswith("ai_suggestion:")
+    assert errors[7].startswith("attachment 'x.exe':")
+
+
+def test_invalid_base64_is_reported_before_anything_is_created(client):
+    encoded = base64.b64encode(PDF).decode()
+    broken = {"title": "scan.pdf", "mime_type": "application/pdf", "data": encoded[:4000] + "!!!!" + encoded[4004:]}
+    total = client.get("/api/applications/stats").json()["total"]
+    body = json.dumps({"form_data": FORM, "attachments": [broken]}) + "\n"
+
+    response = client.post("/api/applications/import", content=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["imported"], result["failed"]) == (0, 1)
+    assert result["errors"][0]["error"].startswith("attachment 'scan.pdf': Invalid base64 data")
+    assert client.get("/api/applications/stats").json()["total"] == total
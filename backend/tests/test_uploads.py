@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.database.blobs import BlobTooLarge
+from app.services.uploads import receive_upload
+from conftest import PDF
+
+BOUNDARY = "test-boundary"
+CHUNK = 16 * 1024
+
+
+def _form(data: bytes, filename: str = "scan.pdf", content_type: str = "application/pdf") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def _receive(body: bytes, max_size: int, content_length: bool = False):
+    """Run `receive_upload` on `body` sent in CHUNK pieces; returns (result or error, pieces read)."""
+    pieces = [body[i:i + CHUNK] for i in range(0, len(body), CHUNK)]
+    read = []
+
+    async def receive():
+        read.append(pieces[len(read)])
+        return {"type": "http.request", "body": read[-1], "more_body": len(read) < len(pieces)}
+
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    request = Request({"type": "http", "method": "POST", "headers": headers}, receive)
+    try:
+        outcome = asyncio.run(receive_upload(request, max_size=max_size))
+    except ValueError as e:
+        outcome = e
+    return outcome, len(read)
+
+
+def test_upload_is_streamed_to_a_blob(client):
+    attachment, _ = _receive(_form(PDF), max_size=len(PDF))
+    try:
+        assert (attachment.title, attachment.mime_type) == ("scan.pdf", "application/pdf")
+        assert attachment.writer.size == len(PDF)
+    finally:
+        attachment.writer.discard()
+
+
+def test_declared_length_over_the_limit_is_refused_unread(client):
+    error, read = _receive(_form(PDF * 20), max_size=len(PDF), content_length=True)
+    assert isinstance(error, BlobTooLarge)
+    assert read == 0
+
+
+def test_oversized_file_is_cut_off_while_streaming(client):
+    body = _form(PDF * 100)
+    error, read = _receive(body, max_size=4 * CHUNK)
+    assert isinstance(error, BlobTooLarge)
+    assert read <= 6 < len(body) // CHUNK
+
+
+def test_disallowed_type_is_refused_after_the_first_bytes(client):
+    error, read = _receive(_form(b"MZ\x90\x00" + b"\x00" * 200_000, "x.exe", "application/pdf"), max_size=len(PDF) * 100)
+    assert type(error) is ValueError
+    assert "none of the allowed types" in str(error)
+    assert read == 1
+
+
+def test_upload_endpoint(client, app_id):
+    url = f"/api/applications/{app_id}/attachments/upload"
+    response = client.post(url, files={"file": ("scan.pdf", PDF, "image/png")})
+    assert response.status_code == 201, response.text
+    attachment = response.json()["attachment"]
+    assert (attachment["title"], attachment["mime_type"], attachment["size_bytes"]) == ("scan.pdf", "application/pdf", len(PDF))
+
+    response = client.post(url, data={"title": "Skan"}, files={"file": ("scan.pdf", PDF, "application/pdf")})
+    assert response.json()["attachment"]["title"] == "Skan"
+    assert client.post(url, data={"title": "Skan"}, files={"other": ("a.pdf", PDF)}).status_code == 400
+    assert client.post(url, files={"file": ("x.exe", b"MZ" + b"\x00" * 100)}).status_code == 400
+    assert client.post(url, files={"file": ("scan.pdf", PDF, "application/octet-stream")}).status_code == 400
+    assert client.post("/api/applications/missing/attachments/upload", files={"file": ("scan.pdf", PDF)}).status_code == 404
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "multipart/form-data"])
+def test_non_multipart_body_is_refused(client, app_id, content_type):
+    response = client.post(f"/api/applications/{app_id}/attachments/upload", content=b"{}", headers={"content-type": content_type})
+    assert response.status_code == 400
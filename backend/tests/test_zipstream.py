@@ -0,0 +1,58 @@
+import io
+import zipfile
+import zlib
+from datetime import datetime
+
+import pytest
+
+from app.utils.zipstream import ZIP_DEFLATED, ZIP_STORED, ZipStream
+
+MODIFIED = datetime(2025, 3, 1, 10, 30, 12)
+
+
+def _deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+
+def test_members_of_every_kind_read_back():
+    text = "opis okoliczności wypadku\n".encode() * 2000
+    archive = ZipStream()
+    body = b"".join([
+        *archive.add("stored.bin", [b"abc", b"", b"def"], MODIFIED, ZIP_STORED),
+        *archive.add("deflated.txt", [text[:1000], text[1000:]], MODIFIED, ZIP_DEFLATED),
+        *archive.add_deflated("copied.txt", [_deflate(text)], zlib.crc32(text), len(_deflate(text)), len(text), MODIFIED),
+        *archive.add("załącznik.txt", [b"x"], datetime(1970, 1, 1)),
+        *archive.finish(),
+    ])
+
+    with zipfile.ZipFile(io.BytesIO(body)) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == ["stored.bin", "deflated.txt", "copied.txt", "załącznik.txt"]
+        assert zf.read("stored.bin") == b"abcdef"
+        assert zf.read("deflated.txt") == zf.read("copied.txt") == text
+        assert zf.getinfo("deflated.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.getinfo("stored.bin").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("stored.bin").date_time == (2025, 3, 1, 10, 30, 12)
+        assert zf.getinfo("załącznik.txt").date_time[0] == 1980
+
+
+def test_more_members_than_the_classic_format_allows():
+    archive = ZipStream()
+    count = 0xFFFF + 2
+    body = b"".join(
+        [chunk for i in range(count) for chunk in archive.add(f"{i}", [b"x"], MODIFIED)] + list(archive.finish())
+    )
+
+    with zipfile.ZipFile(io.BytesIO(body)) as zf:
+        names = zf.namelist()
+        assert len(names) == count
+        assert zf.read(names[-1]) == b"x"
+
+
+def test_copied_member_of_the_wrong_size_is_refused():
+    archive = ZipStream()
+    data = _deflate(b"payload")
+    chunks = archive.add_deflated("short.txt", [data], zlib.crc32(b"payload"), len(data) + 1, 7, MODIFIED)
+    with pytest.raises(ValueError):
+        list(chunks)
@@ -14,6 +14,9 @@ import {
   Download
 } from 'lucide-react';
 
+// Types the backend renders thumbnails for (images and the first page of PDFs)
+const hasPreview = (mimeType: string) => mimeType.startsWith('image/') || mimeType === 'application/pdf';
+
 const ApplicationDetail: React.FC = () => {
   const { id } = useParams<{ id: string }>();
   const navigate = useNavigate();
@@ -122,10 +125,20 @@ const ApplicationDetail: React.FC = () => {
             <ArrowLeft className="w-4 h-4" />
             Wróć do listy
           </Button>
-          <Button variant="destructive" onClick={handleDelete} className="gap-2">
-            <Trash2 className="w-4 h-4" />
-            Usuń zgłoszenie
-          </Button>
+          <div className="flex items-center gap-2">
+            <Button
+              variant="outline"
+              onClick={() => id && (window.location.href = applicationsApi.bundleUrl(id))}
+              className="gap-2"
+            >
+              <Download className="w-4 h-4" />
+              Pobierz całość (ZIP)
+            </Button>
+            <Button variant="destructive" onClick={handleDelete} className="gap-2">
+              <Trash2 className="w-4 h-4" />
+              Usuń zgłoszenie
+            </Button>
+          </div>
         </div>
 
         {/* Application Info */}
@@ -235,7 +248,16 @@ const ApplicationDetail: React.FC = () => {
                     className="flex items-center justify-between p-3 border border-border rounded-lg"
                   >
                     <div className="flex items-center gap-3">
-                      <FileText className="w-5 h-5 text-primary" />
+                      {id && hasPreview(att.mime_type) ? (
+                        <img
+                          src={attachmentsApi.previewUrl(id, att.id, 128)}
+                          alt={att.title}
+                          loading="lazy"
+                          className="w-16 h-16 object-contain rounded border border-border bg-muted"
+                        />
+                      ) : (
+                        <FileText className="w-5 h-5 text-primary" />
+                      )}
                       <div>
                         <p className="font-medium text-foreground">{att.title}</p>
                         <p className="text-xs text-muted-foreground">
@@ -1,7 +1,7 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { ZusLayout } from '@/components/layout/ZusLayout';
 import { applicationsApi } from '@/utils/apiClient';
-import { ApplicationListItem, ApplicationListResponse } from '@/types/api';
+import { ApplicationChangeEvent, ApplicationListItem, ApplicationListResponse } from '@/types/api';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
@@ -30,6 +30,7 @@ const ApplicationsList: React.FC = () => {
     pesel: '',
     status: '',
   });
+  const listVersionRef = useRef<number | null>(null); // store version of the first load, where the live feed starts
 
   const fetchApplications = async () => {
     setLoading(true);
@@ -45,6 +46,9 @@ const ApplicationsList: React.FC = () => {
       const response: ApplicationListResponse = await applicationsApi.list(params);
       setApplications(response.items);
       setTotal(response.total);
+      if (listVersionRef.current === null && response.version != null) {
+        listVersionRef.current = response.version;
+      }
     } catch (err: any) {
       setError(err.message || 'Wystąpił błąd podczas ładowania zgłoszeń');
       console.error('Error fetching applications:', err);
@@ -58,6 +62,42 @@ const ApplicationsList: React.FC = () => {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [page, filters.pesel, filters.status]);
 
+  // Live updates: status changes are patched into the page, new and deleted applications trigger a reload
+  const fetchRef = useRef(fetchApplications);
+  fetchRef.current = fetchApplications;
+  const listLoaded = listVersionRef.current !== null;
+
+  useEffect(() => {
+    if (!listLoaded) return;
+
+    const eventSource = applicationsApi.subscribeChanges(listVersionRef.current);
+    let reloadTimer: ReturnType<typeof setTimeout> | null = null;
+    const scheduleReload = () => {
+      if (reloadTimer) return;
+      reloadTimer = setTimeout(() => {
+        reloadTimer = null;
+        fetchRef.current();
+      }, 1000);
+    };
+
+    eventSource.addEventListener('change', (event) => {
+      const change: ApplicationChangeEvent = JSON.parse((event as MessageEvent).data);
+      if (change.op === 'update') {
+        setApplications((items) =>
+          items.map((item) => (item.id === change.id ? { ...item, status: change.status } : item))
+        );
+      } else {
+        scheduleReload();
+      }
+    });
+    eventSource.addEventListener('reset', scheduleReload);
+
+    return () => {
+      if (reloadTimer) clearTimeout(reloadTimer);
+      eventSource.close();
+    };
+  }, [listLoaded]);
+
   const handleDelete = async (id: string) => {
     if (!confirm('Czy na pewno chcesz usunąć to zgłoszenie?')) {
       return;
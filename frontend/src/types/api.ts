@@ -2,6 +2,7 @@ import { AccidentReportFormData } from './accident-report';
 
 export interface Application {
   id: string;
+  version: number;
   created_at: string;
   updated_at: string;
   pesel: string;
@@ -27,6 +28,65 @@ export interface ApplicationListResponse {
   total: number;
   page: number;
   page_size: number;
+  next_cursor?: string | null;
+  total_exact?: boolean;
+  version?: number | null;
+}
+
+export interface ApplicationSearchItem extends ApplicationListItem {
+  score: number;
+}
+
+export interface ApplicationSearchResponse {
+  items: ApplicationSearchItem[];
+  total: number;
+  page: number;
+  page_size: number;
+}
+
+export interface ApplicationStatsResponse {
+  total: number;
+  with_attachments: number;
+  attachment_share: number;
+  by_status: Record<string, number>;
+  by_day: { day: string; total: number; by_status: Record<string, number> }[];
+  ai_suggestion_histogram: { lower: number; upper: number; count: number }[];
+  ai_suggestion_missing: number;
+}
+
+export interface ApplicationChangeEvent {
+  version: number;
+  op: 'create' | 'update' | 'delete';
+  id: string;
+  status?: string | null;
+}
+
+export interface BulkOperation {
+  op: 'update' | 'delete';
+  id: string;
+  status?: string;
+  ai_suggestion?: number;
+  ai_comments?: Record<string, any>;
+  expected_version?: number;
+}
+
+export interface BulkResponse {
+  results: { id: string; result: 'updated' | 'deleted' | 'not_found' | 'conflict'; version: number | null }[];
+}
+
+export interface AnalyticsResponse {
+  group_by: string;
+  metric: 'count' | 'sum' | 'mean' | 'min' | 'max';
+  value: string | null;
+  version: number;
+  rows: number;
+  groups: { key: string | boolean | null; count: number; value: number | null }[];
+}
+
+export interface ApplicationImportResponse {
+  imported: number;
+  failed: number;
+  errors: { line: number; error: string }[];
 }
 
 export interface AttachmentMetadata {
@@ -41,6 +101,20 @@ export interface AttachmentListResponse {
   attachments: AttachmentMetadata[];
 }
 
+export interface UploadSession {
+  id: string;
+  title: string;
+  mime_type: string;
+  size_bytes: number;
+  chunk_size: number;
+  total_chunks: number;
+  received_chunks: number[];
+  received_ranges: [number, number][];
+  received_bytes: number;
+  created_at: string;
+  expires_at: string;
+}
+
 export interface ApiError {
   message: string;
   fieldErrors?: Record<string, string>;
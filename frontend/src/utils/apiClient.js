@@ -98,10 +98,76 @@ export const applicationsApi = {
     
     return response.status === 204 ? null : await response.json();
   },
+
+  // Whole case as one ZIP (application JSON, accident card, attachments), streamed by the server
+  bundleUrl: (id) => `${API_BASE_URL}/api/applications/${id}/bundle.zip`,
+
+  // Live feed of application changes (server-sent events) after store version `since`
+  subscribeChanges: (since = null) => {
+    const query = since !== null && since !== undefined ? `?since=${since}` : '';
+    return new EventSource(`${API_BASE_URL}/api/applications/changes${query}`);
+  },
 };
 
 // Attachments API
 export const attachmentsApi = {
+  // Upload a File/Blob as multipart/form-data; it is streamed to storage instead of sent as base64
+  upload: async (applicationId, file, title = null) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    if (title) formData.append('title', title);
+
+    const response = await fetch(`${API_BASE_URL}/api/applications/${applicationId}/attachments/upload`, {
+      method: 'POST',
+      body: formData,
+    });
+
+    return handleResponse(response);
+  },
+
+  // Resumable upload for large files over unreliable connections: the file is sent in
+  // chunks, failed chunks are retried, and an interrupted upload can be continued later
+  // by passing the `uploadId` it reported through onProgress
+  uploadResumable: async (applicationId, file, { title = null, uploadId = null, onProgress = null, retries = 3 } = {}) => {
+    const base = `${API_BASE_URL}/api/applications/${applicationId}/uploads`;
+    let session;
+    if (uploadId) {
+      session = await handleResponse(await fetch(`${base}/${uploadId}`));
+    } else {
+      session = await handleResponse(await fetch(base, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ title: title || file.name, mime_type: file.type, size_bytes: file.size }),
+      }));
+    }
+
+    const received = new Set(session.received_chunks);
+    let receivedBytes = session.received_bytes;
+    for (let index = 0; index < session.total_chunks; index++) {
+      if (received.has(index)) continue;
+      const start = index * session.chunk_size;
+      const chunk = file.slice(start, Math.min(start + session.chunk_size, file.size));
+      for (let attempt = 0; ; attempt++) {
+        try {
+          await handleResponse(await fetch(`${base}/${session.id}/chunks/${index}`, {
+            method: 'PUT',
+            headers: { 'Content-Type': 'application/octet-stream' },
+            body: chunk,
+          }));
+          break;
+        } catch (error) {
+          if (attempt >= retries) throw error;
+          await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** attempt));
+        }
+      }
+      receivedBytes += chunk.size;
+      if (onProgress) onProgress({ uploadId: session.id, receivedBytes, totalBytes: file.size });
+    }
+
+    const response = await fetch(`${base}/${session.id}/complete`, { method: 'POST' });
+    return handleResponse(response);
+  },
+
   // Create attachment
   create: async (applicationId, attachment) => {
     const response = await fetch(`${API_BASE_URL}/api/applications/${applicationId}/attachments`, {
@@ -121,6 +187,15 @@ export const attachmentsApi = {
     return handleResponse(response);
   },
 
+  // Direct URL of an attachment, for viewers that load it themselves (e.g. a PDF viewer
+  // fetching byte ranges page by page); responses are cacheable and support Range
+  url: (applicationId, attachmentId, inline = true) =>
+    `${API_BASE_URL}/api/applications/${applicationId}/attachments/${attachmentId}${inline ? '?disposition=inline' : ''}`,
+
+  // Thumbnail URL of an image or PDF attachment (first page); a few KB instead of the whole file
+  previewUrl: (applicationId, attachmentId, size = 256) =>
+    `${API_BASE_URL}/api/applications/${applicationId}/attachments/${attachmentId}/preview?size=${size}`,
+
   // Get attachment (returns blob URL)
   get: async (applicationId, attachmentId) => {
     const response = await fetch(